@@ -1,4 +1,6 @@
 # Author: 152120221098 Emre AVCI
+from concurrent.futures import Future
+
 from base_connections import HomeAutomationSystemConnection
 from protocol import (
     GET_DESIRED_TEMPERATURE_HIGH,
@@ -15,6 +17,17 @@ from protocol import (
 
 
 class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
+    # Register map: decoded field -> (HIGH opcode, LOW opcode)
+    FIELDS = {
+        "desired_temp": (GET_DESIRED_TEMPERATURE_HIGH, GET_DESIRED_TEMPERATURE_LOW),
+        "ambient_temp": (GET_AMBIENT_TEMPERATURE_HIGH, GET_AMBIENT_TEMPERATURE_LOW),
+        "fan_speed": (GET_FAN_SPEED, None),
+    }
+    SETPOINT_FIELD = "desired_temp"
+
+    # Predictive polling (see needs_poll): ambient temperature follows a smooth curve
+    PREDICT_TOLERANCE = {"ambient_temp": 0.1}
+
     def __init__(self, com_port: str = "COM8", baud_rate: int = 9600):
         super().__init__(com_port, baud_rate)
 
@@ -33,19 +46,39 @@ class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
     # -------------------- PEEK (NO UART) --------------------
     # These methods return cached values only (no serial I/O).
     # This keeps GUI updates fast and prevents UI blocking.
-    def peekDesiredTemp(self) -> float:
-        return self.__desiredTemperature
-
-    def peekAmbientTemp(self) -> float:
-        return self.__ambientTemperature
-
-    def peekFanSpeed(self) -> int:
-        return self.__fanSpeed
+    # with_age=True returns (value, seconds since it was read from the board or None).
+    # predict=True adds a flag (last item) and, for PREDICT_TOLERANCE fields, returns
+    # the estimator's current prediction instead of the last read value (flag True).
+    def peekDesiredTemp(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("desired_temp", self.__desiredTemperature, with_age, predict)
+
+    def peekAmbientTemp(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("ambient_temp", self.__ambientTemperature, with_age, predict)
+
+    def peekFanSpeed(self, with_age: bool = False, predict: bool = False) -> int | tuple:
+        return self._peek("fan_speed", self.__fanSpeed, with_age, predict)
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "desired_temp": self.__desiredTemperature,
+            "ambient_temp": self.__ambientTemperature,
+            "fan_speed": self.__fanSpeed,
+        }
+
+    def _restore_cache(self, field: str, value: float) -> None:
+        if field == "desired_temp":
+            self.__desiredTemperature = float(value)
+        elif field == "ambient_temp":
+            self.__ambientTemperature = float(value)
+        elif field == "fan_speed":
+            self.__fanSpeed = int(value)
 
     # -------------------- ASYNC RX HANDLER --------------------
     # handle_rx() is called by the GUI polling loop when ONE response byte arrives.
     # cmd indicates which GET request produced this response byte.
     def handle_rx(self, cmd: int, value: int) -> None:
+        self._note_rx(cmd)
+
         # Store raw bytes into their per-field slots
         if cmd == GET_DESIRED_TEMPERATURE_HIGH:
             self._desired_h = value
@@ -58,14 +91,17 @@ class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
         elif cmd == GET_FAN_SPEED:
             # Fan speed is a single byte value (no HIGH/LOW pair)
             self.__fanSpeed = value
+            self._touch("fan_speed", self.__fanSpeed)
 
-        # Combine desired temp when both bytes are available
-        if (self._desired_h is not None) and (self._desired_l is not None):
+        # Combine desired temp once both bytes of the same request cycle are in
+        if self._pair_complete(cmd, "desired_temp"):
             self.__desiredTemperature = combine_int_frac(self._desired_h, self._desired_l)
+            self._touch("desired_temp", self.__desiredTemperature)
 
-        # Combine ambient temp when both bytes are available
-        if (self._ambient_h is not None) and (self._ambient_l is not None):
+        # Combine ambient temp once both bytes of the same request cycle are in
+        if self._pair_complete(cmd, "ambient_temp"):
             self.__ambientTemperature = combine_int_frac(self._ambient_h, self._ambient_l)
+            self._touch("ambient_temp", self.__ambientTemperature)
 
     # -------------------- UPDATE (LEGACY) --------------------
     # Blocking refresh path kept for compatibility (async polling is preferred for UI).
@@ -88,42 +124,62 @@ class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
         integral = int(temp) & DATA_6BIT_MASK
         fractional = encode_fraction(temp) & DATA_6BIT_MASK
 
-        # Send HIGH first, then LOW (matches most firmware parsers)
-        if not self._uart_write_byte(SET_DESIRED_VALUE_HIGH_MASK | integral):
-            return False
-        if not self._uart_write_byte(SET_DESIRED_VALUE_LOW_MASK | fractional):
-            return False
+        frames = (SET_DESIRED_VALUE_HIGH_MASK | integral, SET_DESIRED_VALUE_LOW_MASK | fractional)
+        seq = self._journal_set("desired_temp", float(integral) + (fractional / 10.0), frames, "sync")
+
+        # Send HIGH first, then LOW (matches most firmware parsers); the UART lock
+        # keeps other threads from slipping a GET between the two frames
+        with self._uart_lock:
+            if not (self._uart_write_byte(frames[0]) and self._uart_write_byte(frames[1])):
+                self._journal_outcome(seq, "failed", 1)
+                return False
+        self._journal_outcome(seq, "unverified", 1)
 
         # Optimistic cache update so UI reflects the new target immediately
         self.__desiredTemperature = float(integral) + (fractional / 10.0)
+        self._set_optimistic("desired_temp", self.__desiredTemperature)
         return True
 
-    # -------------------- GET (BLOCKING, SINGLE BYTE) --------------------
-    # _get_byte sends one GET command and waits for one response byte.
-    # Flushing RX first prevents stale bytes from being interpreted as new responses.
-    def _get_byte(self, cmd: int, timeout_ms: int = 80) -> int | None:
-        if not self.is_open():
-            return None
-
-        self._uart_flush_input()
+    def set_setpoint(self, value: float) -> bool:
+        return self.setDesiredTemp(value)
 
-        if not self._uart_write_byte(cmd):
-            return None
+    # -------------------- SET (NON-BLOCKING, VERIFIED) --------------------
+    # Queues the same two frames and returns a Future[bool] at once. The write is
+    # confirmed by the next polled read of desired temp (no extra read-back) and
+    # retried in the background on mismatch (see HomeAutomationSystemConnection._queue_set).
+    def setDesiredTempAsync(self, temp: float, retries: int = 3) -> Future:
+        integral = int(temp) & DATA_6BIT_MASK
+        fractional = encode_fraction(temp) & DATA_6BIT_MASK
+        frames = (SET_DESIRED_VALUE_HIGH_MASK | integral, SET_DESIRED_VALUE_LOW_MASK | fractional)
+        return self._queue_set("desired_temp", float(integral) + (fractional / 10.0), frames, retries)
 
-        # Deadline-based read prevents permanent blocking if PIC does not respond
-        return self._uart_read_byte_deadline(timeout_ms=timeout_ms)
+    def set_setpoint_async(self, value: float) -> Future:
+        return self.setDesiredTempAsync(value)
 
     # -------------------- GETTERS (BLOCKING, DECODED) --------------------
-    # These actively query the PIC and update caches if successful.
+    # These actively query the PIC (via the shared _get_byte) and update caches if successful.
     # If any step fails, they return the last cached value.
-    def getFanSpeed(self) -> int:
+    # max_age (seconds): return the cached value without a round trip if it was read
+    # from the board (e.g. by handle_rx polling) at most that long ago.
+    def getFanSpeed(self, max_age: float | None = None) -> int:
+        if self._fresh("fan_speed", max_age):
+            return self.__fanSpeed
+        return self._single_flight("fan_speed", self._read_fan_speed)
+
+    def _read_fan_speed(self) -> int:
         b = self._get_byte(GET_FAN_SPEED)
         if b is None:
             return self.__fanSpeed
         self.__fanSpeed = b
+        self._touch("fan_speed", self.__fanSpeed)
         return self.__fanSpeed
 
-    def getDesiredTemp(self) -> float:
+    def getDesiredTemp(self, max_age: float | None = None) -> float:
+        if self._fresh("desired_temp", max_age):
+            return self.__desiredTemperature
+        return self._single_flight("desired_temp", self._read_desired_temp)
+
+    def _read_desired_temp(self) -> float:
         h = self._get_byte(GET_DESIRED_TEMPERATURE_HIGH)
         if h is None:
             return self.__desiredTemperature
@@ -134,9 +190,15 @@ class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
 
         self._desired_h, self._desired_l = h, l
         self.__desiredTemperature = combine_int_frac(h, l)
+        self._touch("desired_temp", self.__desiredTemperature)
         return self.__desiredTemperature
 
-    def getAmbientTemp(self) -> float:
+    def getAmbientTemp(self, max_age: float | None = None) -> float:
+        if self._fresh("ambient_temp", max_age):
+            return self.__ambientTemperature
+        return self._single_flight("ambient_temp", self._read_ambient_temp)
+
+    def _read_ambient_temp(self) -> float:
         # Read order is LOW then HIGH here (kept as-is to match firmware behavior)
         l = self._get_byte(GET_AMBIENT_TEMPERATURE_LOW)
         if l is None:
@@ -148,4 +210,5 @@ class AirConditionerControlSystemConnection(HomeAutomationSystemConnection):
 
         self._ambient_h, self._ambient_l = h, l
         self.__ambientTemperature = combine_int_frac(h, l)
+        self._touch("ambient_temp", self.__ambientTemperature)
         return self.__ambientTemperature
@@ -1,9 +1,84 @@
 # Author: 152120221098 Emre AVCI
+import itertools
+import random
+import threading
 import time
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future
+from types import MappingProxyType
+from typing import Mapping, Optional
 
 import serial
 
+from estimator import FieldEstimator
+from metrics import ConnectionMetrics
+from tcp_transport import TcpSerial, is_tcp_port
+
+
+# Pause after every written byte (gives simple firmware ISRs time to keep up)
+WRITE_PACING_S = 0.015
+
+# Read-back values within this distance of the target count as verified
+# (protocol resolution is one decimal digit)
+SET_VERIFY_TOLERANCE = 0.11
+
+# An async SET not confirmed by a read of its register within this time is rewritten
+SET_VERIFY_TIMEOUT_S = 1.0
+
+# SET frames wait at most this long for their journal entry to be on disk
+# (a failing disk must not keep the board from being controlled)
+JOURNAL_WAIT_S = 1.0
+
+# Dead-link detection: this many GET timeouts (or OS errors) in a row without a
+# single received byte means the link is gone (cable pulled, simulator restarted)
+DEAD_LINK_TIMEOUTS = 8
+DEAD_LINK_OS_ERRORS = 2
+
+# Reconnect backoff: BASE * 2^attempt, capped at MAX, scaled by a random 0.5..1.0
+RECONNECT_BASE_S = 0.25
+RECONNECT_MAX_S = 10.0
+
+# Predictive polling: a predicted field is still read at least this often
+PREDICT_MAX_AGE_S = 30.0
+
+
+class PendingSet:
+    """One asynchronous SET waiting to be written and/or verified by a read-back."""
+
+    __slots__ = (
+        "field", "value", "frames", "futures", "attempts", "retries", "written_at", "deadline", "journal_seq",
+        "queued_at",
+    )
+
+    def __init__(self, field: str, value: float, frames: tuple[int, int], retries: int):
+        self.field = field
+        self.value = value
+        self.frames = frames
+        self.futures: list[Future] = [Future()]
+        self.attempts = 0
+        self.retries = retries
+        self.written_at: float | None = None  # None = frames not on the wire yet
+        self.deadline = 0.0
+        self.journal_seq: int | None = None  # "set" entry in the SET journal, if any
+        self.queued_at = time.monotonic()
+
+
+class Subscription:
+    """
+    One change subscription (see HomeAutomationSystemConnection.subscribe).
+    The callback fires when the decoded value moves more than the deadband away
+    from the last value delivered to it; `last` is that value (None = nothing yet).
+    """
+
+    __slots__ = ("field", "callback", "deadband", "relative", "last")
+
+    def __init__(self, field: str, callback, deadband: float, relative: bool):
+        self.field = field
+        self.callback = callback
+        self.deadband = deadband
+        self.relative = relative
+        self.last: float | None = None
+
 
 class HomeAutomationSystemConnection:
     # -------------------- MEMBER VARIABLES --------------------
@@ -11,7 +86,19 @@ class HomeAutomationSystemConnection:
     _comPort: str
     _baudRate: int
     _isOpen: bool
-    _uart: serial.Serial | None
+    _uart: serial.Serial | TcpSerial | None
+
+    # Register map of the board: decoded field name -> (HIGH opcode, LOW opcode).
+    # LOW is None for single-byte fields. Subclasses fill this in.
+    FIELDS: dict[str, tuple[int, int | None]] = {}
+
+    # The single writable register of the board (the field SET commands change)
+    SETPOINT_FIELD: str | None = None
+
+    # Smooth fields that may be predicted instead of polled: field -> largest
+    # acceptable 1-sigma uncertainty of the prediction (in the field's units).
+    # Fields not listed here are read on every poll cycle.
+    PREDICT_TOLERANCE: dict[str, float] = {}
 
     # -------------------- LIFECYCLE --------------------
     def __init__(self, com_port: str = "COM1", baud_rate: int = 9600):
@@ -21,6 +108,70 @@ class HomeAutomationSystemConnection:
         self._isOpen = False
         self._uart = None
 
+        # Link supervision (see supervise()): "closed" / "open" / "reconnecting"
+        self.link_state = "closed"
+        self._timeouts_in_row = 0
+        self._os_errors_in_row = 0
+        self._reconnect_attempts = 0
+        self._next_reconnect_at = 0.0
+
+        # UART instrumentation (see metrics.py)
+        self.metrics = ConnectionMetrics()
+
+        # Monotonic time each decoded field was last refreshed from the board (None = never)
+        self._field_ts: dict[str, float | None] = dict.fromkeys(self.FIELDS)
+
+        # Fields whose cache holds an optimistic (written, not yet read back) value
+        self._optimistic: set[str] = set()
+
+        # Fields whose cache was restored from a saved state (see restore_state)
+        self._restored: set[str] = set()
+
+        # State estimators of the predictable fields (see needs_poll / predict)
+        self._estimators: dict[str, FieldEstimator] = {f: FieldEstimator() for f in self.PREDICT_TOLERANCE}
+
+        # Round-trip estimates (seconds per GET opcode) restored from a saved state,
+        # used until this session has measured its own
+        self._rtt_hint: dict[int, float] = {}
+
+        # Serializes UART transactions (GET request/response, SET frame pairs) so
+        # callers on different threads cannot interleave bytes or flush each other's replies
+        self._uart_lock = threading.RLock()
+
+        # Single-flight reads: field -> Future of the transaction currently reading it
+        self._flight_lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+
+        # Request-cycle generations (torn-read protection for HIGH/LOW pairs):
+        # _rx_cycle[opcode] is the cycle in which its latest reply arrived, and a
+        # pair is decoded only when both halves carry the same cycle.
+        self._cycles = itertools.count(1)
+        self._cycle = 0
+        self._rx_cycle: list[int] = [-1] * 256
+
+        # Published view of decoded values: (generation, read-only mapping).
+        # Writers replace the whole tuple, so readers need no lock.
+        self._view_lock = threading.Lock()
+        self._published: tuple[int, Mapping[str, float]] = (0, MappingProxyType({}))
+
+        # Change subscriptions per field. Tuples are replaced, never mutated, so
+        # _touch() can iterate them without taking a lock.
+        self._sub_lock = threading.Lock()
+        self._subscribers: dict[str, tuple[Subscription, ...]] = {}
+
+        # Asynchronous SETs (see _queue_set / service_sets)
+        self._set_lock = threading.Lock()
+        self._pending_sets: dict[str, PendingSet] = {}
+        self._set_outbox: deque[PendingSet] = deque()
+
+        # SET journal (see set_journal.py) and the board name entries are written under
+        self._journal = None
+        self._journal_board: str | None = None
+
+        # Monotonic time each GET opcode was last sent; a read-back only verifies
+        # a SET if both halves of the register were requested after the write
+        self._get_sent_at: list[float] = [0.0] * 256
+
     def is_open(self) -> bool:
         """Return True if a serial port is open and the UART object exists."""
         return bool(self._isOpen) and (self._uart is not None)
@@ -30,19 +181,33 @@ class HomeAutomationSystemConnection:
         Open UART in non-blocking mode to avoid freezing a GUI.
         timeout=0 makes read() return immediately if no byte is available.
         """
+        self._open_port()
+        self.link_state = "open"
+        self._timeouts_in_row = 0
+        self._os_errors_in_row = 0
+        return True
+
+    def _open_port(self, report: bool = True) -> bool:
+        """
+        Create and configure the serial object (raises on failure).
+        A "tcp://host:port" port is reached over TCP instead (see tcp_transport.py).
+        """
         try:
-            self._uart = serial.Serial(
-                port=self._comPort,
-                baudrate=self._baudRate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=0,            # non-blocking reads
-                write_timeout=0.2,    # short write timeout to avoid stalling
-                xonxoff=False,
-                rtscts=False,
-                dsrdtr=False,
-            )
+            if is_tcp_port(self._comPort):
+                self._uart = TcpSerial(self._comPort, timeout=0, write_timeout=0.2)
+            else:
+                self._uart = serial.Serial(
+                    port=self._comPort,
+                    baudrate=self._baudRate,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                    timeout=0,            # non-blocking reads
+                    write_timeout=0.2,    # short write timeout to avoid stalling
+                    xonxoff=False,
+                    rtscts=False,
+                    dsrdtr=False,
+                )
 
             # Allow virtual COM drivers / PICSimLab bridge to settle
             time.sleep(0.05)
@@ -61,19 +226,23 @@ class HomeAutomationSystemConnection:
             # Reset state so callers do not use a half-open object
             self._isOpen = False
             self._uart = None
-            print(f"UART open error ({self._comPort}): {e}")
+            if report:
+                print(f"UART open error ({self._comPort}): {e}")
             raise
 
     def close(self) -> bool:
         """Close UART connection and reset internal state."""
-        if self._isOpen and self._uart is not None:
-            try:
-                self._uart.close()
-            finally:
-                self._uart = None
-                self._isOpen = False
-            return True
-        return False
+        self.link_state = "closed"  # also ends any reconnect in progress
+        self._fail_pending_sets()
+        with self._uart_lock:
+            if self._isOpen and self._uart is not None:
+                try:
+                    self._uart.close()
+                finally:
+                    self._uart = None
+                    self._isOpen = False
+                return True
+            return False
 
     # -------------------- UART HELPERS --------------------
     def _uart_flush_input(self) -> None:
@@ -82,6 +251,7 @@ class HomeAutomationSystemConnection:
         This prevents stale bytes from being interpreted as responses to a new command.
         """
         if self.is_open():
+            self.metrics.record_flush()
             try:
                 self._uart.reset_input_buffer()
             except Exception:
@@ -101,9 +271,12 @@ class HomeAutomationSystemConnection:
         try:
             self._uart.write(bytes([b & 0xFF]))
             self._uart.flush()
-            time.sleep(0.015)
+            self.metrics.record_tx(b)
+            time.sleep(WRITE_PACING_S)
             return True
         except Exception:
+            self.metrics.record_write_error(b)
+            self._os_errors_in_row += 1
             return False
 
     def _uart_read_byte_now(self) -> Optional[int]:
@@ -116,8 +289,14 @@ class HomeAutomationSystemConnection:
         try:
             data = self._uart.read(1)
             if data:
+                self.metrics.record_rx()
+                # Any byte proves the link is alive
+                self._timeouts_in_row = 0
+                self._os_errors_in_row = 0
+                self._reconnect_attempts = 0
                 return data[0]
         except Exception:
+            self._os_errors_in_row += 1
             return None
         return None
 
@@ -138,6 +317,643 @@ class HomeAutomationSystemConnection:
 
         return None
 
+    def _get_byte(self, cmd: int, timeout_ms: int = 80) -> int | None:
+        """
+        Send one GET command and wait for its single response byte.
+        RX is flushed first so a stale byte is never taken as the answer to this command.
+        """
+        with self._uart_lock:
+            if not self.is_open():
+                return None
+
+            self._uart_flush_input()
+
+            sent_at = time.monotonic()
+            if not self._uart_write_byte(cmd):
+                return None
+            self._get_sent_at[cmd & 0xFF] = sent_at
+
+            # Deadline-based read prevents permanent blocking if the PIC does not respond
+            b = self._uart_read_byte_deadline(timeout_ms=timeout_ms)
+        if b is None:
+            self.metrics.record_timeout(cmd)
+            self._timeouts_in_row += 1
+        else:
+            self.metrics.record_latency(cmd, time.monotonic() - sent_at)
+        return b
+
+    def _single_flight(self, key: str, read):
+        """
+        Run read() (one blocking read transaction) unless an identical one is already
+        in flight on another thread; in that case wait for it and return its result.
+        The transaction holds the UART lock, so HIGH/LOW pairs are never interleaved.
+        """
+        with self._flight_lock:
+            fut = self._in_flight.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._in_flight[key] = fut
+        if not leader:
+            return fut.result()
+
+        try:
+            with self._uart_lock:
+                result = read()
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._flight_lock:
+                del self._in_flight[key]
+
+    def poll_commands(self) -> list[int]:
+        """GET opcodes that refresh every field of FIELDS (HIGH before LOW), in map order."""
+        cmds = []
+        for hi, lo in self.FIELDS.values():
+            cmds.append(hi)
+            if lo is not None:
+                cmds.append(lo)
+        return cmds
+
+    # -------------------- RAW PROTOCOL ACCESS --------------------
+    # For code that relays protocol bytes instead of decoded fields (serial_bridge.py).
+    # Both go through the UART lock, the metrics and the dead-link counters like the
+    # connection's own transactions.
+    def query(self, cmd: int, timeout_ms: int = 80) -> int | None:
+        """Send one GET opcode and return its response byte (None: timeout or port closed)."""
+        return self._get_byte(cmd, timeout_ms=timeout_ms)
+
+    def write_frames(self, *frames: int) -> int:
+        """
+        Write raw frames back to back, with no other transaction in between (e.g. a
+        SET HIGH/LOW pair). Stops at the first failed write; returns the number written.
+        """
+        written = 0
+        with self._uart_lock:
+            for frame in frames:
+                if not self._uart_write_byte(frame):
+                    break
+                written += 1
+        return written
+
+    # -------------------- LINK SUPERVISION --------------------
+    # The UART helpers count GET timeouts and OS errors in a row; supervise() (called
+    # by the I/O engine every loop) turns a dead link into a background reconnect with
+    # jittered exponential backoff. Queued async SETs are kept and resume once the
+    # port is back. close() by the user ends supervision.
+    def supervise(self) -> None:
+        if self.link_state == "open":
+            if self._timeouts_in_row >= DEAD_LINK_TIMEOUTS or self._os_errors_in_row >= DEAD_LINK_OS_ERRORS:
+                print(f"[WARN] {self._comPort}: link lost, reconnecting")
+                self.metrics.record_link_lost()
+                self._drop_uart()
+                self.link_state = "reconnecting"
+                self._schedule_reconnect()
+        elif self.link_state == "reconnecting" and time.monotonic() >= self._next_reconnect_at:
+            try:
+                self._open_port(report=False)
+            except Exception:
+                self._schedule_reconnect()
+                return
+            # Backoff attempts are only reset once a byte is received (the board may still be silent)
+            self.link_state = "open"
+            self._timeouts_in_row = 0
+            self._os_errors_in_row = 0
+            self.metrics.record_reconnect()
+
+    def link_status(self) -> dict:
+        """Link state for callers: state, reconnect attempts so far, seconds to the next attempt."""
+        retry_in = None
+        if self.link_state == "reconnecting":
+            retry_in = round(max(0.0, self._next_reconnect_at - time.monotonic()), 3)
+        return {
+            "state": self.link_state,
+            "attempts": self._reconnect_attempts,
+            "retry_in_s": retry_in,
+            "timeouts_in_row": self._timeouts_in_row,
+        }
+
+    def _schedule_reconnect(self) -> None:
+        delay = min(RECONNECT_MAX_S, RECONNECT_BASE_S * (2 ** self._reconnect_attempts))
+        self._reconnect_attempts += 1
+        self._next_reconnect_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+    def _drop_uart(self) -> None:
+        """Close the port after a link failure, keeping caches and queued SETs."""
+        with self._uart_lock:
+            try:
+                if self._uart is not None:
+                    self._uart.close()
+            except Exception:
+                pass
+            finally:
+                self._uart = None
+                self._isOpen = False
+
+    # -------------------- BATCHED READ --------------------
+    def read_many(
+        self,
+        fields: list[str] | None = None,
+        timeout_ms: int = 400,
+        max_age: float | None = None,
+    ) -> dict[str, tuple[float, float | None]]:
+        """
+        Refresh several fields in one pipelined burst and return
+        {field: (value, monotonic time it was last decoded from the board or None)}.
+        A value still restored from a saved state (restore_state) has time None.
+
+        The GET opcodes needed by the requested fields are de-duplicated, written
+        back to back after a single RX flush, and their replies are collected
+        against ONE deadline (timeout_ms for the whole burst, writes included).
+        Fields already fresher than max_age are not requested at all.
+        fields=None means every field of FIELDS.
+        """
+        names = list(self.FIELDS) if fields is None else list(fields)
+        unknown = [f for f in names if f not in self.FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s) for {type(self).__name__}: {', '.join(unknown)}")
+
+        cmds: list[int] = []
+        for field in names:
+            if self._fresh(field, max_age):
+                continue
+            for cmd in self.FIELDS[field]:
+                if cmd is not None and cmd not in cmds:
+                    cmds.append(cmd)
+
+        if cmds:
+            self._get_burst(cmds, timeout_ms)
+
+        values = self.snapshot()
+        return {
+            field: (values[field], None if field in self._restored else self._field_ts[field]) for field in names
+        }
+
+    def _get_burst(self, cmds: list[int], timeout_ms: int) -> bool:
+        """
+        Pipelined GETs: the board answers every GET with one byte, in order, so the
+        i-th reply belongs to cmds[i]. If any reply is missing the alignment of the
+        others cannot be trusted, so nothing is decoded (returns False).
+        """
+        with self._uart_lock:
+            if not self.is_open():
+                return False
+
+            deadline = time.monotonic() + (timeout_ms / 1000.0)
+            self.begin_cycle()
+            self._uart_flush_input()
+
+            sent_at: list[float] = []
+            for cmd in cmds:
+                t = time.monotonic()
+                if not self._uart_write_byte(cmd):
+                    return False
+                self._get_sent_at[cmd & 0xFF] = t
+                sent_at.append(t)
+
+            replies: list[int] = []
+            while len(replies) < len(cmds):
+                b = self._uart_read_byte_now()
+                if b is None:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.001)
+                    continue
+                i = len(replies)
+                self.metrics.record_latency(cmds[i], time.monotonic() - sent_at[i])
+                replies.append(b)
+
+            if len(replies) < len(cmds):
+                for cmd in cmds[len(replies):]:
+                    self.metrics.record_timeout(cmd)
+                    self._timeouts_in_row += 1
+                return False
+
+            for cmd, b in zip(cmds, replies):
+                self.handle_rx(cmd, b)
+            return True
+
+    # -------------------- FIELD FRESHNESS --------------------
+    def _touch(self, field: str, value: float) -> None:
+        """Mark a decoded field as just refreshed from the board (value = decoded value)."""
+        now = time.monotonic()
+        self._field_ts[field] = now
+        est = self._estimators.get(field)
+        if est is not None:
+            est.update(value, now)
+        self._optimistic.discard(field)
+        self._restored.discard(field)
+        self._publish_value(field, value)
+        if self._pending_sets:
+            self._verify_pending_set(field, value)
+        subs = self._subscribers.get(field)
+        if subs:
+            self._dispatch(subs, value)
+
+    def _set_optimistic(self, field: str, value: float) -> None:
+        """Publish a written-but-not-read-back value (is_verified() stays False until a read)."""
+        self._optimistic.add(field)
+        self._publish_value(field, value)
+
+    # -------------------- CONSISTENT SNAPSHOTS --------------------
+    def begin_cycle(self) -> None:
+        """
+        Start a new request cycle. Pollers call this once per pass over their GET
+        commands (the I/O engine on every wrap, read_many per burst); a HIGH/LOW
+        pair is only decoded from two replies of the same cycle.
+        """
+        self._cycle = next(self._cycles)
+
+    def _note_rx(self, cmd: int) -> None:
+        """Record the cycle of a reply; subclasses call this first in handle_rx()."""
+        self._rx_cycle[cmd & 0xFF] = self._cycle
+
+    def _pair_complete(self, cmd: int, field: str) -> bool:
+        """True if cmd is a half of field and both halves were received in the same cycle."""
+        hi, lo = self.FIELDS[field]
+        if cmd != hi and cmd != lo:
+            return False
+        return lo is None or self._rx_cycle[hi] == self._rx_cycle[lo]
+
+    def _publish_value(self, field: str, value: float) -> None:
+        with self._view_lock:
+            generation, view = self._published
+            updated = dict(view)
+            updated[field] = value
+            self._published = (generation + 1, MappingProxyType(updated))
+
+    def consistent_snapshot(self) -> tuple[int, Mapping[str, float]]:
+        """
+        (generation, {field: value}) of every field decoded (or optimistically
+        written) so far. Lock-free: the pair is read with one attribute access and
+        the mapping is read-only, so it never changes under the reader. The
+        generation grows on every publish, so callers can skip unchanged views.
+        """
+        return self._published
+
+    def is_verified(self, field: str) -> bool:
+        """
+        True if the cached value of field was read back from the board in this
+        session (not an optimistic write, not restored from a saved state).
+        """
+        return (
+            self._field_ts.get(field) is not None
+            and field not in self._optimistic
+            and field not in self._restored
+        )
+
+    def is_restored(self, field: str) -> bool:
+        """True while field still holds a value restored from a saved state."""
+        return field in self._restored
+
+    def field_age(self, field: str) -> float | None:
+        """Seconds since the field was last decoded from the board, or None if never."""
+        ts = self._field_ts.get(field)
+        if ts is None:
+            return None
+        return time.monotonic() - ts
+
+    def _fresh(self, field: str, max_age: float | None) -> bool:
+        """
+        Read-through cache check used by the blocking getters: True if the cached
+        value was read back from the board at most max_age seconds ago.
+        max_age=None always means "go to the UART"; so does a value that was only
+        written (optimistic) or restored from a saved state.
+        """
+        if max_age is None or field in self._optimistic or field in self._restored:
+            return False
+        ts = self._field_ts.get(field)
+        return ts is not None and (time.monotonic() - ts) <= max_age
+
+    # -------------------- PREDICTIVE POLLING --------------------
+    # Fields of PREDICT_TOLERANCE carry a FieldEstimator fed by every read. A poller
+    # can skip their GETs while the prediction is within tolerance, and peek*
+    # (predict=True) serves the predicted value with a flag.
+    def predict(self, field: str) -> tuple[float, float] | None:
+        """(predicted value now, 1-sigma uncertainty), or None if field is not predictable yet."""
+        est = self._estimators.get(field)
+        if est is None or not est.warm or field in self._restored:
+            return None
+        return est.predict(time.monotonic())
+
+    def needs_poll(self, field: str) -> bool:
+        """True if field should be read from the board now (prediction not good enough)."""
+        tolerance = self.PREDICT_TOLERANCE.get(field)
+        if tolerance is None or field in self._optimistic or field in self._pending_sets:
+            return True
+        age = self.field_age(field)
+        if age is None or age > PREDICT_MAX_AGE_S:
+            return True
+        predicted = self.predict(field)
+        return predicted is None or predicted[1] > tolerance
+
+    def due_poll_commands(self) -> list[int]:
+        """poll_commands() limited to the fields that need_poll() right now."""
+        cmds = []
+        for field, (hi, lo) in self.FIELDS.items():
+            if self.needs_poll(field):
+                cmds.append(hi)
+                if lo is not None:
+                    cmds.append(lo)
+        return cmds
+
+    def _peek(self, field: str, value: float, with_age: bool, predict: bool):
+        """
+        Shared body of the subclasses' peek* methods: value, (value, age) with
+        with_age, and with predict a trailing flag that is True when the value
+        returned is a prediction rather than the last value read.
+        """
+        predicted = False
+        if predict:
+            p = self.predict(field)
+            if p is not None:
+                value = type(value)(round(p[0], 2))
+                predicted = True
+        if with_age:
+            age = self.field_age(field)
+            return (value, age, predicted) if predict else (value, age)
+        return (value, predicted) if predict else value
+
+    # -------------------- CHANGE SUBSCRIPTIONS --------------------
+    # Observer API instead of polling peek*: callback(field, value) is called
+    # right where the value is decoded (handle_rx / getters), i.e. on the thread
+    # that owns the UART, so callbacks must be short and must not block.
+    def subscribe(self, field: str, callback, deadband: float = 0.0, relative: bool = False) -> Subscription:
+        """
+        Call callback(field, value) when field changes significantly.
+        deadband: minimum change versus the last delivered value. With
+        relative=True it is a fraction of that value (0.02 = 2 %).
+        The first decode after subscribing is always delivered.
+        """
+        if field not in self.FIELDS:
+            raise ValueError(f"Unknown field for {type(self).__name__}: {field}")
+        sub = Subscription(field, callback, abs(float(deadband)), relative)
+        with self._sub_lock:
+            self._subscribers[field] = self._subscribers.get(field, ()) + (sub,)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._sub_lock:
+            remaining = tuple(s for s in self._subscribers.get(sub.field, ()) if s is not sub)
+            if remaining:
+                self._subscribers[sub.field] = remaining
+            else:
+                self._subscribers.pop(sub.field, None)
+
+    @staticmethod
+    def _dispatch(subs: tuple[Subscription, ...], value: float) -> None:
+        for sub in subs:
+            last = sub.last
+            if last is not None:
+                limit = sub.deadband * abs(last) if sub.relative else sub.deadband
+                delta = abs(value - last)
+                if delta <= limit or delta == 0:
+                    continue
+            sub.last = value
+            try:
+                sub.callback(sub.field, value)
+            except Exception as e:
+                # A faulty observer must not break the receive path
+                print(f"[WARN] subscriber of {sub.field} failed: {e}")
+
+    # -------------------- ASYNC SET --------------------
+    # Non-blocking SET: the caller gets a Future[bool] immediately. The frames are
+    # written by whoever owns the UART (service_sets(), called by the I/O engine
+    # between two GETs) and the result is confirmed by the next regular GET of the
+    # register, so no dedicated read-back is sent. A SET that reads back wrong, or
+    # is not read back within SET_VERIFY_TIMEOUT_S, is rewritten in the background
+    # up to `retries` times before its Future resolves to False.
+    def _queue_set(self, field: str, value: float, frames: tuple[int, int], retries: int) -> Future:
+        pending = PendingSet(field, value, frames, max(1, retries))
+        pending.journal_seq = self._journal_set(field, value, frames, "async", wait=False)
+        if not self.is_open() and self.link_state != "reconnecting":
+            self._resolve_set(pending, False)
+            return pending.futures[0]
+
+        with self._set_lock:
+            # A newer SET of the same register supersedes the older one;
+            # the older callers get the outcome of the newer write.
+            previous = self._pending_sets.get(field)
+            if previous is not None:
+                self._journal_outcome(previous.journal_seq, "superseded", previous.attempts)
+                pending.futures.extend(previous.futures)
+                try:
+                    self._set_outbox.remove(previous)
+                except ValueError:
+                    pass
+            self._pending_sets[field] = pending
+            self._set_outbox.append(pending)
+        return pending.futures[0]
+
+    def pending_sets(self) -> int:
+        """Number of asynchronous SETs not resolved yet."""
+        return len(self._pending_sets)
+
+    def service_sets(self, readback: bool = False) -> None:
+        """
+        Write queued SET frames and handle verify deadlines. Must run on the thread
+        that owns the UART (the I/O engine does this between two GETs).
+        readback=True also reads back registers whose verification is due, for
+        callers that do not poll the register on their own (plain scripts).
+        """
+        if not self.is_open():
+            return  # queued SETs wait (e.g. for a reconnect); close() fails them
+
+        while self._set_outbox:
+            with self._set_lock:
+                if not self._set_outbox or not self._journal_durable(self._set_outbox[0]):
+                    break  # write-ahead: the frames go out once the "set" entry is on disk
+                pending = self._set_outbox.popleft()
+            self._write_pending_set(pending)
+
+        if not self._pending_sets:
+            return
+
+        with self._set_lock:
+            written = [p for p in self._pending_sets.values() if p.written_at is not None]
+        for pending in written:
+            if readback:
+                hi, lo = self.FIELDS[pending.field]
+                with self._uart_lock:
+                    self.begin_cycle()
+                    for cmd in (hi, lo):
+                        if cmd is None:
+                            continue
+                        b = self._get_byte(cmd, timeout_ms=150)
+                        if b is not None:
+                            self.handle_rx(cmd, b)  # verifies through _touch()
+            if (
+                self._pending_sets.get(pending.field) is pending
+                and pending.written_at is not None
+                and time.monotonic() >= pending.deadline
+            ):
+                self._retry_pending_set(pending)
+
+    def _write_pending_set(self, pending: PendingSet) -> None:
+        pending.attempts += 1
+        hi_frame, lo_frame = pending.frames
+        with self._uart_lock:
+            written = self._uart_write_byte(hi_frame) and self._uart_write_byte(lo_frame)
+        if written:
+            pending.written_at = time.monotonic()
+            pending.deadline = pending.written_at + SET_VERIFY_TIMEOUT_S
+        else:
+            pending.written_at = None
+            self._retry_pending_set(pending)
+
+    def _retry_pending_set(self, pending: PendingSet) -> None:
+        """Rewrite a SET that was not confirmed, or give up after its last attempt."""
+        with self._set_lock:
+            if self._pending_sets.get(pending.field) is not pending:
+                return
+            if pending.attempts >= pending.retries or not self.is_open():
+                del self._pending_sets[pending.field]
+                done = True
+            else:
+                pending.written_at = None
+                self._set_outbox.append(pending)
+                done = False
+        if done:
+            self._resolve_set(pending, False)
+        else:
+            self.metrics.record_retry()
+
+    def _verify_pending_set(self, field: str, got: float) -> None:
+        """Called from _touch(): settle a pending SET of field if this read happened after its write."""
+        pending = self._pending_sets.get(field)
+        if pending is None or pending.written_at is None:
+            return
+        hi, lo = self.FIELDS[field]
+        requested_at = self._get_sent_at[hi] if lo is None else min(self._get_sent_at[hi], self._get_sent_at[lo])
+        if requested_at < pending.written_at:
+            return  # at least one half predates the write
+
+        if abs(got - pending.value) <= SET_VERIFY_TOLERANCE:
+            with self._set_lock:
+                if self._pending_sets.get(field) is not pending:
+                    return
+                del self._pending_sets[field]
+            self._resolve_set(pending, True)
+        else:
+            self._retry_pending_set(pending)
+
+    def _fail_pending_sets(self) -> None:
+        with self._set_lock:
+            pending = list(self._pending_sets.values())
+            self._pending_sets.clear()
+            self._set_outbox.clear()
+        for p in pending:
+            self._resolve_set(p, False)
+
+    def _resolve_set(self, pending: PendingSet, ok: bool) -> None:
+        if ok and pending.written_at is not None:
+            self.metrics.record_set_verified(time.monotonic() - pending.written_at)
+        self._journal_outcome(pending.journal_seq, "verified" if ok else "failed", pending.attempts)
+        for fut in pending.futures:
+            if not fut.done():
+                fut.set_result(ok)
+
+    # -------------------- SET JOURNAL --------------------
+    def set_journal(self, journal, board: str) -> None:
+        """Record every SET of this connection in journal (a SetJournal) under board."""
+        self._journal_board = board
+        self._journal = journal
+
+    def _journal_set(
+        self, field: str, value: float, frames: tuple[int, int], mode: str, wait: bool = True
+    ) -> int | None:
+        """
+        Write-ahead "set" entry before the frames are sent; returns its seq (None = no
+        journal). wait=True blocks until the entry is on disk (SETs journaled at the
+        same time share one fsync); async SETs pass False and service_sets() holds
+        their frames back instead (see _journal_durable).
+        """
+        journal = self._journal
+        if journal is None:
+            return None
+        seq = journal.append(
+            {
+                "op": "set",
+                "board": self._journal_board,
+                "field": field,
+                "value": value,
+                "frames": list(frames),
+                "mode": mode,
+            }
+        )
+        if wait and not journal.wait_durable(seq, timeout=JOURNAL_WAIT_S):
+            print(f"[WARN] SET journal entry {seq} not on disk after {JOURNAL_WAIT_S:g} s, sending anyway")
+        return seq
+
+    def _journal_durable(self, pending: PendingSet) -> bool:
+        """True once the frames of pending may be written (its "set" entry is on disk)."""
+        journal = self._journal
+        if journal is None or pending.journal_seq is None or journal.is_durable(pending.journal_seq):
+            return True
+        if time.monotonic() - pending.queued_at < JOURNAL_WAIT_S:
+            return False
+        print(f"[WARN] SET journal entry {pending.journal_seq} not on disk after {JOURNAL_WAIT_S:g} s, sending anyway")
+        return True
+
+    def _journal_outcome(self, seq: int | None, result: str, attempts: int) -> None:
+        journal = self._journal
+        if journal is None or seq is None:
+            return
+        journal.append(
+            {"op": "outcome", "board": self._journal_board, "ref": seq, "result": result, "attempts": attempts}
+        )
+
+    # -------------------- WARM START --------------------
+    def rtt_estimate(self, cmd: int) -> float | None:
+        """Mean GET round trip (seconds) for cmd: measured if possible, else the restored estimate."""
+        h = self.metrics.latency[cmd & 0xFF]
+        if h.count:
+            return h.sum_s / h.count
+        return self._rtt_hint.get(cmd & 0xFF)
+
+    def export_state(self) -> dict:
+        """
+        JSON-ready last-known state: link parameters, every field verified in this
+        session (value + age) and the GET round-trip estimates.
+        """
+        _gen, view = self.consistent_snapshot()
+        fields = {}
+        for field in self.FIELDS:
+            if field in view and self.is_verified(field):
+                fields[field] = {"value": view[field], "age_s": round(self.field_age(field), 3)}
+
+        rtt = {}
+        for cmd in self.poll_commands():
+            est = self.rtt_estimate(cmd)
+            if est is not None:
+                rtt[str(cmd)] = round(est, 6)
+
+        return {"port": self._comPort, "baud": self._baudRate, "fields": fields, "rtt_s": rtt}
+
+    def restore_state(self, state: dict, elapsed_s: float = 0.0) -> None:
+        """
+        Load a state produced by export_state() into the caches, marked as stale:
+        field ages continue from their saved age (+ elapsed_s since the save),
+        is_verified() stays False and the getters' max_age cache is bypassed until
+        the field is read from the board again.
+        """
+        now = time.monotonic()
+        for field, entry in state.get("fields", {}).items():
+            if field not in self.FIELDS or self._field_ts.get(field) is not None:
+                continue  # unknown, or already read in this session
+            value = entry["value"]
+            self._restore_cache(field, value)
+            self._field_ts[field] = now - (float(entry.get("age_s", 0.0)) + elapsed_s)
+            self._restored.add(field)
+            self._publish_value(field, value)
+
+        for cmd, est in state.get("rtt_s", {}).items():
+            self._rtt_hint[int(cmd) & 0xFF] = float(est)
+
     # -------------------- OVERRIDES / EXTENSION POINTS --------------------
     def update(self) -> None:
         """
@@ -153,6 +969,31 @@ class HomeAutomationSystemConnection:
         """
         return
 
+    def set_setpoint(self, value: float) -> bool:
+        """
+        Generic SET hook: write SETPOINT_FIELD on the board.
+        Subclasses map this to their own setter (setDesiredTemp / setCurtainStatus).
+        """
+        raise NotImplementedError("set_setpoint() must be implemented by subclasses")
+
+    def set_setpoint_async(self, value: float) -> Future:
+        """
+        Non-blocking SET hook: queue a write of SETPOINT_FIELD, return a Future[bool].
+        Subclasses map this to setDesiredTempAsync / setCurtainStatusAsync.
+        """
+        raise NotImplementedError("set_setpoint_async() must be implemented by subclasses")
+
+    def _restore_cache(self, field: str, value: float) -> None:
+        """Put a saved value into the decoded cache of field (see restore_state)."""
+        raise NotImplementedError("_restore_cache() must be implemented by subclasses")
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Cached decoded values keyed by FIELDS name (no UART).
+        Subclasses override this; used by generic consumers such as the I/O engine.
+        """
+        return {}
+
     # -------------------- CONFIGURATION --------------------
     def setComPort(self, port: str) -> None:
         """
@@ -0,0 +1,194 @@
+# Author: 152120221098 Emre AVCI
+"""
+Board emulator
+--------------
+Answers the UART protocol of the air conditioner or curtain board on a TCP
+port, so the whole stack (TCP transport, serial bridge, daemon, GUI) can be
+exercised on localhost without PICSimLab or real hardware:
+
+    python board_emulator.py --kind air_conditioner --listen 127.0.0.1:7001
+    python daemon.py --ac-port tcp://127.0.0.1:7001
+
+GET bytes are answered from the board's register map (FIELDS of its connection
+class) with the same encodings the connection decodes; SET HIGH/LOW frames
+change the integral/fractional part of the setpoint. Sensor values drift
+slowly (sine waves) so estimators and trend charts have something to follow.
+All clients see the same board.
+"""
+
+import argparse
+import math
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from discovery import BOARD_CLASSES
+from protocol import DATA_6BIT_MASK, SET_DESIRED_VALUE_HIGH_MASK, encode_fraction
+from tcp_transport import parse_address
+
+# Board answer time after a GET (a PIC at 9600 baud answers within a few ms)
+REPLY_DELAY_S = 0.002
+
+# Setpoint of a freshly started board
+INITIAL_SETPOINT = {"air_conditioner": 22.5, "curtain": 50.0}
+
+
+class EmulatedBoard:
+    """Register values of one board; reply() handles one received protocol byte."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._fields = BOARD_CLASSES[kind].FIELDS
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self.setpoint = INITIAL_SETPOINT[kind]
+        self.gets = 0
+        self.sets = 0
+
+    def values(self) -> dict[str, float]:
+        """Current decoded value of every field."""
+        t = time.monotonic() - self._t0
+        if self.kind == "air_conditioner":
+            ambient = 24.0 + 1.5 * math.sin(2.0 * math.pi * t / 120.0)
+            return {
+                "desired_temp": self.setpoint,
+                "ambient_temp": ambient,
+                "fan_speed": min(100, int(abs(self.setpoint - ambient) * 20.0)),
+            }
+        return {
+            "curtain_status": self.setpoint,
+            "outdoor_temp": 12.0 + 4.0 * math.sin(2.0 * math.pi * t / 300.0),
+            "outdoor_press": 1013.0 + 3.0 * math.sin(2.0 * math.pi * t / 600.0),
+            "light_intensity": 40.0 + 10.0 * math.sin(2.0 * math.pi * t / 90.0),
+        }
+
+    @staticmethod
+    def _encode(field: str, value: float) -> tuple[int, int]:
+        """(HIGH byte, LOW byte) the way the firmware sends the field."""
+        if field == "outdoor_press":
+            raw = int(round(value)) & 0xFFFF  # raw 16-bit hPa
+            return raw >> 8, raw & 0xFF
+        if field == "fan_speed":
+            return int(value) & 0xFF, 0
+        return int(value) & 0xFF, encode_fraction(value)
+
+    def reply(self, b: int) -> int | None:
+        """Response byte to one received byte (None: SET frames and unknown GETs)."""
+        with self._lock:
+            if b & 0x80:
+                self.sets += 1
+                integral, frac = int(self.setpoint), int(round((self.setpoint - int(self.setpoint)) * 10))
+                if (b & SET_DESIRED_VALUE_HIGH_MASK) == SET_DESIRED_VALUE_HIGH_MASK:
+                    integral = b & DATA_6BIT_MASK
+                else:
+                    frac = min(9, b & DATA_6BIT_MASK)
+                self.setpoint = integral + frac / 10.0
+                return None
+
+            values = self.values()
+            for field, (hi, lo) in self._fields.items():
+                if b == hi or b == lo:
+                    self.gets += 1
+                    high, low = self._encode(field, values[field])
+                    return high if b == hi else low
+            return None
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class BoardEmulator:
+    """Serves one EmulatedBoard on a TCP port (one thread per client)."""
+
+    def __init__(self, kind: str, host: str = "127.0.0.1", port: int = 7001, reply_delay_s: float = REPLY_DELAY_S):
+        self.board = EmulatedBoard(kind)
+        self._host = host
+        self._port = port
+        self._reply_delay_s = reply_delay_s
+        self._server = None
+        self._thread: threading.Thread | None = None
+        self._socks: set = set()  # connected clients, closed by stop()
+
+    @property
+    def port(self) -> int:
+        """Bound TCP port (useful when started with port=0)."""
+        if self._server is not None:
+            return self._server.server_address[1]
+        return self._port
+
+    def start(self) -> None:
+        if self._server is not None:
+            return
+        board, delay, socks = self.board, self._reply_delay_s, self._socks
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def setup(self):
+                socks.add(self.request)
+
+            def finish(self):
+                socks.discard(self.request)
+
+            def handle(self):
+                while True:
+                    try:
+                        data = self.request.recv(256)
+                    except OSError:
+                        return
+                    if not data:
+                        return
+                    out = bytes(r for r in map(board.reply, data) if r is not None)
+                    if out:
+                        time.sleep(delay)
+                        self.request.sendall(out)
+
+        self._server = _Server((self._host, self._port), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="board-emulator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.shutdown()
+            self._server.server_close()
+            # Like a powered-off board: clients see their connection drop
+            for sock in list(self._socks):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        finally:
+            self._server = None
+            self._thread = None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Emulate a board on a TCP port")
+    parser.add_argument("--kind", choices=sorted(BOARD_CLASSES), default="air_conditioner", help="Board to emulate")
+    parser.add_argument("--listen", default="127.0.0.1:7001", help="host:port to listen on")
+    args = parser.parse_args(argv)
+
+    host, port = parse_address(args.listen)
+    emulator = BoardEmulator(args.kind, host, port)
+    try:
+        emulator.start()
+    except OSError as e:
+        print(f"[ERROR] Cannot listen on {host}:{port}: {e}")
+        return 1
+    print(f"[OK] {args.kind} emulator on tcp://{host}:{emulator.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
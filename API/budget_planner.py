@@ -0,0 +1,399 @@
+# Author: 152120221098 Emre AVCI
+"""
+UART bandwidth budget planner
+-----------------------------
+At 9600 baud 8N1 a port moves about 960 bytes per second, but one GET costs
+far more than its two bytes: the request byte, the WRITE_PACING_S pause after
+every written byte, the firmware turnaround and the reply byte, i.e. about
+19 ms, or roughly 50 GETs per second. A two-byte field (HIGH + LOW) takes two
+GETs.
+
+Given freshness targets (the largest acceptable age of each field, with a
+priority), plan() checks per port whether the targets fit into the usable
+share of that budget (RESERVE_SHARE is kept free for SETs) and then:
+- allocates poll slots: one frame of GET opcodes per board in which every field
+  appears in proportion to its required rate (the I/O engine cycles the frame),
+  plus the idle time between two frames
+- if the targets do not fit, relaxes them starting with the lowest priority
+  (each field at most MAX_STRETCH times its target) and explains every change
+- rounds the slot counts of the frame at the expense of the lowest priorities
+  as well, and reports every field that rounding made slower than planned
+
+Costs use the measured GET round trips of the connection when available
+(rtt_estimate), otherwise the link model.
+
+Targets file (daemon.py --budget), fields not listed get DEFAULT_TARGET_S:
+
+    {"curtain.light_intensity": {"max_age_s": 0.5, "priority": 2},
+     "air_conditioner.ambient_temp": {"max_age_s": 1.0, "priority": 1}}
+
+Usage:
+  python budget_planner.py targets.json           (prints the plan of both boards)
+"""
+
+import json
+import math
+import sys
+from dataclasses import dataclass, field
+
+from base_connections import WRITE_PACING_S
+
+BITS_PER_BYTE_8N1 = 10  # start bit + 8 data bits + stop bit
+TURNAROUND_S = 0.002  # firmware time to answer a GET (model, when not measured)
+RESERVE_SHARE = 0.1  # share of the line kept free for SETs and retries
+MAX_STRETCH = 10.0  # a degraded target is relaxed to at most this many times its value
+MAX_FRAME_SLOTS = 64  # upper bound of GET opcodes in one planned frame
+DEFAULT_TARGET_S = 2.0
+DEFAULT_PRIORITY = 0
+
+
+@dataclass
+class LinkParams:
+    baud: int = 9600
+    bits_per_byte: int = BITS_PER_BYTE_8N1
+    pacing_s: float = WRITE_PACING_S
+    turnaround_s: float = TURNAROUND_S
+    reserve_share: float = RESERVE_SHARE
+
+    @property
+    def byte_time_s(self) -> float:
+        return self.bits_per_byte / float(self.baud)
+
+    @property
+    def raw_bytes_per_s(self) -> float:
+        return self.baud / float(self.bits_per_byte)
+
+    def get_cost_s(self) -> float:
+        """Modeled line time of one GET: request byte + pacing + turnaround + reply byte."""
+        return 2 * self.byte_time_s + self.pacing_s + self.turnaround_s
+
+
+@dataclass
+class FieldTarget:
+    board: str
+    field: str
+    max_age_s: float = DEFAULT_TARGET_S
+    priority: int = DEFAULT_PRIORITY  # higher = degraded last
+
+
+@dataclass
+class Allocation:
+    board: str
+    field: str
+    priority: int
+    target_s: float
+    cost_s: float  # line time of one refresh (all GETs of the field)
+    planned_s: float = 0.0  # planned refresh period
+    slots: int = 0  # appearances in the board's frame
+
+    @property
+    def degraded(self) -> bool:
+        return self.planned_s > self.target_s * 1.0001
+
+
+@dataclass
+class PortPlan:
+    port: str
+    link: LinkParams
+    allocations: list[Allocation]
+    required_share: float  # line share the targets need
+    fits: bool
+    frames: dict = field(default_factory=dict)  # board -> [GET opcodes]
+    idle_s: dict = field(default_factory=dict)  # board -> pause after each frame
+    notes: list[str] = field(default_factory=list)
+
+    @property
+    def usable_share(self) -> float:
+        return 1.0 - self.link.reserve_share
+
+    @property
+    def planned_share(self) -> float:
+        return sum(a.cost_s / a.planned_s for a in self.allocations if a.planned_s > 0)
+
+
+@dataclass
+class BudgetPlan:
+    ports: dict = field(default_factory=dict)  # port -> PortPlan
+
+    @property
+    def fits(self) -> bool:
+        return all(p.fits for p in self.ports.values())
+
+    def frames(self) -> dict:
+        """board -> (GET opcodes of one frame, idle seconds after the frame)."""
+        out = {}
+        for p in self.ports.values():
+            for board, frame in p.frames.items():
+                out[board] = (frame, p.idle_s.get(board, 0.0))
+        return out
+
+    def report(self) -> str:
+        lines = []
+        for p in self.ports.values():
+            gets_per_s = 1.0 / p.link.get_cost_s()
+            lines.append(
+                f"Port {p.port}: {p.link.baud} baud = {p.link.raw_bytes_per_s:.0f} B/s raw, "
+                f"~{gets_per_s:.0f} GET/s with {p.link.pacing_s * 1000:.0f} ms pacing "
+                f"(~{2 * gets_per_s:.0f} B/s)"
+            )
+            lines.append(
+                f"  targets need {p.required_share * 100:.1f}% of the line, "
+                f"usable {p.usable_share * 100:.0f}% -> {'fits' if p.fits else 'DOES NOT FIT'}; "
+                f"planned {p.planned_share * 100:.1f}%"
+            )
+            for a in sorted(p.allocations, key=lambda a: (a.board, -a.priority, a.field)):
+                mark = "  degraded" if a.degraded else ""
+                lines.append(
+                    f"  {a.board}.{a.field:<16} prio {a.priority}  target {a.target_s:6.2f} s  "
+                    f"planned {a.planned_s:6.2f} s  slots {a.slots}  cost {a.cost_s * 1000:5.1f} ms{mark}"
+                )
+            for board, frame in p.frames.items():
+                lines.append(f"  {board}: frame of {len(frame)} GETs, idle {p.idle_s[board] * 1000:.0f} ms")
+            lines.extend(f"  - {n}" for n in p.notes)
+        return "\n".join(lines)
+
+
+# -------------------- PLANNING --------------------
+def _field_cost(conn, name: str, link: LinkParams) -> float:
+    """Line time of one refresh of a field: measured RTTs if known, else the model."""
+    cost = 0.0
+    for cmd in conn.FIELDS[name]:
+        if cmd is None:
+            continue
+        measured = conn.rtt_estimate(cmd) if hasattr(conn, "rtt_estimate") else None
+        cost += measured if measured else link.get_cost_s()
+    return cost
+
+
+def _degrade(allocs: list[Allocation], over: float, notes: list[str]) -> float:
+    """
+    Relax targets, lowest priority first, until `over` (excess line share) is gone.
+    Within one priority level all fields are stretched by the same factor.
+    Returns the share that could not be freed (0 when the plan fits).
+    """
+    for prio in sorted({a.priority for a in allocs}):
+        if over <= 1e-12:
+            break
+        level = [a for a in allocs if a.priority == prio]
+        share = sum(a.cost_s / a.planned_s for a in level)
+        floor = share / MAX_STRETCH
+        if share - floor >= over:
+            factor = share / (share - over)
+            over = 0.0
+        else:
+            factor = MAX_STRETCH
+            over -= share - floor
+        for a in level:
+            a.planned_s *= factor
+        names = ", ".join(f"{a.board}.{a.field}" for a in level)
+        notes.append(f"priority {prio} ({names}): targets relaxed x{factor:.2f} to fit the line budget")
+    return over
+
+
+def _opcodes(conn, name: str) -> list[int]:
+    hi, lo = conn.FIELDS[name]
+    return [hi] if lo is None else [hi, lo]  # HIGH before LOW, as in poll_commands()
+
+
+def _fit_slots(allocs: list[Allocation], conn, period: float, share: float) -> tuple[list[int], float] | None:
+    """
+    Slots of a frame of the given period: ceil(P / T) per field planned every T
+    seconds. If rounding makes the frame longer than `share` of the period, the
+    lowest priorities give slots back first (each field keeps at least one), so
+    higher priorities keep their planned period. Returns (slots, duration), or
+    None if the frame is too long or does not fit even then.
+    """
+    slots = [max(1, math.ceil(period / a.planned_s - 1e-9)) for a in allocs]
+    if sum(n * len(_opcodes(conn, a.field)) for n, a in zip(slots, allocs)) > MAX_FRAME_SLOTS:
+        return None
+    budget = share * period + 1e-12
+    duration = sum(n * a.cost_s for n, a in zip(slots, allocs))
+    for prio in sorted({a.priority for a in allocs}):
+        while duration > budget:
+            level = [i for i, a in enumerate(allocs) if a.priority == prio and slots[i] > 1]
+            if not level:
+                break
+            # Take the slot whose loss stretches its field the least
+            i = min(level, key=lambda i: period / (slots[i] - 1) / allocs[i].planned_s)
+            slots[i] -= 1
+            duration -= allocs[i].cost_s
+        if duration <= budget:
+            return slots, duration
+    return None
+
+
+def _build_frame(
+    allocs: list[Allocation], conn, share: float, notes: list[str]
+) -> tuple[list[int], float, float]:
+    """
+    One poll frame for one board, using at most `share` of the line. Candidate
+    frame periods are multiples of the planned periods; the one whose rounding
+    hurts the least is used: no field slower than planned if possible, else
+    only the lowest priority possible and by the smallest factor (shorter frames
+    win ties). Rounding losses are explained in notes. Returns (opcodes, frame
+    duration, period).
+    """
+    best = None  # (score, period, slots, duration)
+    fallback = None  # (duration / P, P, slots, duration): least overloaded frame
+    for a in allocs:
+        for k in range(1, MAX_FRAME_SLOTS + 1):
+            period = k * a.planned_s
+            fitted = _fit_slots(allocs, conn, period, share)
+            if fitted is None:
+                slots = [max(1, math.ceil(period / b.planned_s - 1e-9)) for b in allocs]
+                if sum(n * len(_opcodes(conn, b.field)) for n, b in zip(slots, allocs)) > MAX_FRAME_SLOTS:
+                    break
+                duration = sum(n * b.cost_s for n, b in zip(slots, allocs))
+                load = duration / period
+                if fallback is None or load < fallback[0]:
+                    fallback = (load, period, slots, duration)
+                continue
+            slots, duration = fitted
+            stretched = [
+                (b.priority, period / n / b.planned_s)
+                for n, b in zip(slots, allocs)
+                if period / n > b.planned_s * 1.0001
+            ]
+            score = max(stretched) if stretched else (-math.inf, 1.0)
+            if best is None or (score, period) < (best[0], best[1]):
+                best = (score, period, slots, duration)
+
+    if best is not None:
+        _score, period, slots, duration = best
+    else:
+        # Even the lowest priorities at one slot per frame do not fit: stretch the
+        # period of the least loaded frame (every field slows down by the same factor)
+        _load, period, slots, duration = fallback
+        notes.append(
+            f"{allocs[0].board}: frame rounding does not fit the line share, "
+            f"every field slowed down x{duration / share / period:.2f}"
+        )
+        period = duration / share
+    for a, n in zip(allocs, slots):
+        if best is not None and period / n > a.planned_s * 1.0001:
+            notes.append(
+                f"frame rounding: {a.board}.{a.field} (priority {a.priority}) refreshed every "
+                f"{period / n:.3f} s instead of {a.planned_s:.3f} s"
+            )
+        a.slots = n
+
+    # Smooth weighted round robin: spread each field's slots evenly over the frame
+    order: list[Allocation] = []
+    credit = {id(a): 0.0 for a in allocs}
+    total = sum(slots)
+    for _ in range(total):
+        for a in allocs:
+            credit[id(a)] += a.slots
+        pick = max(allocs, key=lambda a: credit[id(a)])
+        credit[id(pick)] -= total
+        order.append(pick)
+
+    frame = [cmd for a in order for cmd in _opcodes(conn, a.field)]
+    return frame, duration, period
+
+
+def plan(connections: dict, targets: list[FieldTarget] | None = None, link: LinkParams | None = None) -> BudgetPlan:
+    """
+    Plan the polling of {board: connection}. Fields without a FieldTarget get
+    DEFAULT_TARGET_S / DEFAULT_PRIORITY. Boards sharing a port share its budget.
+    """
+    link = link or LinkParams()
+    wanted = {(t.board, t.field): t for t in (targets or [])}
+    unknown = [f"{b}.{f}" for b, f in wanted if b not in connections or f not in connections[b].FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown board field(s) in targets: {', '.join(unknown)}")
+
+    by_port: dict[str, list[str]] = {}
+    for board, conn in connections.items():
+        by_port.setdefault(conn._comPort, []).append(board)
+
+    result = BudgetPlan()
+    for port, boards in by_port.items():
+        port_link = LinkParams(
+            connections[boards[0]]._baudRate, link.bits_per_byte, link.pacing_s, link.turnaround_s, link.reserve_share
+        )
+        allocs = []
+        for board in boards:
+            conn = connections[board]
+            for name in conn.FIELDS:
+                t = wanted.get((board, name), FieldTarget(board, name))
+                target = max(float(t.max_age_s), 1e-3)
+                allocs.append(Allocation(board, name, int(t.priority), target, _field_cost(conn, name, port_link), target))
+
+        usable = 1.0 - port_link.reserve_share
+        required = sum(a.cost_s / a.target_s for a in allocs)
+        p = PortPlan(port, port_link, allocs, required, required <= usable)
+        if not p.fits:
+            p.notes.append(
+                f"targets need {required * 100:.1f}% of the line but only {usable * 100:.0f}% is usable "
+                f"({port_link.reserve_share * 100:.0f}% kept for SETs)"
+            )
+            left = _degrade(allocs, required - usable, p.notes)
+            if left > 1e-12:
+                # Even fully relaxed it does not fit: stretch everything uniformly
+                factor = (usable + left) / usable
+                for a in allocs:
+                    a.planned_s *= factor
+                p.notes.append(
+                    f"still {left * 100:.1f}% over at x{MAX_STRETCH:g} relaxation: "
+                    f"every field slowed down by another x{factor:.2f}"
+                )
+
+        # Each board gets its share of the port (in proportion to what it needs):
+        # a frame of GETs, then idle time
+        need = sum(a.cost_s / a.planned_s for a in allocs)
+        for board in boards:
+            mine = [a for a in allocs if a.board == board]
+            share = usable * sum(a.cost_s / a.planned_s for a in mine) / need
+            frame, duration, period = _build_frame(mine, connections[board], share, p.notes)
+            for a in mine:
+                a.planned_s = period / a.slots
+            p.frames[board] = frame
+            p.idle_s[board] = max(0.0, period - duration)
+        result.ports[port] = p
+    return result
+
+
+def load_targets(path: str) -> list[FieldTarget]:
+    """Read freshness targets from a JSON file (format in the module docstring)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    targets = []
+    for key, spec in data.items():
+        board, sep, name = key.partition(".")
+        if not sep:
+            raise ValueError(f"Expected 'board.field', got {key!r}")
+        if not isinstance(spec, dict):
+            spec = {"max_age_s": spec}
+        targets.append(
+            FieldTarget(board, name, float(spec.get("max_age_s", DEFAULT_TARGET_S)), int(spec.get("priority", 0)))
+        )
+    return targets
+
+
+def main(argv=None) -> int:
+    """Print the plan of a targets file for both boards (modeled costs, no UART)."""
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) > 1:
+        print("usage: python budget_planner.py [targets.json]")
+        return 2
+
+    # Imported here: only the CLI needs the concrete boards
+    from air_conditioner import AirConditionerControlSystemConnection
+    from curtain_control import CurtainControlSystemConnection
+
+    connections = {
+        "air_conditioner": AirConditionerControlSystemConnection("AC"),
+        "curtain": CurtainControlSystemConnection("CURTAIN"),
+    }
+    try:
+        targets = load_targets(args[0]) if args else []
+        print(plan(connections, targets).report())
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
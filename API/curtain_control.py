@@ -1,6 +1,8 @@
 # Author: 152120221098 Emre AVCI
 import time
-from base_connections import HomeAutomationSystemConnection
+from concurrent.futures import Future
+
+from base_connections import SET_VERIFY_TOLERANCE, HomeAutomationSystemConnection
 from protocol import (
     GET_DESIRED_CURTAIN_HIGH,
     GET_DESIRED_CURTAIN_LOW,
@@ -20,6 +22,18 @@ from protocol import (
 
 
 class CurtainControlSystemConnection(HomeAutomationSystemConnection):
+    # Register map: decoded field -> (HIGH opcode, LOW opcode)
+    FIELDS = {
+        "curtain_status": (GET_DESIRED_CURTAIN_HIGH, GET_DESIRED_CURTAIN_LOW),
+        "outdoor_temp": (GET_OUTDOOR_TEMPERATURE_HIGH, GET_OUTDOOR_TEMPERATURE_LOW),
+        "outdoor_press": (GET_OUTDOOR_PRESSURE_HIGH, GET_OUTDOOR_PRESSURE_LOW),
+        "light_intensity": (GET_LIGHT_INTENSITY_HIGH, GET_LIGHT_INTENSITY_LOW),
+    }
+    SETPOINT_FIELD = "curtain_status"
+
+    # Predictive polling (see needs_poll): outdoor readings follow smooth curves
+    PREDICT_TOLERANCE = {"outdoor_temp": 0.1, "outdoor_press": 0.2, "light_intensity": 0.5}
+
     def __init__(self, com_port: str = "COM8", baud_rate: int = 9600):
         super().__init__(com_port, baud_rate)
 
@@ -43,22 +57,45 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
     # -------------------- PEEK (NO UART) --------------------
     # These functions return cached values only (no serial I/O).
     # This is important for the GUI because it keeps UI updates instant and non-blocking.
-    def peekCurtainStatus(self) -> float:
-        return self.__curtainStatus
-
-    def peekOutdoorTemp(self) -> float:
-        return self.__outdoorTemperature
-
-    def peekOutdoorPress(self) -> float:
-        return self.__outdoorPressure
-
-    def peekLightIntensity(self) -> float:
-        return self.__lightIntensity
+    # with_age=True returns (value, seconds since it was read from the board or None).
+    # predict=True adds a flag (last item) and, for PREDICT_TOLERANCE fields, returns
+    # the estimator's current prediction instead of the last read value (flag True).
+    def peekCurtainStatus(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("curtain_status", self.__curtainStatus, with_age, predict)
+
+    def peekOutdoorTemp(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("outdoor_temp", self.__outdoorTemperature, with_age, predict)
+
+    def peekOutdoorPress(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("outdoor_press", self.__outdoorPressure, with_age, predict)
+
+    def peekLightIntensity(self, with_age: bool = False, predict: bool = False) -> float | tuple:
+        return self._peek("light_intensity", self.__lightIntensity, with_age, predict)
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "curtain_status": self.__curtainStatus,
+            "outdoor_temp": self.__outdoorTemperature,
+            "outdoor_press": self.__outdoorPressure,
+            "light_intensity": self.__lightIntensity,
+        }
+
+    def _restore_cache(self, field: str, value: float) -> None:
+        if field == "curtain_status":
+            self.__curtainStatus = float(value)
+        elif field == "outdoor_temp":
+            self.__outdoorTemperature = float(value)
+        elif field == "outdoor_press":
+            self.__outdoorPressure = float(value)
+        elif field == "light_intensity":
+            self.__lightIntensity = float(value)
 
     # -------------------- ASYNC RX HANDLER --------------------
     # handle_rx() is called by the GUI polling loop when ONE response byte arrives.
     # cmd tells us which field this byte belongs to.
     def handle_rx(self, cmd: int, value: int) -> None:
+        self._note_rx(cmd)
+
         # Store the raw response byte into the corresponding cache slot
         if cmd == GET_DESIRED_CURTAIN_HIGH:
             self._cur_h = value
@@ -78,29 +115,34 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
             self._light_l = value
 
         # Curtain status is represented as HIGH=int part, LOW=fraction part
-        # Only update the float when both bytes are available.
-        if (self._cur_h is not None) and (self._cur_l is not None):
+        # Only update the float when both bytes belong to the same request cycle,
+        # so a new HIGH is never combined with an old LOW.
+        if self._pair_complete(cmd, "curtain_status"):
             self.__curtainStatus = combine_int_frac(self._cur_h, self._cur_l)
+            self._touch("curtain_status", self.__curtainStatus)
 
         # Temperature uses a signed integer for the HIGH byte (negative temps possible).
         # LOW contains the fractional digit/part.
-        if (self._temp_h is not None) and (self._temp_l is not None):
+        if self._pair_complete(cmd, "outdoor_temp"):
             signed_h = self._temp_h - 256 if self._temp_h >= 128 else self._temp_h
             self.__outdoorTemperature = combine_int_frac(signed_h, self._temp_l)
+            self._touch("outdoor_temp", self.__outdoorTemperature)
 
         # Light intensity is also combined from HIGH+LOW like other fixed-point values.
-        if (self._light_h is not None) and (self._light_l is not None):
+        if self._pair_complete(cmd, "light_intensity"):
             self.__lightIntensity = combine_int_frac(self._light_h, self._light_l)
+            self._touch("light_intensity", self.__lightIntensity)
 
         # Pressure handling depends on firmware representation:
         # - Some firmware versions send "H + (L/10)" like fixed-point with 1 decimal.
         # - Others send a raw 16-bit value (H<<8 | L).
         # This heuristic keeps compatibility with both.
-        if (self._press_h is not None) and (self._press_l is not None):
+        if self._pair_complete(cmd, "outdoor_press"):
             if self._press_l <= 9 and self._press_h <= 200:
                 self.__outdoorPressure = float(self._press_h) + (self._press_l / 10.0)
             else:
                 self.__outdoorPressure = float((self._press_h << 8) | self._press_l)
+            self._touch("outdoor_press", self.__outdoorPressure)
 
     # -------------------- UPDATE (LEGACY) --------------------
     # Legacy blocking update method. The GUI now prefers async polling, but this remains usable.
@@ -131,63 +173,85 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
         #   LOW  frame: 10dddddd (mask selects "low/frac" payload)
         frac_byte = SET_DESIRED_VALUE_LOW_MASK | (frac_digit & DATA_6BIT_MASK)
         int_byte = SET_DESIRED_VALUE_HIGH_MASK | (integral & DATA_6BIT_MASK)
+        seq = self._journal_set("curtain_status", val, (int_byte, frac_byte), "sync")
+
+        # Hold the UART for the whole write + read-back so concurrent readers cannot
+        # flush the verification reply
+        with self._uart_lock:
+            for attempt in range(retries):
+                if attempt > 0:
+                    self.metrics.record_retry()
+                try:
+                    # Flush RX before sending to avoid mixing old responses with new ones
+                    self._uart_flush_input()
+
+                    # Send order matters: we send integral first, then fractional.
+                    # This should match the firmware's expected parsing order.
+                    if not self._uart_write_byte(int_byte):
+                        continue
+                    time.sleep(0.01)  # small gap helps some firmware UART handlers
+
+                    if not self._uart_write_byte(frac_byte):
+                        continue
+                    written_at = time.monotonic()
+                    time.sleep(0.01)
+
+                    # Read back the stored value to confirm the firmware accepted it
+                    h = self._get_byte(GET_DESIRED_CURTAIN_HIGH, timeout_ms=150)
+                    l = self._get_byte(GET_DESIRED_CURTAIN_LOW, timeout_ms=150)
+                    if (h is None) or (l is None):
+                        continue
+
+                    got = combine_int_frac(h, l)
+
+                    # Accept small tolerance due to decimal encoding/rounding
+                    if abs(got - val) <= SET_VERIFY_TOLERANCE:
+                        # Update internal caches so UI reflects the new state immediately
+                        self._cur_h, self._cur_l = h, l
+                        self.__curtainStatus = got
+                        self._touch("curtain_status", self.__curtainStatus)
+                        self.metrics.record_set_verified(time.monotonic() - written_at)
+                        self._journal_outcome(seq, "verified", attempt + 1)
+                        return True
+
+                except Exception:
+                    # Retry on any UART/parsing exception
+                    pass
+
+            self._journal_outcome(seq, "failed", retries)
+            return False
 
-        for _ in range(retries):
-            try:
-                # Flush RX before sending to avoid mixing old responses with new ones
-                self._uart_flush_input()
-
-                # Send order matters: we send integral first, then fractional.
-                # This should match the firmware's expected parsing order.
-                if not self._uart_write_byte(int_byte):
-                    continue
-                time.sleep(0.01)  # small gap helps some firmware UART handlers
-
-                if not self._uart_write_byte(frac_byte):
-                    continue
-                time.sleep(0.01)
-
-                # Read back the stored value to confirm the firmware accepted it
-                h = self._get_byte(GET_DESIRED_CURTAIN_HIGH, timeout_ms=150)
-                l = self._get_byte(GET_DESIRED_CURTAIN_LOW, timeout_ms=150)
-                if (h is None) or (l is None):
-                    continue
-
-                got = combine_int_frac(h, l)
-
-                # Accept small tolerance due to decimal encoding/rounding
-                if abs(got - val) <= 0.11:
-                    # Update internal caches so UI reflects the new state immediately
-                    self._cur_h, self._cur_l = h, l
-                    self.__curtainStatus = got
-                    return True
-
-            except Exception:
-                # Retry on any UART/parsing exception
-                pass
-
-        return False
-
-    # -------------------- GET (BLOCKING, SINGLE BYTE) --------------------
-    # _get_byte issues one GET command and waits for a single response byte.
-    # It is used by blocking getters and by SET verification.
-    def _get_byte(self, cmd: int, timeout_ms: int = 80) -> int | None:
-        if not self.is_open():
-            return None
-
-        # Flush to ensure the next byte is for THIS command
-        self._uart_flush_input()
+    def set_setpoint(self, value: float) -> bool:
+        return self.setCurtainStatus(value)
 
-        if not self._uart_write_byte(cmd):
-            return None
+    # -------------------- SET (NON-BLOCKING, VERIFIED) --------------------
+    # Same frames as setCurtainStatus(), but the caller gets a Future[bool] at once.
+    # Instead of a dedicated read-back, the next polled read of the curtain register
+    # confirms the write; mismatches are rewritten in the background (see _queue_set).
+    def setCurtainStatusAsync(self, std: float, retries: int = 3) -> Future:
+        val = max(0.0, min(100.0, float(std)))
+        integral = int(val)
+        frac_digit = encode_fraction(val) & 0x3F
+        frames = (
+            SET_DESIRED_VALUE_HIGH_MASK | (integral & DATA_6BIT_MASK),
+            SET_DESIRED_VALUE_LOW_MASK | (frac_digit & DATA_6BIT_MASK),
+        )
+        return self._queue_set("curtain_status", val, frames, retries)
 
-        # Deadline-based read prevents UI freeze in case the firmware does not respond
-        return self._uart_read_byte_deadline(timeout_ms=timeout_ms)
+    def set_setpoint_async(self, value: float) -> Future:
+        return self.setCurtainStatusAsync(value)
 
     # -------------------- GETTERS (BLOCKING, DECODED) --------------------
-    # These methods actively query the PIC and update caches if successful.
+    # These methods actively query the PIC (via the shared _get_byte) and update caches if successful.
     # If a read fails, they return the last cached value.
-    def getCurtainStatus(self) -> float:
+    # max_age (seconds): return the cached value without a round trip if it was read
+    # from the board (e.g. by handle_rx polling) at most that long ago.
+    def getCurtainStatus(self, max_age: float | None = None) -> float:
+        if self._fresh("curtain_status", max_age):
+            return self.__curtainStatus
+        return self._single_flight("curtain_status", self._read_curtain_status)
+
+    def _read_curtain_status(self) -> float:
         h = self._get_byte(GET_DESIRED_CURTAIN_HIGH)
         if h is None:
             return self.__curtainStatus
@@ -198,9 +262,15 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
 
         self._cur_h, self._cur_l = h, l
         self.__curtainStatus = combine_int_frac(h, l)
+        self._touch("curtain_status", self.__curtainStatus)
         return self.__curtainStatus
 
-    def getOutdoorTemp(self) -> float:
+    def getOutdoorTemp(self, max_age: float | None = None) -> float:
+        if self._fresh("outdoor_temp", max_age):
+            return self.__outdoorTemperature
+        return self._single_flight("outdoor_temp", self._read_outdoor_temp)
+
+    def _read_outdoor_temp(self) -> float:
         # Temperature read order here is LOW then HIGH (kept as-is to match your firmware behavior)
         l = self._get_byte(GET_OUTDOOR_TEMPERATURE_LOW)
         if l is None:
@@ -213,9 +283,15 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
         self._temp_h, self._temp_l = h, l
         signed_h = h - 256 if h >= 128 else h
         self.__outdoorTemperature = combine_int_frac(signed_h, l)
+        self._touch("outdoor_temp", self.__outdoorTemperature)
         return self.__outdoorTemperature
 
-    def getOutdoorPress(self) -> float:
+    def getOutdoorPress(self, max_age: float | None = None) -> float:
+        if self._fresh("outdoor_press", max_age):
+            return self.__outdoorPressure
+        return self._single_flight("outdoor_press", self._read_outdoor_press)
+
+    def _read_outdoor_press(self) -> float:
         h = self._get_byte(GET_OUTDOOR_PRESSURE_HIGH)
         if h is None:
             return self.__outdoorPressure
@@ -232,9 +308,15 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
         else:
             self.__outdoorPressure = float((h << 8) | l)
 
+        self._touch("outdoor_press", self.__outdoorPressure)
         return self.__outdoorPressure
 
-    def getLightIntensity(self) -> float:
+    def getLightIntensity(self, max_age: float | None = None) -> float:
+        if self._fresh("light_intensity", max_age):
+            return self.__lightIntensity
+        return self._single_flight("light_intensity", self._read_light_intensity)
+
+    def _read_light_intensity(self) -> float:
         h = self._get_byte(GET_LIGHT_INTENSITY_HIGH)
         if h is None:
             return self.__lightIntensity
@@ -245,4 +327,5 @@ class CurtainControlSystemConnection(HomeAutomationSystemConnection):
 
         self._light_h, self._light_l = h, l
         self.__lightIntensity = combine_int_frac(h, l)
+        self._touch("light_intensity", self.__lightIntensity)
         return self.__lightIntensity
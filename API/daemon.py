@@ -0,0 +1,336 @@
+# Author: 152120221098 Emre AVCI
+"""
+Home Automation System - Headless Service
+-----------------------------------------
+Runs data collection without a GUI (tkinter is never imported, no display needed):
+- one SerialIOEngine per configured board (polling on worker threads)
+- optional CSV recorder of the decoded caches
+- optional Prometheus metrics endpoint
+- optional HTTP/WebSocket gateway sharing the boards with local clients (gateway.py)
+- optional cross-board automation rules loaded from JSON (rules.py)
+- optional shared-memory snapshots for other local processes (shm_snapshot.py)
+- optional warm start from the last saved state (state_store.py)
+
+The Tk GUI (main_gui.py) is an optional client; it is not needed for collection.
+
+Usage examples:
+  python daemon.py --ac-port COM8 --cur-port COM10 --metrics-port 9108 --record values.csv
+  python daemon.py --cur-port COM10 --gateway-port 8080
+  python daemon.py --auto-detect --gateway-port 8080
+  python daemon.py --ac-port COM8 --cur-port COM10 --rules rules.json
+  python daemon.py --cur-port COM10 --shm      (then: python shm_snapshot.py curtain)
+  python daemon.py --cur-port COM10 --state-file last_state.json
+  python daemon.py --cur-port COM10 --budget targets.json   (see budget_planner.py)
+  python daemon.py --ac-port COM8 --cur-port COM10 --journal set_journal.jsonl
+  python daemon.py --ac-port tcp://127.0.0.1:7000   (board behind serial_bridge.py / board_emulator.py)
+  python daemon.py --cur-port COM10 --measure-startup
+"""
+
+import time
+
+_T0 = time.perf_counter()  # cold-start reference (see --measure-startup)
+
+import argparse
+import queue
+import signal
+import sys
+import threading
+from dataclasses import dataclass
+
+from air_conditioner import AirConditionerControlSystemConnection
+from curtain_control import CurtainControlSystemConnection
+from io_engine import SerialIOEngine
+from metrics import MetricsServer
+from recorder import CsvRecorder
+
+
+@dataclass
+class ServiceConfig:
+    """Holds service configuration parameters."""
+    ac_port: str | None
+    cur_port: str | None
+    auto_detect: bool
+    baud: int
+    metrics_port: int | None
+    gateway_port: int | None
+    record_path: str | None
+    record_interval: float
+    rules_path: str | None
+    shm: bool
+    shm_force: bool
+    state_path: str | None
+    predictive: bool
+    budget_path: str | None
+    journal_path: str | None
+    measure_startup: bool
+
+
+class HeadlessService:
+    """Owns the connections, their I/O engines, the recorder and the metrics server."""
+
+    def __init__(self, cfg: ServiceConfig) -> None:
+        self.cfg = cfg
+        self.connections: dict = {}
+        self.engines: dict[str, SerialIOEngine] = {}
+        self.updates: queue.Queue = queue.Queue()
+        self.metrics_server: MetricsServer | None = None
+        self.recorder: CsvRecorder | None = None
+        self.gateway = None  # GatewayServer when --gateway-port is given
+        self.rules = None  # RuleEngine when --rules is given
+        self.shm_publishers: list = []  # SharedSnapshotPublisher per board when --shm is given
+        self.state_store = None  # StateStore when --state-file is given
+        self.journal = None  # SetJournal when --journal is given
+        self._desired: dict = {}  # desired state per board replayed from the journal
+        self._stop = threading.Event()
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self.cfg.state_path:
+            from state_store import StateStore
+
+            self.state_store = StateStore(self.cfg.state_path)
+            self.state_store.load()
+
+        if self.cfg.journal_path:
+            from set_journal import SetJournal
+
+            self.journal = SetJournal(self.cfg.journal_path)
+            self._desired = self.journal.open()
+
+        if self.cfg.auto_detect:
+            # Imported on demand: only needed when scanning for boards
+            from discovery import discover
+
+            for name, conn in discover(baud=self.cfg.baud).items():
+                if name == "air_conditioner" and self.cfg.ac_port or name == "curtain" and self.cfg.cur_port:
+                    conn.close()  # an explicit port wins
+                    continue
+                self._add_board(name, conn)
+
+        if self.cfg.ac_port:
+            self._add_board(
+                "air_conditioner",
+                AirConditionerControlSystemConnection(self.cfg.ac_port, self.cfg.baud),
+            )
+        if self.cfg.cur_port:
+            self._add_board(
+                "curtain",
+                CurtainControlSystemConnection(self.cfg.cur_port, self.cfg.baud),
+            )
+
+        # Open every port on its own I/O thread (in parallel) and report failures
+        # (auto-detected connections are already open)
+        pending = {
+            name: engine.submit(engine.conn.open)
+            for name, engine in self.engines.items()
+            if not engine.conn.is_open()
+        }
+        for name in self.engines.keys() - pending.keys():
+            print(f"[OK] {name}: detected on {self.connections[name]._comPort}")
+        for name, fut in pending.items():
+            try:
+                fut.result(timeout=5.0)
+                print(f"[OK] {name}: connected to {self.connections[name]._comPort}")
+            except Exception as exc:
+                print(f"[ERROR] {name}: open failed: {exc}")
+
+        if self.journal is not None:
+            # Replay: bring every board back to its last journaled setpoint
+            checks = {
+                name: self.engines[name].submit(self.journal.reconcile, name, self.connections[name], state)
+                for name, state in self._desired.items()
+                if name in self.engines
+            }
+            for name, fut in checks.items():
+                try:
+                    print(f"[INFO] journal: {fut.result(timeout=5.0)}")
+                except Exception as exc:
+                    print(f"[WARN] journal: {name} not reconciled: {exc}")
+            print(f"[OK] journaling SETs to {self.cfg.journal_path}")
+
+        if self.cfg.budget_path:
+            # Imported on demand: only needed when freshness targets are given
+            from budget_planner import load_targets, plan
+
+            budget = plan(self.connections, load_targets(self.cfg.budget_path))
+            for name, (frame, idle_s) in budget.frames().items():
+                self.engines[name].set_commands(frame, cycle_interval_s=idle_s)
+            print(budget.report())
+            print(f"[{'OK' if budget.fits else 'WARN'}] poll budget from {self.cfg.budget_path}")
+
+        if self.cfg.metrics_port is not None:
+            self.metrics_server = MetricsServer(lambda: self.connections, port=self.cfg.metrics_port)
+            self.metrics_server.start()
+            print(f"[OK] metrics: http://127.0.0.1:{self.metrics_server.port}/metrics")
+
+        if self.cfg.gateway_port is not None:
+            # Imported on demand to keep cold start low when the gateway is not used
+            from gateway import GatewayServer
+
+            self.gateway = GatewayServer(self.engines, port=self.cfg.gateway_port)
+            self.gateway.start()
+            print(f"[OK] gateway: http://127.0.0.1:{self.gateway.port}/api/snapshot")
+
+        if self.cfg.rules_path:
+            from rules import RuleEngine, load_rules
+
+            self.rules = RuleEngine(load_rules(self.cfg.rules_path), self.connections)
+            self.rules.attach()
+            print(f"[OK] {len(self.rules.rules)} rule(s) loaded from {self.cfg.rules_path}")
+
+        if self.cfg.shm:
+            from shm_snapshot import SharedSnapshotPublisher, segment_name
+
+            for name, conn in self.connections.items():
+                publisher = SharedSnapshotPublisher(name, conn, force=self.cfg.shm_force)
+                try:
+                    publisher.start()
+                except FileExistsError as e:
+                    print(f"[ERROR] shared memory not published: {e} (use --shm-force to take it over)")
+                    continue
+                self.shm_publishers.append(publisher)
+                print(f"[OK] shared memory: {segment_name(name)}")
+
+        if self.state_store is not None:
+            self.state_store.start()
+            print(f"[OK] saving state to {self.cfg.state_path}")
+
+        if self.cfg.record_path:
+            self.recorder = CsvRecorder(self.cfg.record_path, self.connections, self.cfg.record_interval)
+            self.recorder.start()
+            print(f"[OK] recording to {self.cfg.record_path}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def shutdown(self) -> None:
+        """Stop everything; engines first so no transaction is in flight when ports close."""
+        if self.rules is not None:
+            self.rules.close()
+        if self.gateway is not None:
+            self.gateway.stop()
+        for engine in self.engines.values():
+            engine.stop()
+        if self.recorder is not None:
+            self.recorder.stop()
+        for publisher in self.shm_publishers:
+            publisher.stop()
+        if self.state_store is not None:
+            self.state_store.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        for conn in self.connections.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if self.journal is not None:
+            self.journal.close()  # after close(): outcomes of SETs failed by it are kept
+
+    def run_forever(self) -> None:
+        """Drain engine updates (logged / fanned out to gateway clients) until stop() is called."""
+        while not self._stop.is_set():
+            try:
+                update = self.updates.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self.gateway is not None:
+                self.gateway.publish(update)
+            name, kind, _key, value = update
+            if kind == "link":
+                state = self.connections[name].link_state
+                print(f"[INFO] {name}: link {'up' if value else 'down'} ({state})")
+
+    # -------------------- HELPERS --------------------
+    def _add_board(self, name: str, conn) -> None:
+        if self.state_store is not None:
+            self.state_store.track(name, conn)  # restored values are served (as stale) right away
+        if self.journal is not None:
+            self.journal.track(name, conn)
+        engine = SerialIOEngine(
+            conn, conn.poll_commands(), updates=self.updates, name=name, predictive=self.cfg.predictive
+        )
+        engine.start()
+        self.connections[name] = conn
+        self.engines[name] = engine
+
+
+def build_config_from_args(argv=None) -> ServiceConfig:
+    """Builds ServiceConfig from CLI args (keeps main clean)."""
+    parser = argparse.ArgumentParser(description="Headless home automation data collector")
+    parser.add_argument("--ac-port", default=None, help="Air conditioner board port, e.g., COM8 or tcp://host:7000")
+    parser.add_argument("--cur-port", default=None, help="Curtain board port, e.g., COM10 or tcp://host:7000")
+    parser.add_argument("--auto-detect", action="store_true", help="Scan all serial ports for boards")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate, e.g., 9600")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--gateway-port", type=int, default=None, help="Serve the HTTP/WebSocket gateway on this port")
+    parser.add_argument("--record", default=None, help="Append cache samples to this CSV file")
+    parser.add_argument("--record-interval", type=float, default=1.0, help="Recorder sampling interval in seconds")
+    parser.add_argument("--rules", default=None, help="Run the automation rules in this JSON file")
+    parser.add_argument("--shm", action="store_true", help="Publish board snapshots in shared memory")
+    parser.add_argument(
+        "--shm-force",
+        action="store_true",
+        help="With --shm: take over segments another process is still publishing",
+    )
+    parser.add_argument("--state-file", default=None, help="Warm-start file: restore last state, save it periodically")
+    parser.add_argument("--journal", default=None, help="Journal every SET to this file; reconcile boards at start")
+    parser.add_argument("--budget", default=None, help="Plan polling from the freshness targets in this JSON file")
+    parser.add_argument(
+        "--predictive",
+        action="store_true",
+        help="Skip GETs of smooth fields while their predicted value is within tolerance",
+    )
+    parser.add_argument(
+        "--measure-startup",
+        action="store_true",
+        help="Print the time until the service is ready, then exit",
+    )
+    args = parser.parse_args(argv)
+
+    return ServiceConfig(
+        ac_port=args.ac_port,
+        cur_port=args.cur_port,
+        auto_detect=args.auto_detect,
+        baud=args.baud,
+        metrics_port=args.metrics_port,
+        gateway_port=args.gateway_port,
+        record_path=args.record,
+        record_interval=max(0.05, float(args.record_interval)),
+        rules_path=args.rules,
+        shm=args.shm,
+        shm_force=args.shm_force,
+        state_path=args.state_file,
+        predictive=args.predictive,
+        budget_path=args.budget,
+        journal_path=args.journal,
+        measure_startup=args.measure_startup,
+    )
+
+
+def main(argv=None) -> int:
+    """Main function (kept minimal)."""
+    cfg = build_config_from_args(argv)
+    if not (cfg.ac_port or cfg.cur_port or cfg.auto_detect):
+        print("[ERROR] Nothing to do: give --ac-port and/or --cur-port (or --auto-detect).")
+        return 2
+
+    service = HeadlessService(cfg)
+    signal.signal(signal.SIGINT, lambda *_: service.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: service.stop())
+
+    try:
+        service.start()
+        if cfg.measure_startup:
+            print(f"[STARTUP] daemon: ready after {(time.perf_counter() - _T0) * 1000.0:.1f} ms "
+                  f"(tkinter loaded: {'tkinter' in sys.modules})")
+            return 0
+        service.run_forever()
+        return 0
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
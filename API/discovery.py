@@ -0,0 +1,120 @@
+# Author: 152120221098 Emre AVCI
+"""
+Serial port discovery
+---------------------
+Finds the boards instead of typing COM ports by hand. Every serial port is
+probed in parallel (one thread per port, short deadlines), and each answering
+board is recognized from its response signature:
+
+    GET 0x02 (desired value HIGH)    both boards answer     -> a board is there
+    GET 0x06 (pressure HIGH)         only the curtain board -> curtain
+    GET 0x05 (fan speed / press LOW) both boards answer     -> air conditioner
+                                                               if 0x06 stayed silent
+
+Worst case per port is three short deadlines, and all ports run at the same
+time, so a scan of dozens of ports takes a fraction of a second.
+
+Usage:
+  python discovery.py            (prints the detected ports)
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from air_conditioner import AirConditionerControlSystemConnection
+from base_connections import HomeAutomationSystemConnection
+from curtain_control import CurtainControlSystemConnection
+from protocol import GET_DESIRED_TEMPERATURE_HIGH, GET_FAN_SPEED, GET_OUTDOOR_PRESSURE_HIGH
+
+PROBE_TIMEOUT_MS = 60
+
+# board kind -> connection class (same names as daemon.py / metrics)
+BOARD_CLASSES = {
+    "air_conditioner": AirConditionerControlSystemConnection,
+    "curtain": CurtainControlSystemConnection,
+}
+
+
+def list_ports() -> list[str]:
+    """Device names of every serial port of the system."""
+    from serial.tools import list_ports as serial_list_ports
+
+    return [p.device for p in serial_list_ports.comports()]
+
+
+def probe_port(port: str, baud: int = 9600, timeout_ms: int = PROBE_TIMEOUT_MS) -> str | None:
+    """Return "air_conditioner", "curtain" or None (no board / port busy)."""
+    probe = HomeAutomationSystemConnection(port, baud)
+    try:
+        probe._open_port(report=False)
+    except Exception:
+        return None
+    try:
+        if probe._get_byte(GET_DESIRED_TEMPERATURE_HIGH, timeout_ms=timeout_ms) is None:
+            return None
+        if probe._get_byte(GET_OUTDOOR_PRESSURE_HIGH, timeout_ms=timeout_ms) is not None:
+            return "curtain"
+        if probe._get_byte(GET_FAN_SPEED, timeout_ms=timeout_ms) is not None:
+            return "air_conditioner"
+        return None
+    finally:
+        probe.close()
+
+
+def scan(
+    ports: list[str] | None = None,
+    baud: int = 9600,
+    timeout_ms: int = PROBE_TIMEOUT_MS,
+    max_workers: int = 32,
+) -> list[tuple[str, str | None]]:
+    """Probe ports (default: all) in parallel; returns [(port, kind or None)] in port order."""
+    ports = list_ports() if ports is None else list(ports)
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ports)), thread_name_prefix="probe") as pool:
+        kinds = list(pool.map(lambda p: probe_port(p, baud, timeout_ms), ports))
+    return list(zip(ports, kinds))
+
+
+def discover(
+    ports: list[str] | None = None,
+    baud: int = 9600,
+    timeout_ms: int = PROBE_TIMEOUT_MS,
+    max_workers: int = 32,
+) -> dict:
+    """
+    Scan, then return {board_kind: opened connection} for the first port of each kind.
+    The connections are opened in parallel as well and are ready to use.
+    """
+    found: dict[str, str] = {}
+    for port, kind in scan(ports, baud, timeout_ms, max_workers):
+        if kind is not None and kind not in found:
+            found[kind] = port
+
+    def _open(kind: str):
+        conn = BOARD_CLASSES[kind](found[kind], baud)
+        try:
+            conn.open()
+        except Exception:
+            return kind, None
+        return kind, conn
+
+    if not found:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(found), thread_name_prefix="probe") as pool:
+        return {kind: conn for kind, conn in pool.map(_open, found) if conn is not None}
+
+
+def main() -> int:
+    """Print every port with the board detected on it."""
+    results = scan()
+    if not results:
+        print("[INFO] No serial ports found.")
+        return 1
+    for port, kind in results:
+        print(f"{port:<20} {kind or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# Author: 152120221098 Emre AVCI
+"""
+Per-field state estimator
+-------------------------
+Ambient/outdoor temperature, pressure and light change slowly and smoothly, so
+reading them on every poll cycle mostly re-reads the same value. FieldEstimator
+is a small constant-velocity Kalman filter (state: value and rate of change)
+that predicts a field between two reads, together with the uncertainty of the
+prediction:
+
+    update(z, t)   feed a value read from the board at monotonic time t
+    predict(t)     (predicted value, 1-sigma uncertainty) at time t
+
+The uncertainty grows with the time since the last read (faster when the value
+has been moving unpredictably), so a poller can skip a GET while the prediction
+is good enough and read again once it is not (see
+HomeAutomationSystemConnection.needs_poll).
+
+The process noise adapts to the signal: innovations larger than the filter
+expected raise it, smaller ones let it decay, within [Q_MIN, Q_MAX].
+"""
+
+import math
+
+# Measurement noise: values are quantized to 0.1 (one decimal digit)
+MEASUREMENT_VAR = 0.1 ** 2 / 12.0
+
+# Process noise (white acceleration, units^2 / s^3) and its adaptation bounds
+Q_INITIAL = 1e-3
+Q_MIN = 1e-6
+Q_MAX = 10.0
+
+# Reads needed before predictions are trusted
+WARMUP_SAMPLES = 3
+
+
+class FieldEstimator:
+    __slots__ = ("x", "v", "p00", "p01", "p11", "q", "r", "t", "samples")
+
+    def __init__(self, measurement_var: float = MEASUREMENT_VAR, q: float = Q_INITIAL):
+        self.x = 0.0  # value
+        self.v = 0.0  # rate of change (units / s)
+        self.p00 = self.p01 = self.p11 = 0.0  # covariance of (x, v)
+        self.q = q
+        self.r = measurement_var
+        self.t: float | None = None  # time of the last update
+        self.samples = 0
+
+    @property
+    def warm(self) -> bool:
+        return self.samples >= WARMUP_SAMPLES
+
+    def _propagate(self, dt: float) -> tuple[float, float, float, float, float]:
+        """Predicted (x, v, p00, p01, p11) dt seconds after the last update."""
+        q = self.q
+        x = self.x + self.v * dt
+        p00 = self.p00 + 2.0 * dt * self.p01 + dt * dt * self.p11 + q * dt ** 3 / 3.0
+        p01 = self.p01 + dt * self.p11 + q * dt * dt / 2.0
+        p11 = self.p11 + q * dt
+        return x, self.v, p00, p01, p11
+
+    def update(self, z: float, t: float) -> None:
+        """Correct the state with a value read from the board at time t."""
+        z = float(z)
+        if self.t is None:
+            self.x, self.v = z, 0.0
+            self.p00, self.p01, self.p11 = self.r, 0.0, 1.0
+            self.t = t
+            self.samples = 1
+            return
+
+        dt = max(0.0, t - self.t)
+        x, v, p00, p01, p11 = self._propagate(dt)
+
+        # Kalman gain for a measurement of x only
+        s = p00 + self.r
+        k0 = p00 / s
+        k1 = p01 / s
+        innovation = z - x
+
+        self.x = x + k0 * innovation
+        self.v = v + k1 * innovation
+        self.p00 = (1.0 - k0) * p00
+        self.p01 = (1.0 - k0) * p01
+        self.p11 = p11 - k1 * p01
+        self.t = t
+        self.samples += 1
+
+        # Adapt the process noise to how surprising the read was (NIS ~ 1 expected)
+        nis = innovation * innovation / s
+        self.q = min(Q_MAX, max(Q_MIN, self.q * (0.8 + 0.2 * min(nis, 25.0))))
+
+    def predict(self, t: float) -> tuple[float, float]:
+        """(predicted value, 1-sigma uncertainty) at monotonic time t."""
+        if self.t is None:
+            return 0.0, math.inf
+        x, _v, p00, _p01, _p11 = self._propagate(max(0.0, t - self.t))
+        return x, math.sqrt(max(p00, 0.0))
@@ -0,0 +1,370 @@
+# Author: 152120221098 Emre AVCI
+"""
+Local HTTP / WebSocket gateway
+------------------------------
+Only one process can open a COM port. The gateway runs inside the process that
+owns the connections (see daemon.py --gateway-port) and shares them with any
+number of local clients:
+
+    GET  /api/snapshot          -> {board: {"connected": bool, "link": {...}, "fields": {name: {"value", "age_s"}}}}
+    GET  /api/<board>           -> snapshot of one board
+    POST /api/<board>/set       -> body {"value": 23.5}; returns {"ok": bool}
+    GET  /ws                    -> WebSocket; first message is the full snapshot,
+                                   then one {"board", "field", "value"} message per change
+
+Reads are served from the connection caches and changes are fanned out from the
+single update stream of the I/O engines, so clients add no UART traffic.
+SET requests from all clients are debounced per board (SetpointWriter, so a
+dragged slider only writes its final value), then go through one arbitrated
+FIFO (SetArbiter) and are executed one at a time on the board's I/O engine.
+
+Only the standard library is used (http.server + a minimal RFC 6455 framer).
+"""
+
+import base64
+import hashlib
+import json
+import queue
+import select
+import struct
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from setpoint_writer import SetpointWriter
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_OP_TEXT = 0x1
+WS_OP_CLOSE = 0x8
+WS_OP_PING = 0x9
+WS_OP_PONG = 0xA
+
+SET_TIMEOUT_S = 5.0
+
+# Clients only send control frames; a larger frame closes the connection
+WS_MAX_FRAME_BYTES = 64 * 1024
+
+
+# -------------------- WEBSOCKET FRAMING --------------------
+def ws_accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + WS_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def ws_frame(payload: bytes, opcode: int = WS_OP_TEXT) -> bytes:
+    """Build one unmasked, final server frame."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+def ws_parse_frame(buf: bytearray) -> tuple[int, bytes] | None:
+    """
+    Take one complete (masked) client frame off the front of buf and return
+    (opcode, payload); None while buf holds only part of a frame.
+    """
+    if len(buf) < 2:
+        return None
+    opcode = buf[0] & 0x0F
+    masked = buf[1] & 0x80
+    n = buf[1] & 0x7F
+    pos = 2
+    if n == 126:
+        if len(buf) < 4:
+            return None
+        n = struct.unpack_from("!H", buf, 2)[0]
+        pos = 4
+    elif n == 127:
+        if len(buf) < 10:
+            return None
+        n = struct.unpack_from("!Q", buf, 2)[0]
+        pos = 10
+    if n > WS_MAX_FRAME_BYTES:
+        raise ValueError(f"client frame of {n} bytes is too large")
+    end = pos + (4 if masked else 0) + n
+    if len(buf) < end:
+        return None
+    mask = bytes(buf[pos:pos + 4]) if masked else b""
+    payload = bytes(buf[end - n:end])
+    del buf[:end]
+    if masked:
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+# -------------------- FAN-OUT --------------------
+class FanoutHub:
+    """
+    Broadcasts pre-encoded frames to every subscriber.
+    Each event is serialized once, whatever the number of clients.
+    Subscribers that fall too far behind are dropped instead of slowing the others.
+    """
+
+    def __init__(self, max_backlog: int = 1000):
+        self._max_backlog = max_backlog
+        self._subs: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue(maxsize=self._max_backlog)
+        with self._lock:
+            self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue) -> None:
+        with self._lock:
+            self._subs.discard(q)
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, frame: bytes) -> None:
+        with self._lock:
+            subs = list(self._subs)
+        for q in subs:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                # Slow client: a None tells its handler to disconnect
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+# -------------------- SET ARBITRATION --------------------
+class SetArbiter:
+    """
+    Single FIFO for SET requests from every client.
+    One worker thread executes them one by one on the board's I/O engine,
+    so concurrent writers never interleave frames on the wire.
+    """
+
+    def __init__(self, engines: dict):
+        self._engines = engines
+        self._requests: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="set-arbiter", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._requests.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=SET_TIMEOUT_S)
+            self._thread = None
+
+    def submit(self, board: str, value: float) -> Future:
+        fut: Future = Future()
+        self._requests.put((board, value, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            req = self._requests.get()
+            if req is None:
+                return
+            board, value, fut = req
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                engine = self._engines[board]
+                fut.set_result(engine.submit(engine.conn.set_setpoint, value).result(timeout=SET_TIMEOUT_S))
+            except BaseException as e:
+                fut.set_exception(e)
+
+
+# -------------------- GATEWAY --------------------
+class GatewayServer:
+    def __init__(self, engines: dict, host: str = "127.0.0.1", port: int = 8080, set_window_s: float = 0.15):
+        """engines: {board_name: SerialIOEngine}; the engines own the connections."""
+        self.engines = engines
+        self.hub = FanoutHub()
+        self.arbiter = SetArbiter(engines)
+        self.writers = {
+            board: SetpointWriter(
+                engine.conn,
+                window_s=set_window_s,
+                write=lambda value, board=board: self.arbiter.submit(board, value),
+            )
+            for board, engine in engines.items()
+        }
+        self._host = host
+        self._port = port
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self._closing = threading.Event()
+
+    @property
+    def port(self) -> int:
+        if self._httpd is not None:
+            return self._httpd.server_address[1]
+        return self._port
+
+    # -------------------- STATE --------------------
+    def board_snapshot(self, board: str) -> dict:
+        conn = self.engines[board].conn
+        fields = {}
+        for field, value in conn.snapshot().items():
+            age = conn.field_age(field)
+            fields[field] = {"value": value, "age_s": None if age is None else round(age, 3)}
+        return {"connected": conn.is_open(), "link": conn.link_status(), "fields": fields}
+
+    def snapshot(self) -> dict:
+        return {board: self.board_snapshot(board) for board in self.engines}
+
+    def publish(self, update: tuple) -> None:
+        """Forward one engine update (engine_name, kind, key, value) to all WebSocket clients."""
+        name, kind, key, value = update
+        if kind == "field":
+            msg = {"board": name, "field": key, "value": value}
+        elif kind == "link":
+            msg = {"board": name, "connected": value, "link": self.engines[name].conn.link_state}
+        else:
+            return
+        self.hub.publish(ws_frame(json.dumps(msg).encode("utf-8")))
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self._httpd is not None:
+            return
+        self._closing.clear()
+        self.arbiter.start()
+        self._httpd = ThreadingHTTPServer((self._host, self._port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="gateway-http", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._closing.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            self._thread = None
+        self.arbiter.stop()
+
+    # -------------------- HTTP HANDLER --------------------
+    def _make_handler(self):
+        gateway = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                return
+
+            def _send_json(self, code: int, obj) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path == "/ws":
+                    self._websocket()
+                elif path == "/api/snapshot":
+                    self._send_json(200, gateway.snapshot())
+                elif path.startswith("/api/") and path[5:] in gateway.engines:
+                    self._send_json(200, gateway.board_snapshot(path[5:]))
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                parts = self.path.split("?", 1)[0].strip("/").split("/")
+                if len(parts) != 3 or parts[0] != "api" or parts[2] != "set" or parts[1] not in gateway.engines:
+                    self._send_json(404, {"error": "not found"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", "0"))
+                    value = float(json.loads(self.rfile.read(length) or b"{}")["value"])
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send_json(400, {"error": f"bad request: {e}"})
+                    return
+
+                fut = gateway.writers[parts[1]].request(value)
+                try:
+                    ok = bool(fut.result(timeout=SET_TIMEOUT_S * 2))
+                except Exception as e:
+                    self._send_json(504, {"ok": False, "error": str(e)})
+                    return
+                self._send_json(200, {"ok": ok, "value": value})
+
+            def _websocket(self):
+                key = self.headers.get("Sec-WebSocket-Key")
+                if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+                    self._send_json(400, {"error": "websocket upgrade expected"})
+                    return
+
+                self.send_response(101, "Switching Protocols")
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", ws_accept_key(key))
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+
+                # Client frames are read from the socket itself (select() cannot see
+                # rfile's buffer) and reassembled here, so a partial frame never blocks
+                # the loop. Bytes sent right after the handshake may already sit in rfile.
+                rx = bytearray()
+                timeout = self.connection.gettimeout()
+                self.connection.settimeout(0)
+                try:
+                    rx += self.rfile.read1(WS_MAX_FRAME_BYTES) or b""
+                except OSError:
+                    pass
+                finally:
+                    self.connection.settimeout(timeout)
+
+                q = gateway.hub.subscribe()
+                try:
+                    self.wfile.write(ws_frame(json.dumps({"snapshot": gateway.snapshot()}).encode("utf-8")))
+                    while not gateway._closing.is_set():
+                        # Pump outgoing frames
+                        try:
+                            frame = q.get(timeout=0.25)
+                        except queue.Empty:
+                            frame = b""
+                        if frame is None:
+                            break
+                        if frame:
+                            self.wfile.write(frame)
+
+                        # Handle client control frames (close / ping) without blocking
+                        readable, _, _ = select.select([self.connection], [], [], 0)
+                        if readable:
+                            data = self.connection.recv(4096)
+                            if not data:
+                                break
+                            rx += data
+                        closing = False
+                        while (msg := ws_parse_frame(rx)) is not None:
+                            if msg[0] == WS_OP_CLOSE:
+                                closing = True
+                                break
+                            if msg[0] == WS_OP_PING:
+                                self.wfile.write(ws_frame(msg[1], WS_OP_PONG))
+                        if closing:
+                            self.wfile.write(ws_frame(b"", WS_OP_CLOSE))
+                            break
+                except (OSError, ValueError):
+                    pass
+                finally:
+                    gateway.hub.unsubscribe(q)
+
+        return _Handler
@@ -0,0 +1,219 @@
+# Author: 152120221098 Emre AVCI
+"""
+Serial I/O engine (worker thread)
+---------------------------------
+SerialIOEngine owns one connection object and is the only code that touches its
+UART. It runs on a daemon thread and:
+- cycles through a list of GET commands (one blocking _get_byte at a time)
+- runs submitted jobs (SET commands, open/close) between two GETs
+- writes queued asynchronous SETs (setDesiredTempAsync / setCurtainStatusAsync)
+  between two GETs; the regular GET cycle then verifies them
+- supervises the link (conn.supervise()): a dead port is reopened in the
+  background with backoff. Jobs submitted meanwhile are held and run once the
+  link is back (open/close requests still run immediately).
+- posts decoded updates to a thread-safe queue
+- optionally polls predictively (predictive=True): every pass leaves out the
+  GETs of fields the connection can predict within tolerance (conn.needs_poll)
+
+Update items are tuples: (engine_name, kind, key, value)
+    kind == "field" : key = field name, value = new decoded value
+    kind == "link"  : key = None,       value = True/False (port open);
+                      posted on every change of conn.link_state as well
+
+The GUI drains the queue once per frame, so the Tk thread never waits on the UART.
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+
+class SerialIOEngine:
+    def __init__(
+        self,
+        conn,
+        commands: list[int],
+        updates: queue.Queue | None = None,
+        name: str = "",
+        resp_timeout_ms: int = 150,
+        cycle_interval_s: float = 0.0,
+        idle_interval_s: float = 0.05,
+        predictive: bool = False,
+    ):
+        self.conn = conn
+        self.name = name
+        self.updates: queue.Queue = updates if updates is not None else queue.Queue()
+
+        self._commands: list[int] = list(commands)
+        self._pass: list[int] = list(commands)  # commands of the current pass
+        self._cursor = 0
+        self._predictive = predictive
+        self._resp_timeout_ms = resp_timeout_ms
+        self._cycle_interval_s = cycle_interval_s
+        self._idle_interval_s = idle_interval_s
+
+        # Pending jobs: (fn, args, kwargs, future)
+        self._jobs: queue.Queue = queue.Queue()
+        self._held: deque = deque()  # jobs waiting for a reconnect
+
+        # Last values posted per field (so only changes are published)
+        self._last: dict = {}
+        self._was_link: tuple | None = None
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"uart-io-{self.name or id(self)}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the worker thread. Jobs still queued are cancelled."""
+        self._stop.set()
+        self._jobs.put(None)  # wake the worker if it is idle
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+        while self._held:
+            self._held.popleft()[3].cancel()
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job[3].cancel()
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # -------------------- CALLER API (ANY THREAD) --------------------
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Run fn(*args, **kwargs) on the I/O thread; returns a Future with its result."""
+        fut: Future = Future()
+        self._jobs.put((fn, args, kwargs, fut))
+        return fut
+
+    def set_commands(self, commands: list[int], cycle_interval_s: float | None = None) -> None:
+        """
+        Replace the GET command cycle (takes effect at the next cycle), and
+        optionally the pause between two passes (e.g. from a budget plan).
+        """
+        self.submit(self._apply_commands, list(commands), cycle_interval_s)
+
+    def kick(self) -> None:
+        """Restart the GET cycle from its first command."""
+        self.submit(self._apply_commands, None)
+
+    # -------------------- WORKER THREAD --------------------
+    def _apply_commands(self, commands: list[int] | None, cycle_interval_s: float | None = None) -> None:
+        if commands is not None:
+            self._commands = commands
+        if cycle_interval_s is not None:
+            self._cycle_interval_s = max(0.0, cycle_interval_s)
+        self._cursor = 0
+        self.conn.begin_cycle()
+        self._pass = self._plan_pass()
+
+    def _plan_pass(self) -> list[int]:
+        """GETs of the next pass: all commands, or only the due ones when predictive."""
+        if not self._predictive:
+            return self._commands
+        due = set(self.conn.due_poll_commands())
+        planned = [cmd for cmd in self._commands if cmd in due]
+        skipped = len(self._commands) - len(planned)
+        if skipped:
+            self.conn.metrics.record_predicted(skipped)
+        return planned
+
+    def _run_job(self, job) -> None:
+        fn, args, kwargs, fut = job
+        if self.conn.link_state == "reconnecting" and fn not in (self.conn.open, self.conn.close):
+            self._held.append(job)
+            return
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        self._publish()
+
+    def _run_pending_jobs(self) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                self._run_job(job)
+
+    def _wait_for_job(self, timeout: float) -> None:
+        """Sleep up to timeout, waking early (and running it) if a job is submitted."""
+        try:
+            job = self._jobs.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if job is not None:
+            self._run_job(job)
+
+    def _publish(self) -> None:
+        """Post link-state and decoded-field changes to the update queue."""
+        is_open = self.conn.is_open()
+        link = (is_open, self.conn.link_state)
+        if link != self._was_link:
+            self._was_link = link
+            self.updates.put((self.name, "link", None, is_open))
+
+        for field, value in self.conn.snapshot().items():
+            if self._last.get(field) != value:
+                self._last[field] = value
+                self.updates.put((self.name, "field", field, value))
+
+    def _run(self) -> None:
+        self._publish()
+        while not self._stop.is_set():
+            self.conn.supervise()
+            if self._held and self.conn.link_state != "reconnecting":
+                # Link is back (or was closed): run the jobs that waited for it, in order
+                while self._held:
+                    self._run_job(self._held.popleft())
+            self._run_pending_jobs()
+
+            try:
+                # Without a GET cycle nothing would read the register back, so ask for it
+                self.conn.service_sets(readback=not self._commands)
+            except Exception:
+                pass
+
+            if not self.conn.is_open() or not self._commands:
+                self._publish()
+                self._wait_for_job(self._idle_interval_s)
+                continue
+
+            if self._cursor >= len(self._pass):
+                self._cursor = 0
+                self.conn.begin_cycle()  # HIGH/LOW pairs never mix bytes of two passes
+                self._pass = self._plan_pass()
+                if self._cycle_interval_s > 0 or not self._pass:
+                    # Nothing due (everything predicted): wait instead of spinning
+                    self._wait_for_job(self._cycle_interval_s or self._idle_interval_s)
+                    continue
+
+            cmd = self._pass[self._cursor]
+            self._cursor += 1
+
+            try:
+                b = self.conn._get_byte(cmd, timeout_ms=self._resp_timeout_ms)
+                if b is not None:
+                    self.conn.handle_rx(cmd, b)
+            except Exception:
+                pass
+
+            self._publish()
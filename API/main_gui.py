@@ -1,31 +1,26 @@
 # Author: 152120221098 Emre AVCI
 import time
+
+_T0 = time.perf_counter()  # cold-start reference (see --measure-startup)
+
+import argparse
+import queue
+import sys
+import threading
 import tkinter as tk
+from contextlib import nullcontext
 from tkinter import messagebox
 
 from air_conditioner import AirConditionerControlSystemConnection
 from curtain_control import CurtainControlSystemConnection
-from protocol import (
-    GET_DESIRED_TEMPERATURE_HIGH,
-    GET_DESIRED_TEMPERATURE_LOW,
-    GET_AMBIENT_TEMPERATURE_HIGH,
-    GET_AMBIENT_TEMPERATURE_LOW,
-    GET_FAN_SPEED,
-    GET_DESIRED_CURTAIN_HIGH,
-    GET_DESIRED_CURTAIN_LOW,
-    GET_OUTDOOR_TEMPERATURE_HIGH,
-    GET_OUTDOOR_TEMPERATURE_LOW,
-    GET_OUTDOOR_PRESSURE_HIGH,
-    GET_OUTDOOR_PRESSURE_LOW,
-    GET_LIGHT_INTENSITY_HIGH,
-    GET_LIGHT_INTENSITY_LOW,
-)
+from io_engine import SerialIOEngine
+from status_view import StatusView
+from trend_chart import TrendChart, TrendSeries
+from metrics import MetricsServer
 
 # ================= APP ROOT =================
-root = tk.Tk()
-root.title("Home Automation System")
-root.geometry("1300x800")
-root.configure(bg="#f1f5f9")
+# Created by main(): importing this module must not need a display.
+root = None
 
 # ================= UI CONFIG =================
 FONT_TITLE = ("Segoe UI", 22, "bold")
@@ -40,99 +35,212 @@ BTN_HOVER = "#c7d2fe"
 ACCENT = "#2563eb"
 TEXT = "#0f172a"
 TEXT_SUB = "#475569"
+STALE = "#b45309"
 
 # ================= APP STATE =================
 selected_system = None
-active_screen = "menu"  # menu / status / input
+active_screen = "menu"  # menu / status / input / trends
 
 ac_conn = None
 cur_conn = None
 
+# One I/O engine (worker thread) per connection; it is the only code touching the UART
+ac_engine = None
+cur_engine = None
+_retiring = {}  # system -> thread still stopping the replaced engine / closing its port
+
 # ================= CONNECTION PARAMS =================
 # The PC app opens a COM port (e.g., COM8).
 # PICSimLab should open the paired port (e.g., COM9) depending on your virtual COM pair.
-ac_com_var = tk.StringVar(value="COM8")
-ac_baud_var = tk.StringVar(value="9600")
+# Tk variables need a root window, so main() creates them.
+DEFAULT_COM = "COM8"
+DEFAULT_BAUD = "9600"
+
+ac_com_var = None
+ac_baud_var = None
+
+cur_com_var = None
+cur_baud_var = None
+
+# ================= STATUS FIELDS =================
+# (field, caption, unit) rows shown on the status screen of each system.
+# field names match the connection classes' FIELDS register maps.
+STATUS_FIELDS = {
+    "Air Conditioner": [
+        ("ambient_temp", "Home Ambient Temperature", "°C"),
+        ("desired_temp", "Home Desired Temperature", "°C"),
+        ("fan_speed", "Fan Speed", "rps"),
+    ],
+    "Curtain Control": [
+        ("outdoor_temp", "Outdoor Temperature", "°C"),
+        ("outdoor_press", "Outdoor Pressure", ""),
+        ("curtain_status", "Curtain Status", "%"),
+        ("light_intensity", "Light Intensity", ""),
+    ],
+}
+
+STALE_AFTER_S = 2.0      # a field not refreshed for this long is shown as stale
+STALE_CHECK_MS = 500     # how often field ages / settings rows are re-checked
+
+_status_view = None      # StatusView of the status screen (None on other screens)
+_latest = {}             # (system, field) -> newest value posted by the engines
+_dirty = set()           # status rows waiting for the next frame
+_connecting = False      # True while an open() job is queued on the engine
+_last_stale_check = 0.0
+
+# ================= TREND CHARTS =================
+# (system, field, title, unit) of every live chart. Series are sampled from the
+# connection caches, so charting adds no UART traffic.
+TREND_FIELDS = [
+    ("Air Conditioner", "ambient_temp", "Ambient Temperature", "°C"),
+    ("Curtain Control", "outdoor_temp", "Outdoor Temperature", "°C"),
+    ("Curtain Control", "outdoor_press", "Outdoor Pressure", ""),
+    ("Curtain Control", "light_intensity", "Light Intensity", ""),
+    ("Curtain Control", "curtain_status", "Curtain Position", "%"),
+    ("Air Conditioner", "fan_speed", "Fan Speed", "rps"),
+]
+TREND_SPAN_S = 3600.0    # visible window of every chart
+TREND_SAMPLE_MS = 100    # cache sampling period (10 Hz)
+CHART_REDRAW_MS = 250    # chart refresh period while the trends screen is shown
+
+_trend_series = {
+    (system, field): TrendSeries(TREND_SPAN_S, 1000.0 / TREND_SAMPLE_MS)
+    for system, field, _, _ in TREND_FIELDS
+}
+_trend_charts = []       # TrendChart widgets (built with the trends screen)
+_last_trend_sample = 0.0
+_last_chart_redraw = 0.0
+
+# ================= UART POLLING (WORKER THREAD) =================
+# GET polling runs inside SerialIOEngine threads. The Tk thread only drains
+# _ui_queue once per frame and refreshes widgets from cached values.
+POLL_INTERVAL_MS = 40   # UI frame interval (queue drain + refresh)
+RESP_TIMEOUT_MS = 150   # per-command response timeout (engine side)
+PREDICTIVE_POLLING = False  # skip GETs of smooth fields while predicted within tolerance
 
-cur_com_var = tk.StringVar(value="COM8")
-cur_baud_var = tk.StringVar(value="9600")
+_poll_job = None
+_ui_queue = queue.Queue()  # (engine_name, kind, key, value) items from the engines
 
-# ================= UI TEXT VARIABLES =================
-status_label_var = tk.StringVar(value="")
-conn_status_var = tk.StringVar(value="Not connected")
+# ================= METRICS ENDPOINT =================
+# Set to a TCP port (e.g., 9108) to serve Prometheus metrics at http://127.0.0.1:<port>/metrics
+METRICS_PORT = None
+_metrics_server = None
 
-# ================= UART POLLING (NO THREADS) =================
-POLL_INTERVAL_MS = 40   # UI-safe polling interval
-RESP_TIMEOUT_MS = 150   # per-command response timeout
+# ================= UI PROFILER (OPT-IN) =================
+# Set UI_PROFILE_DIR to a folder to record after() jitter and callback cost (see ui_profiler.py)
+UI_PROFILE_DIR = None
+UI_PROFILE_CPROFILE = False        # also dump cProfile stats (ui_profile.prof)
+UI_PROFILE_FOLDED_STACKS = False   # also dump sampled stacks for flamegraphs (ui_stacks.folded)
+_profiler = None
 
-_poll_job = None
-_pending = None  # (cmd:int, sent_at:float)
-_queue = []
+# ================= WARM START (OPT-IN) =================
+# Set STATE_FILE (e.g., "last_state.json") to restore the last known values (shown
+# as stale until refreshed) and the last used COM/baud at startup (see state_store.py)
+STATE_FILE = None
+_state_store = None
+
+# ================= SET JOURNAL (OPT-IN) =================
+# Set JOURNAL_FILE (e.g., "set_journal.jsonl") to record every SET sent and its outcome (see set_journal.py)
+JOURNAL_FILE = None
+_journal = None
+
+
+def _after(delay_ms, fn):
+    """root.after() that goes through the profiler when profiling is enabled."""
+    if _profiler is not None:
+        return _profiler.after(delay_ms, fn)
+    return root.after(delay_ms, fn)
+
+
+def _measure(name):
+    """Context manager timing a UI-thread section (no-op unless profiling)."""
+    if _profiler is not None:
+        return _profiler.measure(name)
+    return nullcontext()
 
 
 def _stop_polling():
-    """Stop the scheduled polling loop and clear pending state."""
-    global _poll_job, _pending, _queue
+    """Stop the scheduled UI frame loop."""
+    global _poll_job
     if _poll_job is not None:
         try:
             root.after_cancel(_poll_job)
         except Exception:
             pass
     _poll_job = None
-    _pending = None
-    _queue = []
 
 
 def _kick_poll_cycle():
-    """Reset the request cycle so a new round of GET commands can start."""
-    global _pending, _queue
-    _pending = None
-    _queue = []
+    """Restart the selected engine's GET cycle so a fresh round of values comes in."""
+    engine = _get_engine()
+    if engine is not None:
+        engine.kick()
 
 
-def _build_queue() -> list[int]:
-    """Return the list of GET commands for the currently selected system."""
-    if selected_system == "Air Conditioner":
-        return [
-            GET_DESIRED_TEMPERATURE_HIGH,
-            GET_DESIRED_TEMPERATURE_LOW,
-            GET_AMBIENT_TEMPERATURE_HIGH,
-            GET_AMBIENT_TEMPERATURE_LOW,
-            GET_FAN_SPEED,
-        ]
-    else:
-        return [
-            GET_DESIRED_CURTAIN_HIGH,
-            GET_DESIRED_CURTAIN_LOW,
-            GET_OUTDOOR_TEMPERATURE_HIGH,
-            GET_OUTDOOR_TEMPERATURE_LOW,
-            GET_OUTDOOR_PRESSURE_HIGH,
-            GET_OUTDOOR_PRESSURE_LOW,
-            GET_LIGHT_INTENSITY_HIGH,
-            GET_LIGHT_INTENSITY_LOW,
-        ]
+def _call_soon(fn, *args):
+    """Schedule fn(*args) on the Tk thread (safe to call from any thread)."""
+    _ui_queue.put((None, "call", fn, args))
+
+
+def _build_queue(conn) -> list[int]:
+    """Return the list of GET commands for the given connection (its register map)."""
+    return conn.poll_commands()
 
 
 # ================= MAIN LAYOUT =================
-main = tk.Frame(root, bg=BG)
-main.pack(expand=True, fill="both", padx=40, pady=40)
+content = None  # screen container, created by _build_layout()
 
-content = tk.Frame(main, bg=BG)
-content.pack(expand=True, fill="both")
 
+def _build_layout():
+    """Create the root window, Tk variables and the screen container."""
+    global root, content, ac_com_var, ac_baud_var, cur_com_var, cur_baud_var
 
-# ================= UI HELPERS =================
-def clear():
-    """Clear current screen widgets and stop polling when leaving a screen."""
-    _stop_polling()
-    for w in content.winfo_children():
-        w.destroy()
+    root = tk.Tk()
+    root.title("Home Automation System")
+    root.geometry("1300x800")
+    root.configure(bg="#f1f5f9")
+
+    ac_link = _state_store.link("air_conditioner") if _state_store is not None else None
+    cur_link = _state_store.link("curtain") if _state_store is not None else None
+    ac_com_var = tk.StringVar(value=ac_link[0] if ac_link else DEFAULT_COM)
+    ac_baud_var = tk.StringVar(value=str(ac_link[1]) if ac_link else DEFAULT_BAUD)
+    cur_com_var = tk.StringVar(value=cur_link[0] if cur_link else DEFAULT_COM)
+    cur_baud_var = tk.StringVar(value=str(cur_link[1]) if cur_link else DEFAULT_BAUD)
 
+    main_area = tk.Frame(root, bg=BG)
+    main_area.pack(expand=True, fill="both", padx=40, pady=40)
 
-def card():
+    content = tk.Frame(main_area, bg=BG)
+    content.pack(expand=True, fill="both")
+    content.grid_rowconfigure(0, weight=1)
+    content.grid_columnconfigure(0, weight=1)
+
+# ================= SCREEN CACHE =================
+# Every screen is built once into its own frame, stacked in the same grid cell
+# of `content`; navigation just raises the cached frame. Keys are "menu",
+# ("status", system) and ("input", system).
+_screens = {}
+_status_views = {}   # system -> StatusView
+_input_widgets = {}  # system -> (value_var, entry, send_btn)
+
+
+# ================= UI HELPERS =================
+def _show_screen(key, builder):
+    """Raise the cached frame for key, building it with builder(frame) on first use."""
+    frame = _screens.get(key)
+    if frame is None:
+        frame = tk.Frame(content, bg=BG)
+        frame.grid(row=0, column=0, sticky="nsew")
+        builder(frame)
+        _screens[key] = frame
+    frame.tkraise()
+    return frame
+
+
+def card(parent):
     """Create a styled container frame."""
     return tk.Frame(
-        content,
+        parent,
         bg=CARD,
         highlightbackground=BORDER,
         highlightthickness=1,
@@ -203,231 +311,344 @@ def _get_conn_and_params():
         return cur_conn, com, baud
 
 
+def _get_engine():
+    """Return the I/O engine of the selected system (None if not created yet)."""
+    return ac_engine if selected_system == "Air Conditioner" else cur_engine
+
+
+def _new_conn(com, baud):
+    """Create (not open) a connection object for the selected system."""
+    if selected_system == "Air Conditioner":
+        return AirConditionerControlSystemConnection(com, baud)
+    return CurtainControlSystemConnection(com, baud)
+
+
+def _retire(engine, conn):
+    """
+    Stop a replaced engine and close its port on a helper thread. The engine join
+    can take seconds (e.g. a curtain SET still retrying), which must not freeze the
+    window. Returns the thread, so opening the same port can wait for it.
+    """
+    def _worker():
+        if engine is not None:
+            engine.stop()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    t = threading.Thread(target=_worker, name="uart-retire", daemon=True)
+    t.start()
+    return t
+
+
 def _set_conn(new_conn):
-    """Store the connection object for the selected system."""
-    global ac_conn, cur_conn
+    """Store the connection object for the selected system and give it its own I/O engine."""
+    global ac_conn, cur_conn, ac_engine, cur_engine
+
+    old_conn = _get_conn_and_params()[0]
+    if old_conn is not None:
+        _retiring[selected_system] = _retire(_get_engine(), old_conn)
+
+    # Values posted for the replaced connection must not be shown for the new one
+    for key in [k for k in _latest if k[0] == selected_system]:
+        del _latest[key]
+
+    if _state_store is not None:
+        _state_store.track("air_conditioner" if selected_system == "Air Conditioner" else "curtain", new_conn)
+    if _journal is not None:
+        _journal.track("air_conditioner" if selected_system == "Air Conditioner" else "curtain", new_conn)
+
+    engine = SerialIOEngine(
+        new_conn,
+        _build_queue(new_conn),
+        updates=_ui_queue,
+        name=selected_system,
+        resp_timeout_ms=RESP_TIMEOUT_MS,
+        predictive=PREDICTIVE_POLLING,
+    )
+    engine.start()
+
     if selected_system == "Air Conditioner":
-        ac_conn = new_conn
+        ac_conn, ac_engine = new_conn, engine
     else:
-        cur_conn = new_conn
+        cur_conn, cur_engine = new_conn, engine
 
 
-def ensure_connection_object():
+def _selected_conn():
     """
-    Create (or recreate) the connection object if needed.
-    If COM/baud settings changed, closes the old connection and rebuilds it.
+    Connection object of the selected system as it is (created on first use).
+    Never rebuilt here: the COM/baud entries may hold a half-typed value.
     """
     conn, com, baud = _get_conn_and_params()
-
     if conn is None:
-        if selected_system == "Air Conditioner":
-            conn = AirConditionerControlSystemConnection(com, baud)
-        else:
-            conn = CurtainControlSystemConnection(com, baud)
+        conn = _new_conn(com, baud)
         _set_conn(conn)
-        return conn
+    return conn
 
-    try:
-        curr_com = getattr(conn, "_comPort", None)
-        curr_baud = getattr(conn, "_baudRate", None)
-        if (curr_com != com) or (curr_baud != baud):
-            try:
-                conn.close()
-            except Exception:
-                pass
 
-            if selected_system == "Air Conditioner":
-                conn = AirConditionerControlSystemConnection(com, baud)
-            else:
-                conn = CurtainControlSystemConnection(com, baud)
-            _set_conn(conn)
-    except Exception:
-        if selected_system == "Air Conditioner":
-            conn = AirConditionerControlSystemConnection(com, baud)
-        else:
-            conn = CurtainControlSystemConnection(com, baud)
+def ensure_connection_object():
+    """
+    Connection object matching the COM/baud entries (Connect, committed port change).
+    If the settings changed, the old connection is retired and a new one is built.
+    """
+    conn, com, baud = _get_conn_and_params()
+    if conn is None or getattr(conn, "_comPort", None) != com or getattr(conn, "_baudRate", None) != baud:
+        conn = _new_conn(com, baud)
         _set_conn(conn)
-
     return conn
 
 
+def _on_port_committed(_event=None):
+    """Enter / focus-out on the COM or baud entry: apply the new settings."""
+    ensure_connection_object()
+    _dirty.update(("link", "port", "baud"))
+    _render_status()
+
+
+def _open_when_released(retiring, conn):
+    """I/O thread: wait until a replaced connection has released its port, then open."""
+    if retiring is not None:
+        retiring.join()
+    conn.open()
+
+
 def _is_open(conn) -> bool:
     """Return True if the connection is open and UART backend exists."""
     return bool(getattr(conn, "_isOpen", False)) and (getattr(conn, "_uart", None) is not None)
 
 
 def connect_selected():
-    """Open UART connection for the currently selected system."""
+    """Open UART connection for the currently selected system (on its I/O thread)."""
     conn = ensure_connection_object()
 
     if _is_open(conn):
         messagebox.showinfo("Connection", "Already connected")
         return
 
-    ok = False
-    try:
-        ok = conn.open()
-    except Exception as e:
-        messagebox.showerror("UART Error", f"Open failed:\n{e}")
-        ok = False
+    global _connecting
+    _connecting = True
+    _dirty.add("link")
+    fut = _get_engine().submit(_open_when_released, _retiring.pop(selected_system, None), conn)
+    fut.add_done_callback(lambda f: _call_soon(_on_connect_done, f))
 
-    conn_status_var.set("Connected" if ok else "Not connected")
+
+def _on_connect_done(fut):
+    """Tk-thread completion of connect_selected()."""
+    global _connecting
+    _connecting = False
+    exc = fut.exception()
+    if exc is not None:
+        messagebox.showerror("UART Error", f"Open failed:\n{exc}")
     _kick_poll_cycle()
-    _start_polling()
-    _update_status_text_from_cache()
+    _render_status(full=True)
 
 
 def disconnect_selected():
-    """Close UART connection for the currently selected system."""
-    conn = ensure_connection_object()
-    try:
-        conn.close()
-    except Exception:
-        pass
-    conn_status_var.set("Not connected")
-    _stop_polling()
-    _update_status_text_from_cache()
+    """Close UART connection for the currently selected system (on its I/O thread)."""
+    conn = _selected_conn()
+    fut = _get_engine().submit(conn.close)
+    fut.add_done_callback(lambda f: _call_soon(_render_status, True))
+
+
+def auto_detect_ports():
+    """Scan every serial port for boards (background thread) and fill in the COM fields."""
+    def _worker():
+        try:
+            # Imported on demand: pulls in serial.tools only when a scan is requested
+            from discovery import scan
+
+            result = scan()
+        except Exception as exc:
+            result = exc
+        _call_soon(_on_detect_done, result)
+
+    threading.Thread(target=_worker, name="port-scan", daemon=True).start()
+
+
+def _on_detect_done(result):
+    """Tk-thread completion of auto_detect_ports()."""
+    if isinstance(result, Exception):
+        messagebox.showerror("Auto-detect", f"Port scan failed:\n{result}")
+        return
+
+    found = {}
+    for port, kind in result:
+        if kind is not None and kind not in found:
+            found[kind] = port
+    if "air_conditioner" in found:
+        ac_com_var.set(found["air_conditioner"])
+    if "curtain" in found:
+        cur_com_var.set(found["curtain"])
+    _dirty.add("port")
+
+    if found:
+        lines = [f"{kind.replace('_', ' ').title()}: {port}" for kind, port in found.items()]
+        messagebox.showinfo("Auto-detect", "Boards found:\n" + "\n".join(lines))
+    else:
+        messagebox.showinfo("Auto-detect", f"No board answered on {len(result)} port(s).")
 
 
 # ================= STATUS DISPLAY =================
-def _update_status_text_from_cache():
+def _format_value(value, unit):
+    return f"{value} {unit}".rstrip()
+
+
+def _render_status(full=False):
     """
-    Update the status label from cached values inside the connection object.
-    This function does not block and does not perform UART reads/writes.
+    Push pending changes into the status view.
+    Only rows in _dirty are re-rendered (all rows when full=True), and StatusView
+    itself skips rows whose text did not change. No UART I/O happens here.
     """
-    conn = ensure_connection_object()
+    global _last_stale_check
+    view = _status_view
+    if view is None:
+        _dirty.clear()
+        return
+
+    conn = _selected_conn()
     is_open = _is_open(conn)
-    conn_status_var.set("Connected" if is_open else "Not connected")
+    fields = STATUS_FIELDS[selected_system]
 
-    _, com, baud = _get_conn_and_params()
+    now = time.monotonic()
+    check_stale = full or (now - _last_stale_check) * 1000.0 >= STALE_CHECK_MS
+    if check_stale:
+        _last_stale_check = now
+        _dirty.update(f for f, _, _ in fields)
+        _dirty.update(("port", "baud"))
 
-    if selected_system == "Air Conditioner":
-        desired = conn.peekDesiredTemp() if is_open else "N/A"
-        ambient = conn.peekAmbientTemp() if is_open else "N/A"
-        fan = conn.peekFanSpeed() if is_open else "N/A"
-
-        status_text = (
-            f"Home Ambient Temperature : {ambient} °C\n"
-            f"Home Desired Temperature : {desired} °C\n"
-            f"Fan Speed                : {fan} rps\n"
-            f"------------------------------------------\n"
-            f"Connection Status         : {conn_status_var.get()}\n"
-            f"PC Port (this app)        : {com}\n"
-            f"PICSim paired port        : COM9 (example)\n"
-            f"Connection Baudrate       : {baud}"
-        )
-    else:
-        out_t = conn.peekOutdoorTemp() if is_open else "N/A"
-        out_p = conn.peekOutdoorPress() if is_open else "N/A"
-        cur_s = conn.peekCurtainStatus() if is_open else "N/A"
-        light = conn.peekLightIntensity() if is_open else "N/A"
-
-        status_text = (
-            f"Outdoor Temperature      : {out_t} °C\n"
-            f"Outdoor Pressure         : {out_p}\n"
-            f"Curtain Status           : {cur_s} %\n"
-            f"Light Intensity          : {light}\n"
-            f"------------------------------------------\n"
-            f"Connection Status         : {conn_status_var.get()}\n"
-            f"PC Port (this app)        : {com}\n"
-            f"PICSim paired port        : COM9 (example)\n"
-            f"Connection Baudrate       : {baud}"
-        )
+    if full:
+        _dirty.add("link")
+
+    if not _dirty:
+        return
 
-    status_label_var.set(status_text)
+    if "link" in _dirty:
+        if _connecting:
+            view.show("link", "Connecting...")
+        elif conn.link_state == "reconnecting":
+            view.show("link", f"Link lost - reconnecting (attempt {conn.link_status()['attempts']})", stale=True)
+        else:
+            view.show("link", "Connected" if is_open else "Not connected")
+        # Values switch between N/A and numbers together with the link state
+        _dirty.update(f for f, _, _ in fields)
+
+    for field, _, unit in fields:
+        if field not in _dirty:
+            continue
+        if not is_open and conn.link_state != "reconnecting":
+            view.show(field, "N/A")
+            continue
+
+        value = _latest.get((selected_system, field))
+        if value is None:
+            value = conn.snapshot().get(field)
+        age = conn.field_age(field)
+        if age is not None and age >= STALE_AFTER_S:
+            view.show(field, f"{_format_value(value, unit)}  (stale {int(age)}s)", stale=True)
+        else:
+            view.show(field, _format_value(value, unit), stale=(age is None))
 
+    if "port" in _dirty or "baud" in _dirty:
+        _, com, baud = _get_conn_and_params()
+        view.show("port", com)
+        view.show("baud", str(baud))
 
-# ================= POLLING LOOP =================
+    _dirty.clear()
+
+
+# ================= UI FRAME LOOP =================
 def _start_polling():
-    """Start the Tkinter after() polling loop if it is not running."""
+    """Start the Tkinter after() frame loop if it is not running."""
     global _poll_job
     if _poll_job is None:
-        _poll_job = root.after(POLL_INTERVAL_MS, _poll_tick)
+        _poll_job = _after(POLL_INTERVAL_MS, _poll_tick)
+
+
+def _drain_updates():
+    """Apply everything the I/O engines posted since the previous frame."""
+    while True:
+        try:
+            name, kind, key, value = _ui_queue.get_nowait()
+        except queue.Empty:
+            return
+        if kind == "call":
+            try:
+                key(*value)
+            except Exception:
+                pass
+        elif kind == "field":
+            # Coalesce: only the newest value per field survives until the next frame.
+            # Values of the hidden system are kept too, so switching back shows them.
+            _latest[(name, key)] = value
+            if name == selected_system:
+                _dirty.add(key)
+        elif kind == "link" and name == selected_system:
+            _dirty.add("link")
 
 
 def _poll_tick():
     """
-    Non-blocking UART polling using Tkinter's after() scheduler.
-    Sends one request at a time and reads at most one response byte per tick.
+    One UI frame: drain the engines' update queue, then refresh the status view
+    from cached values. No serial I/O happens here.
     """
-    global _poll_job, _pending, _queue
+    global _poll_job
 
-    if active_screen != "status":
-        _stop_polling()
-        return
+    with _measure("drain_updates"):
+        _drain_updates()
 
-    conn = ensure_connection_object()
-    if not _is_open(conn):
-        _update_status_text_from_cache()
-        _poll_job = root.after(POLL_INTERVAL_MS, _poll_tick)
-        return
+    now = time.monotonic()
+    if (now - _last_trend_sample) * 1000.0 >= TREND_SAMPLE_MS:
+        _sample_trends(now)
 
-    # 1) If waiting for a response, attempt a non-blocking read
-    if _pending is not None:
-        cmd, sent_at = _pending
-        b = conn._uart_read_byte_now()
-        if b is not None:
-            try:
-                conn.handle_rx(cmd, b)
-            except Exception:
-                pass
-            _pending = None
-        else:
-            if (time.monotonic() - sent_at) * 1000.0 > RESP_TIMEOUT_MS:
-                # Timeout: flush input to avoid stale bytes and move on
-                try:
-                    conn._uart_flush_input()
-                except Exception:
-                    pass
-                _pending = None
-
-    # 2) If no pending request, send the next GET command
-    if _pending is None:
-        if not _queue:
-            _queue = _build_queue()
-
-        if _queue:
-            cmd = _queue.pop(0)
-            try:
-                ok = conn._uart_write_byte(cmd)
-            except Exception:
-                ok = False
+    if active_screen == "status":
+        with _measure("status_refresh"):
+            _render_status()
+    elif active_screen == "trends" and (now - _last_chart_redraw) * 1000.0 >= CHART_REDRAW_MS:
+        with _measure("chart_redraw"):
+            _redraw_charts(now)
+
+    _poll_job = _after(POLL_INTERVAL_MS, _poll_tick)
 
-            if ok:
-                _pending = (cmd, time.monotonic())
 
-                # Optional immediate read (sometimes response arrives quickly)
-                b = conn._uart_read_byte_now()
-                if b is not None:
-                    try:
-                        conn.handle_rx(cmd, b)
-                    except Exception:
-                        pass
-                    _pending = None
+def _sample_trends(now):
+    """Append the current cached value of every charted field (open connections only)."""
+    global _last_trend_sample
+    _last_trend_sample = now
 
-    # 3) Refresh UI from cached values
-    _update_status_text_from_cache()
+    conns = {"Air Conditioner": ac_conn, "Curtain Control": cur_conn}
+    snaps = {}
+    for (system, field), series in _trend_series.items():
+        conn = conns[system]
+        if conn is None or not _is_open(conn) or conn.field_age(field) is None:
+            continue
+        if system not in snaps:
+            snaps[system] = conn.snapshot()
+        series.append(now, snaps[system][field])
 
-    # 4) Schedule next poll tick
-    _poll_job = root.after(POLL_INTERVAL_MS, _poll_tick)
+
+def _redraw_charts(now):
+    global _last_chart_redraw
+    _last_chart_redraw = now
+    for chart in _trend_charts:
+        chart.redraw(now)
 
 
 def refresh_status():
     """Refresh button handler: restart the request cycle without blocking the UI."""
     _kick_poll_cycle()
-    _update_status_text_from_cache()
-
-    if active_screen == "status" and _poll_job is None:
-        _start_polling()
+    _render_status(full=True)
 
 
 # ================= SCREEN 1: MAIN MENU =================
 def main_menu():
     global active_screen
     active_screen = "menu"
-    clear()
+    _show_screen("menu", _build_main_menu)
+
 
-    box = card()
+def _build_main_menu(frame):
+    box = card(frame)
     box.pack(fill="x")
 
     tk.Label(
@@ -440,7 +661,8 @@ def main_menu():
 
     button(box, "1. Air Conditioner", lambda: select_system("Air Conditioner"))
     button(box, "2. Curtain Control", lambda: select_system("Curtain Control"))
-    button(box, "3. Exit", on_exit)
+    button(box, "3. Live Trends", trends_screen)
+    button(box, "4. Exit", on_exit)
 
 
 def select_system(system_name):
@@ -452,11 +674,20 @@ def select_system(system_name):
 
 # ================= SCREEN 2: STATUS =================
 def status_screen():
-    global active_screen
+    """
+    Show the status screen of the selected system.
+    Polling is not restarted: the engine keeps its GET cycle across screen switches,
+    so the cached view only needs to catch up with what changed meanwhile.
+    """
+    global active_screen, _status_view
     active_screen = "status"
+    _show_screen(("status", selected_system), _build_status_screen)
+    _status_view = _status_views[selected_system]
+    _render_status(full=True)
 
-    clear()
-    box = card()
+
+def _build_status_screen(frame):
+    box = card(frame)
     box.pack(fill="x")
 
     tk.Label(
@@ -494,6 +725,9 @@ def status_screen():
         validatecommand=(root.register(validate_int), "%P"),
     )
     baud_entry.grid(row=0, column=3, sticky="we", padx=(10, 0))
+    for entry in (com_entry, baud_entry):
+        entry.bind("<Return>", _on_port_committed)
+        entry.bind("<FocusOut>", _on_port_committed)
 
     settings.grid_columnconfigure(1, weight=1)
     settings.grid_columnconfigure(3, weight=1)
@@ -512,16 +746,21 @@ def status_screen():
 
     tk.Button(btn_row, text="Connect", font=FONT, bg=BTN, relief="flat", command=connect_selected).pack(side="left", padx=(0, 10))
     tk.Button(btn_row, text="Disconnect", font=FONT, bg=BTN, relief="flat", command=disconnect_selected).pack(side="left", padx=(0, 10))
-    tk.Button(btn_row, text="Refresh", font=FONT, bg=BTN, relief="flat", command=refresh_status).pack(side="left")
-
-    tk.Label(
-        box,
-        textvariable=status_label_var,
-        font=FONT,
-        bg=CARD,
-        fg=TEXT_SUB,
-        justify="left",
-    ).pack(anchor="w", pady=(10, 0))
+    tk.Button(btn_row, text="Refresh", font=FONT, bg=BTN, relief="flat", command=refresh_status).pack(side="left", padx=(0, 10))
+    tk.Button(btn_row, text="Auto-detect", font=FONT, bg=BTN, relief="flat", command=auto_detect_ports).pack(side="left")
+
+    rows = [(field, caption) for field, caption, _ in STATUS_FIELDS[selected_system]]
+    rows += [
+        None,
+        ("link", "Connection Status"),
+        ("port", "PC Port (this app)"),
+        ("paired", "PICSim paired port"),
+        ("baud", "Connection Baudrate"),
+    ]
+    view = StatusView(box, rows, font=FONT, bg=CARD, fg=TEXT_SUB, stale_fg=STALE)
+    view.frame.pack(anchor="w", pady=(10, 0))
+    view.show("paired", "COM9 (example)")
+    _status_views[selected_system] = view
 
     tk.Label(
         box,
@@ -535,18 +774,22 @@ def status_screen():
     button(box, f"1. {action_text}", input_screen)
     button(box, "2. Return", main_menu)
 
-    _kick_poll_cycle()
-    _start_polling()
-    _update_status_text_from_cache()
-
 
 # ================= SCREEN 3: INPUT =================
 def input_screen():
     global active_screen
     active_screen = "input"
+    _show_screen(("input", selected_system), _build_input_screen)
+
+    # Reset the cached form for a new entry
+    value_var, entry, send_btn = _input_widgets[selected_system]
+    value_var.set("")
+    send_btn.config(state="normal", text="1. Enter (Send)")
+    entry.focus_set()
 
-    clear()
-    box = card()
+
+def _build_input_screen(frame):
+    box = card(frame)
     box.pack(fill="x")
 
     action = "Enter Desired Temperature" if selected_system == "Air Conditioner" else "Enter Desired Curtain Status"
@@ -587,62 +830,107 @@ def input_screen():
         validatecommand=(root.register(validate_float), "%P"),
     )
     entry.pack(fill="x", pady=15)
-    entry.focus_set()
 
     def send_value():
         """
         Send a SET value to the PIC.
-        Polling is temporarily stopped to avoid collision with GET polling traffic.
+        The SET runs on the I/O thread between two GET polls, so it never collides
+        with polling traffic and the window stays responsive while it retries.
         """
-        global _poll_job, _pending, _queue
-        conn = ensure_connection_object()
-
-        # Stop polling while sending a SET command
-        if _poll_job is not None:
-            try:
-                root.after_cancel(_poll_job)
-            except Exception:
-                pass
-            _poll_job = None
-
-        _pending = None
-        _queue = []
+        conn = _selected_conn()
 
         if not _is_open(conn):
             messagebox.showerror("Error", "Connection is not open!")
-            _start_polling()
             return
 
         txt = value_var.get().strip()
         if not txt:
-            _start_polling()
             return
 
         try:
             val = float(txt)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Numeric input error or UART error: {e}")
+            return
 
-            if selected_system == "Air Conditioner":
-                ok = conn.setDesiredTemp(val)
-            else:
-                ok = conn.setCurtainStatus(val)
-
-            if ok:
-                messagebox.showinfo("Success", f"Value ({val}) has been sent.")
-                status_screen()
-            else:
-                messagebox.showerror("Error", "PIC did not receive the data packet.")
-                status_screen()
+        if selected_system == "Air Conditioner":
+            fut = _get_engine().submit(conn.setDesiredTemp, val)
+        else:
+            fut = _get_engine().submit(conn.setCurtainStatus, val)
+
+        send_btn.config(state="disabled", text="Sending...")
+        fut.add_done_callback(lambda f: _call_soon(_on_send_done, val, f))
+
+    def _on_send_done(val, fut):
+        """Tk-thread completion of send_value()."""
+        exc = fut.exception()
+        if exc is not None:
+            messagebox.showerror("Error", f"Numeric input error or UART error: {exc}")
+        elif fut.result():
+            messagebox.showinfo("Success", f"Value ({val}) has been sent.")
+        else:
+            messagebox.showerror("Error", "PIC did not receive the data packet.")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Numeric input error or UART error: {e}")
+        if active_screen == "input":
             status_screen()
 
-        # Restart polling after the status screen is rebuilt
-        root.after(200, _start_polling)
-
-    button(box, "1. Enter (Send)", send_value)
+    send_btn = button(box, "1. Enter (Send)", send_value)
     button(box, "2. Return", status_screen)
 
+    _input_widgets[selected_system] = (value_var, entry, send_btn)
+
+
+# ================= SCREEN 4: LIVE TRENDS =================
+def trends_screen():
+    global active_screen
+    active_screen = "trends"
+    _show_screen("trends", _build_trends_screen)
+    _redraw_charts(time.monotonic())
+
+
+def _build_trends_screen(frame):
+    box = card(frame)
+    box.pack(fill="both", expand=True)
+
+    tk.Label(
+        box,
+        text="LIVE TRENDS",
+        font=FONT_TITLE,
+        bg=CARD,
+        fg=ACCENT,
+    ).pack(anchor="w", pady=(0, 10))
+
+    tk.Label(
+        box,
+        text=f"Last {int(TREND_SPAN_S // 60)} minutes, min/max per pixel column.",
+        font=("Segoe UI", 11),
+        bg=CARD,
+        fg=TEXT_SUB,
+    ).pack(anchor="w", pady=(0, 10))
+
+    grid = tk.Frame(box, bg=CARD)
+    grid.pack(fill="both", expand=True)
+
+    for i, (system, field, title, unit) in enumerate(TREND_FIELDS):
+        chart = TrendChart(
+            grid,
+            _trend_series[(system, field)],
+            title,
+            unit,
+            bg=BG,
+            fg=TEXT_SUB,
+            line=ACCENT,
+        )
+        chart.canvas.grid(row=i // 3, column=i % 3, sticky="nsew", padx=6, pady=6)
+        _trend_charts.append(chart)
+
+    for c in range(3):
+        grid.grid_columnconfigure(c, weight=1)
+    for r in range((len(TREND_FIELDS) + 2) // 3):
+        grid.grid_rowconfigure(r, weight=1)
+
+    button(box, "1. Return", main_menu)
+
 
 # ================= APP CLOSE =================
 def on_exit():
@@ -650,6 +938,20 @@ def on_exit():
     global ac_conn, cur_conn
     _stop_polling()
 
+    # Stop I/O threads before closing their ports
+    for engine in (ac_engine, cur_engine):
+        if engine is not None:
+            engine.stop()
+
+    if _metrics_server is not None:
+        _metrics_server.stop()
+
+    if _profiler is not None:
+        _profiler.stop()
+
+    if _state_store is not None:
+        _state_store.stop()
+
     try:
         if ac_conn is not None:
             ac_conn.close()
@@ -662,11 +964,72 @@ def on_exit():
     except Exception:
         pass
 
-    root.destroy()
+    if _journal is not None:
+        _journal.close()
 
+    root.destroy()
 
-root.protocol("WM_DELETE_WINDOW", on_exit)
 
 # ================= START =================
-main_menu()
-root.mainloop()
+def main(argv=None) -> int:
+    """GUI entry point. For data collection without a display, see daemon.py."""
+    global _metrics_server, _profiler, _state_store, _journal
+
+    parser = argparse.ArgumentParser(description="Home Automation System GUI")
+    parser.add_argument(
+        "--measure-startup",
+        action="store_true",
+        help="Print the time until the first frame is drawn, then exit",
+    )
+    args = parser.parse_args(argv)
+
+    if STATE_FILE is not None:
+        # Imported here so the store is only loaded when warm start is enabled
+        from state_store import StateStore
+
+        _state_store = StateStore(STATE_FILE)
+        _state_store.load()
+        _state_store.start()
+
+    if JOURNAL_FILE is not None:
+        from set_journal import SetJournal
+
+        _journal = SetJournal(JOURNAL_FILE)
+        _journal.open()
+
+    _build_layout()
+    root.protocol("WM_DELETE_WINDOW", on_exit)
+
+    if METRICS_PORT is not None:
+        _metrics_server = MetricsServer(lambda: {"air_conditioner": ac_conn, "curtain": cur_conn}, port=METRICS_PORT)
+        _metrics_server.start()
+
+    if UI_PROFILE_DIR is not None:
+        # Imported here so cProfile is only loaded when profiling is enabled
+        from ui_profiler import TkProfiler
+
+        _profiler = TkProfiler(
+            root,
+            UI_PROFILE_DIR,
+            cprofile=UI_PROFILE_CPROFILE,
+            folded_stacks=UI_PROFILE_FOLDED_STACKS,
+        )
+        _profiler.start()
+
+    main_menu()
+    _start_polling()
+
+    if args.measure_startup:
+        def _report_startup():
+            root.update_idletasks()
+            print(f"[STARTUP] gui: first frame after {(time.perf_counter() - _T0) * 1000.0:.1f} ms")
+            on_exit()
+
+        root.after_idle(_report_startup)
+
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+# Author: 152120221098 Emre AVCI
+"""
+Serial stack instrumentation
+----------------------------
+Every HomeAutomationSystemConnection owns a ConnectionMetrics object that counts
+what happens on its UART: per-opcode latency (log-bucketed histograms; GET
+round trip, SET write to verified read-back), timeouts, SET retries, bytes
+written/read, input-buffer flushes, link losses, reconnects and GETs skipped
+by predictive polling.
+
+MetricsServer publishes those counters (plus the stale-value age of every
+decoded field) on a small local HTTP endpoint in Prometheus text format:
+
+    http://127.0.0.1:9108/metrics
+
+Throughput is left to the scraper, e.g. rate(uart_tx_bytes_total[1m]): a
+scrape does not change any state, so several scrapers see the same numbers.
+
+Recording is done on the serial hot path, so it only touches preallocated
+lists and integers: no dicts, strings or objects are created per sample.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+from protocol import SET_DESIRED_VALUE_HIGH_MASK, SET_DESIRED_VALUE_LOW_MASK
+
+# Upper bounds (seconds) of the latency buckets: 0.5 ms .. ~4 s, doubling each step.
+LATENCY_BUCKETS_S: tuple[float, ...] = tuple(0.0005 * (2 ** i) for i in range(14))
+
+# One slot per possible opcode. SET frames carry payload bits, so they are
+# folded onto their mask (0x80 = SET LOW, 0xC0 = SET HIGH) before indexing.
+OPCODE_SLOTS = 256
+
+
+def opcode_slot(cmd: int) -> int:
+    """Map a raw command byte to its metrics slot."""
+    cmd &= 0xFF
+    if cmd & 0x80:
+        return cmd & 0xC0
+    return cmd
+
+
+def opcode_label(slot: int) -> str:
+    """Human readable opcode label used in the exported metrics."""
+    if slot == SET_DESIRED_VALUE_HIGH_MASK:
+        return "SET_HIGH"
+    if slot == SET_DESIRED_VALUE_LOW_MASK:
+        return "SET_LOW"
+    return f"GET_0x{slot:02X}"
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram. observe() does not allocate."""
+
+    __slots__ = ("counts", "count", "sum_s")
+
+    def __init__(self):
+        # Last slot is the +Inf bucket
+        self.counts: list[int] = [0] * (len(LATENCY_BUCKETS_S) + 1)
+        self.count: int = 0
+        self.sum_s: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BUCKETS_S, seconds)] += 1
+        self.count += 1
+        self.sum_s += seconds
+
+    def quantile(self, q: float) -> float | None:
+        """Approximate q-quantile in seconds (linear inside its bucket), None if empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            if i == len(LATENCY_BUCKETS_S):
+                return lower  # +Inf bucket: only its lower bound is known
+            upper = LATENCY_BUCKETS_S[i]
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * max(0.0, rank - seen) / n
+            seen += n
+            lower = upper
+        return lower
+
+
+class ConnectionMetrics:
+    """
+    Counters for one connection.
+    All record_* methods are cheap enough to be called for every UART byte.
+    """
+
+    def __init__(self):
+        self.latency: list[LatencyHistogram] = [LatencyHistogram() for _ in range(OPCODE_SLOTS)]
+        self.requests: list[int] = [0] * OPCODE_SLOTS
+        self.timeouts: list[int] = [0] * OPCODE_SLOTS
+        self.write_errors: list[int] = [0] * OPCODE_SLOTS
+        self.set_retries: int = 0
+        self.set_coalesced: int = 0
+        self.set_elided: int = 0
+        self.bytes_tx: int = 0
+        self.bytes_rx: int = 0
+        self.flushes: int = 0
+        self.link_losses: int = 0
+        self.reconnects: int = 0
+        self.gets_predicted: int = 0
+        self.started_at: float = time.monotonic()
+
+    # -------------------- HOT PATH --------------------
+    def record_tx(self, cmd: int) -> None:
+        self.bytes_tx += 1
+        self.requests[opcode_slot(cmd)] += 1
+
+    def record_write_error(self, cmd: int) -> None:
+        self.write_errors[opcode_slot(cmd)] += 1
+
+    def record_rx(self) -> None:
+        self.bytes_rx += 1
+
+    def record_flush(self) -> None:
+        self.flushes += 1
+
+    def record_latency(self, cmd: int, seconds: float) -> None:
+        self.latency[opcode_slot(cmd)].observe(seconds)
+
+    def record_set_verified(self, seconds: float) -> None:
+        """SET HIGH/LOW pair: time from its write to the read-back that verified it."""
+        self.latency[SET_DESIRED_VALUE_HIGH_MASK].observe(seconds)
+        self.latency[SET_DESIRED_VALUE_LOW_MASK].observe(seconds)
+
+    def record_timeout(self, cmd: int) -> None:
+        self.timeouts[opcode_slot(cmd)] += 1
+
+    def record_retry(self) -> None:
+        self.set_retries += 1
+
+    def record_set_coalesced(self) -> None:
+        self.set_coalesced += 1
+
+    def record_set_elided(self) -> None:
+        self.set_elided += 1
+
+    def record_link_lost(self) -> None:
+        self.link_losses += 1
+
+    def record_reconnect(self) -> None:
+        self.reconnects += 1
+
+    def record_predicted(self, n: int) -> None:
+        self.gets_predicted += n
+
+
+# -------------------- PROMETHEUS TEXT FORMAT --------------------
+def _field_of(conn, slot: int) -> str:
+    """Return the decoded field an opcode belongs to (empty if unknown)."""
+    if slot in (SET_DESIRED_VALUE_HIGH_MASK, SET_DESIRED_VALUE_LOW_MASK):
+        return getattr(conn, "SETPOINT_FIELD", "")
+    for field, (hi, lo) in getattr(conn, "FIELDS", {}).items():
+        if slot == hi or slot == lo:
+            return field
+    return ""
+
+
+def render_prometheus(connections: dict) -> str:
+    """
+    Render metrics for {board_name: connection} in Prometheus text exposition format.
+    None entries (connection not created yet) are skipped.
+    """
+    out: list[str] = []
+
+    def header(name: str, kind: str, help_text: str) -> None:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+
+    items = [(b, c) for b, c in connections.items() if c is not None]
+
+    header(
+        "uart_request_latency_seconds",
+        "histogram",
+        "Latency per opcode: GET round trip, SET frames from the write to the verified read-back.",
+    )
+    for board, conn in items:
+        m = conn.metrics
+        for slot in range(OPCODE_SLOTS):
+            h = m.latency[slot]
+            if h.count == 0:
+                continue
+            labels = (
+                f'board="{board}",port="{conn._comPort}",'
+                f'opcode="{opcode_label(slot)}",field="{_field_of(conn, slot)}"'
+            )
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS_S, h.counts):
+                cumulative += n
+                out.append(f'uart_request_latency_seconds_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            out.append(f'uart_request_latency_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            out.append(f"uart_request_latency_seconds_sum{{{labels}}} {h.sum_s:.6f}")
+            out.append(f"uart_request_latency_seconds_count{{{labels}}} {h.count}")
+
+    for name, attr, help_text in (
+        ("uart_requests_total", "requests", "Command bytes written per opcode."),
+        ("uart_timeouts_total", "timeouts", "GET requests that got no response before the deadline."),
+        ("uart_write_errors_total", "write_errors", "Command bytes that could not be written."),
+    ):
+        header(name, "counter", help_text)
+        for board, conn in items:
+            values = getattr(conn.metrics, attr)
+            for slot in range(OPCODE_SLOTS):
+                if values[slot]:
+                    out.append(
+                        f'{name}{{board="{board}",port="{conn._comPort}",'
+                        f'opcode="{opcode_label(slot)}"}} {values[slot]}'
+                    )
+
+    for name, attr, help_text in (
+        ("uart_set_retries_total", "set_retries", "SET attempts repeated after a failed verify."),
+        ("uart_set_coalesced_total", "set_coalesced", "SET requests superseded by a newer one within the debounce window."),
+        ("uart_set_elided_total", "set_elided", "SET writes skipped because the board already had the target value."),
+        ("uart_tx_bytes_total", "bytes_tx", "Bytes written to the UART."),
+        ("uart_rx_bytes_total", "bytes_rx", "Bytes read from the UART."),
+        ("uart_input_flushes_total", "flushes", "Input buffer resets."),
+        ("uart_link_lost_total", "link_losses", "Times the link was declared dead (timeouts / OS errors in a row)."),
+        ("uart_reconnects_total", "reconnects", "Successful background reopens of the port."),
+        ("uart_gets_predicted_total", "gets_predicted", "GETs skipped because the value was predicted within tolerance."),
+    ):
+        header(name, "counter", help_text)
+        for board, conn in items:
+            out.append(f'{name}{{board="{board}",port="{conn._comPort}"}} {getattr(conn.metrics, attr)}')
+
+    header("uart_connected", "gauge", "1 if the serial port is open.")
+    for board, conn in items:
+        out.append(f'uart_connected{{board="{board}",port="{conn._comPort}"}} {1 if conn.is_open() else 0}')
+
+    header("field_value_age_seconds", "gauge", "Seconds since the field was last decoded from the board (-1 = never).")
+    for board, conn in items:
+        for field in getattr(conn, "FIELDS", {}):
+            age = conn.field_age(field)
+            out.append(
+                f'field_value_age_seconds{{board="{board}",port="{conn._comPort}",field="{field}"}} '
+                f"{-1 if age is None else round(age, 3)}"
+            )
+
+    out.append("")
+    return "\n".join(out)
+
+
+# -------------------- HTTP ENDPOINT --------------------
+class MetricsServer:
+    """
+    Serves GET /metrics on a background daemon thread.
+
+    The provider callable returns the current {board_name: connection} map, so
+    connections that are rebuilt later (e.g. COM port changed in the GUI) are
+    picked up automatically.
+    """
+
+    def __init__(self, provider: Callable[[], dict], host: str = "127.0.0.1", port: int = 9108):
+        self._provider = provider
+        self._host = host
+        self._port = port
+        self._httpd = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        """Bound TCP port (useful when started with port=0)."""
+        if self._httpd is not None:
+            return self._httpd.server_address[1]
+        return self._port
+
+    def start(self) -> None:
+        if self._httpd is not None:
+            return
+
+        # Imported on demand: http.server is slow to import and only needed when serving
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        provider = self._provider
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(provider()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep the console clean; scrapes happen every few seconds
+                return
+
+        self._httpd = ThreadingHTTPServer((self._host, self._port), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._httpd is None:
+            return
+        try:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        finally:
+            self._httpd = None
+            self._thread = None
@@ -0,0 +1,93 @@
+# Author: 152120221098 Emre AVCI
+"""
+Cache recorder
+--------------
+CsvRecorder samples the decoded caches of one or more connections at a fixed
+interval and appends them to a CSV file:
+
+    time,board,field,value,age_s
+
+Only fields that have been read from the board at least once are written.
+Sampling reads caches (snapshot/field_age) only, so recording adds no UART traffic.
+"""
+
+import csv
+import os
+import threading
+import time
+
+
+class CsvRecorder:
+    def __init__(
+        self,
+        path: str,
+        connections: dict,
+        interval_s: float = 1.0,
+        flush_every_s: float = 5.0,
+    ):
+        """connections: {board_name: connection}"""
+        self._path = path
+        self._connections = connections
+        self._interval_s = interval_s
+        self._flush_every_s = flush_every_s
+
+        self._file = None
+        self._writer = None
+        self._last_flush = 0.0
+        self.rows_written = 0
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        new_file = not os.path.exists(self._path) or os.path.getsize(self._path) == 0
+        self._file = open(self._path, "a", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(["time", "board", "field", "value", "age_s"])
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._file is not None:
+            self._file.flush()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    # -------------------- SAMPLING --------------------
+    def sample(self) -> None:
+        """Write one row per known field of every open connection."""
+        if self._writer is None:
+            return
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for board, conn in self._connections.items():
+            if conn is None or not conn.is_open():
+                continue
+            for field, value in conn.snapshot().items():
+                age = conn.field_age(field)
+                if age is None:
+                    continue
+                self._writer.writerow([stamp, board, field, value, f"{age:.3f}"])
+                self.rows_written += 1
+
+        now = time.monotonic()
+        if now - self._last_flush >= self._flush_every_s:
+            self._last_flush = now
+            self._file.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"[WARN] recorder: {e}")
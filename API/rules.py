@@ -0,0 +1,286 @@
+# Author: 152120221098 Emre AVCI
+"""
+Cross-board automation rules
+----------------------------
+Event-driven rule engine, e.g. "close the curtain when light intensity is above
+60 and ambient temperature is above desired":
+
+    Rule("shade",
+         when=[Above("curtain", "light_intensity", 60.0, hysteresis=5.0),
+               AboveField("air_conditioner", "ambient_temp",
+                          "air_conditioner", "desired_temp", hysteresis=0.5)],
+         board="curtain", value=100.0, else_value=0.0, min_interval_s=30.0)
+
+Evaluation is incremental:
+- every condition is indexed under the (board, field) keys it reads, so a change
+  only re-evaluates the conditions that depend on that field
+- every rule keeps a count of its conditions that are not met, so a rule is
+  re-decided in O(1) when one of its conditions flips (no rescan of all rules)
+
+Conditions have hysteresis (a condition that became true only turns false again
+once the value is `hysteresis` past the threshold), and every rule is rate
+limited (at most one SET per min_interval_s; a later change inside the window is
+written when the window ends, if it is still wanted).
+
+Change events come from the connections' subscriptions (attach()), or from any
+other source via on_change(). SETs go through one SetpointWriter per board over
+set_setpoint_async(), so they never block the thread that reported the change
+and rules that fire together are coalesced into one write.
+
+Rules can also be loaded from a JSON file (load_rules, daemon.py --rules):
+
+    [{"name": "shade",
+      "when": [{"field": "curtain.light_intensity", "above": 60, "hysteresis": 5},
+               {"field": "air_conditioner.ambient_temp",
+                "above_field": "air_conditioner.desired_temp", "hysteresis": 0.5}],
+      "set": "curtain", "value": 100, "else": 0, "min_interval_s": 30}]
+"""
+
+import json
+import threading
+import time
+
+from setpoint_writer import SetpointWriter
+
+
+# -------------------- CONDITIONS --------------------
+class Condition:
+    """
+    Base condition. Subclasses implement _margin(values): how far the condition
+    is past its threshold (> 0 = met), or None while an input is unknown.
+    """
+
+    keys: tuple[tuple[str, str], ...] = ()
+
+    def __init__(self, hysteresis: float = 0.0):
+        self.hysteresis = abs(float(hysteresis))
+        self.state: bool | None = None  # None until every input has been seen
+        self.rule: "Rule | None" = None
+
+    def _margin(self, values: dict) -> float | None:
+        raise NotImplementedError("_margin() must be implemented by subclasses")
+
+    def update(self, values: dict) -> bool | None:
+        """Re-evaluate against the latest values; returns the new state."""
+        margin = self._margin(values)
+        if margin is None:
+            self.state = None
+        elif margin > 0:
+            self.state = True
+        elif margin < -self.hysteresis or not self.state:
+            # Inside the hysteresis band the previous state is kept
+            self.state = False
+        return self.state
+
+
+class Above(Condition):
+    """board.field > threshold (released below threshold - hysteresis)."""
+
+    def __init__(self, board: str, field: str, threshold: float, hysteresis: float = 0.0):
+        super().__init__(hysteresis)
+        self.keys = ((board, field),)
+        self.threshold = float(threshold)
+
+    def _margin(self, values: dict) -> float | None:
+        v = values.get(self.keys[0])
+        return None if v is None else v - self.threshold
+
+
+class Below(Above):
+    """board.field < threshold (released above threshold + hysteresis)."""
+
+    def _margin(self, values: dict) -> float | None:
+        v = values.get(self.keys[0])
+        return None if v is None else self.threshold - v
+
+
+class AboveField(Condition):
+    """board.field > other_board.other_field (e.g. ambient above desired)."""
+
+    def __init__(self, board: str, field: str, other_board: str, other_field: str, hysteresis: float = 0.0):
+        super().__init__(hysteresis)
+        self.keys = ((board, field), (other_board, other_field))
+
+    def _margin(self, values: dict) -> float | None:
+        a = values.get(self.keys[0])
+        b = values.get(self.keys[1])
+        return None if (a is None or b is None) else a - b
+
+
+class BelowField(AboveField):
+    """board.field < other_board.other_field."""
+
+    def _margin(self, values: dict) -> float | None:
+        margin = super()._margin(values)
+        return None if margin is None else -margin
+
+
+# -------------------- RULES --------------------
+class Rule:
+    def __init__(
+        self,
+        name: str,
+        when: list[Condition],
+        board: str,
+        value: float,
+        else_value: float | None = None,
+        min_interval_s: float = 30.0,
+    ):
+        """
+        When every condition of `when` is met, write `value` to the setpoint of
+        `board`; when the rule stops being met, write `else_value` (if given).
+        """
+        if not when:
+            raise ValueError(f"Rule {name!r} has no conditions")
+        self.name = name
+        self.when = list(when)
+        self.board = board
+        self.value = float(value)
+        self.else_value = None if else_value is None else float(else_value)
+        self.min_interval_s = float(min_interval_s)
+
+        self.unmet = len(self.when)  # conditions currently not True
+        self.active = False
+        self.last_written: float | None = None
+        self.last_set_at = float("-inf")
+        self.timer: threading.Timer | None = None
+
+    def target(self) -> float | None:
+        return self.value if self.active else self.else_value
+
+
+class RuleEngine:
+    def __init__(self, rules: list[Rule], connections: dict, window_s: float = 0.15):
+        """connections: {board_name: connection}; rule boards must be among them."""
+        self.rules = list(rules)
+        self.connections = connections
+        self.writers = {
+            board: SetpointWriter(conn, window_s=window_s, write=conn.set_setpoint_async)
+            for board, conn in connections.items()
+        }
+
+        # (board, field) -> conditions reading it
+        self._index: dict[tuple[str, str], list[Condition]] = {}
+        for rule in self.rules:
+            if rule.board not in self.writers:
+                raise ValueError(f"Rule {rule.name!r} targets unknown board {rule.board!r}")
+            for cond in rule.when:
+                cond.rule = rule
+                for key in cond.keys:
+                    self._index.setdefault(key, []).append(cond)
+
+        self._values: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._subs: list = []
+
+        self.events = 0
+        self.evaluations = 0
+        self.writes = 0
+        self.rate_limited = 0
+
+    # -------------------- EVENT SOURCES --------------------
+    def attach(self) -> None:
+        """Subscribe to every field the rules read on the engine's connections."""
+        for board, field in self._index:
+            conn = self.connections.get(board)
+            if conn is None:
+                continue
+            sub = conn.subscribe(field, lambda f, v, board=board: self.on_change(board, f, v))
+            self._subs.append((conn, sub))
+
+    def close(self) -> None:
+        for conn, sub in self._subs:
+            conn.unsubscribe(sub)
+        self._subs.clear()
+        with self._lock:
+            for rule in self.rules:
+                if rule.timer is not None:
+                    rule.timer.cancel()
+                    rule.timer = None
+
+    def on_change(self, board: str, field: str, value: float) -> None:
+        """Feed one decoded change; re-evaluates only the rules depending on it."""
+        key = (board, field)
+        conds = self._index.get(key)
+        if not conds:
+            return
+        with self._lock:
+            self.events += 1
+            self._values[key] = value
+            for cond in conds:
+                self.evaluations += 1
+                was_met = cond.state is True
+                is_met = cond.update(self._values) is True
+                if was_met == is_met:
+                    continue
+                rule = cond.rule
+                rule.unmet += -1 if is_met else 1
+                active = rule.unmet == 0
+                if active != rule.active:
+                    rule.active = active
+                    self._apply(rule)
+
+    # -------------------- OUTPUT --------------------
+    def _apply(self, rule: Rule) -> None:
+        """Write the rule's current target, respecting its rate limit (lock held)."""
+        target = rule.target()
+        if target is None or target == rule.last_written:
+            return
+
+        wait = rule.last_set_at + rule.min_interval_s - time.monotonic()
+        if wait > 0:
+            self.rate_limited += 1
+            if rule.timer is None:
+                rule.timer = threading.Timer(wait, self._apply_deferred, args=(rule,))
+                rule.timer.daemon = True
+                rule.timer.start()
+            return
+
+        rule.last_set_at = time.monotonic()
+        rule.last_written = target
+        self.writes += 1
+        self.writers[rule.board].request(target)
+
+    def _apply_deferred(self, rule: Rule) -> None:
+        with self._lock:
+            rule.timer = None
+            self._apply(rule)
+
+
+# -------------------- JSON LOADING --------------------
+def _split_key(text: str) -> tuple[str, str]:
+    board, sep, field = text.partition(".")
+    if not sep:
+        raise ValueError(f"Expected 'board.field', got {text!r}")
+    return board, field
+
+
+def _condition_from_dict(d: dict) -> Condition:
+    board, field = _split_key(d["field"])
+    hysteresis = float(d.get("hysteresis", 0.0))
+    if "above" in d:
+        return Above(board, field, d["above"], hysteresis)
+    if "below" in d:
+        return Below(board, field, d["below"], hysteresis)
+    if "above_field" in d:
+        return AboveField(board, field, *_split_key(d["above_field"]), hysteresis=hysteresis)
+    if "below_field" in d:
+        return BelowField(board, field, *_split_key(d["below_field"]), hysteresis=hysteresis)
+    raise ValueError(f"Condition needs one of above/below/above_field/below_field: {d}")
+
+
+def load_rules(path: str) -> list[Rule]:
+    """Read rules from a JSON file (format in the module docstring)."""
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    return [
+        Rule(
+            item.get("name", f"rule{i}"),
+            [_condition_from_dict(c) for c in item["when"]],
+            board=item["set"],
+            value=item["value"],
+            else_value=item.get("else"),
+            min_interval_s=item.get("min_interval_s", 30.0),
+        )
+        for i, item in enumerate(items)
+    ]
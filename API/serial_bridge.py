@@ -0,0 +1,334 @@
+# Author: 152120221098 Emre AVCI
+"""
+Serial bridge server
+--------------------
+Owns one local serial port and shares the board behind it with any number of
+TCP clients. Clients speak the raw UART protocol, so a normal connection
+object works unchanged through the TCP transport:
+
+    python serial_bridge.py --port COM8 --listen 0.0.0.0:7000
+    python daemon.py --ac-port tcp://bridge-host:7000
+
+The UART allows only one request at a time. Client bytes go into one queue,
+and a single worker thread arbitrates between the clients:
+
+- Batching: requests that arrive within batch_window_s form one batch. An
+  identical GET from several clients is sent to the board once, and every
+  client that asked gets the reply.
+- Fairness: the GETs of a batch are served round-robin, one per client in
+  turn, so a client queued behind the bursts of others is not starved.
+- Correlation: each GET is sent stop-and-wait, so its reply is known to be
+  its own. Every client gets replies in the order of its own requests.
+  A client stops waiting for a reply after get_timeout_ms and sends its next
+  GET, so a reply that would arrive later than that is dropped instead of
+  being taken as the answer to the new GET. The wait starts when the GET was
+  received, or when the client's previous reply was sent if that is later
+  (a pipelined burst waits for its replies one after the other). After a
+  dropped or timed-out reply the rest of that burst is dropped too, so the
+  client never takes one reply for another (a silent board looks the same).
+- SET frames: a client's SET HIGH is held until its SET LOW arrives. The pair
+  is then written back to back, so SETs from two clients never mix into one
+  setpoint. A HIGH whose LOW does not follow within SET_PAIR_TIMEOUT_S is
+  sent on its own.
+- Order: a SET waits until the GETs received before it have been answered.
+
+The serial side uses HomeAutomationSystemConnection, with its metrics and
+its reconnect on link loss. The port may itself be tcp://... (e.g. a
+board_emulator.py instance), so everything can run on localhost.
+"""
+
+import argparse
+import collections
+import queue
+import socket
+import sys
+import threading
+import time
+
+from base_connections import HomeAutomationSystemConnection
+from tcp_transport import parse_address
+
+BATCH_WINDOW_S = 0.005
+SET_PAIR_TIMEOUT_S = 0.1
+GET_TIMEOUT_MS = 80
+
+
+class _Client:
+    """One TCP client of the bridge."""
+
+    __slots__ = ("sock", "name", "pending_high", "high_at", "replied_at", "closed")
+
+    def __init__(self, sock: socket.socket, name: str):
+        self.sock = sock
+        self.name = name
+        self.pending_high: int | None = None  # SET HIGH waiting for its LOW
+        self.high_at = 0.0
+        self.replied_at = 0.0  # when the last GET reply was sent to this client
+        self.closed = False
+
+    def send(self, data: bytes) -> None:
+        if self.closed:
+            return
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            self.closed = True
+
+
+class SerialBridge:
+    def __init__(
+        self,
+        port: str,
+        baud: int = 9600,
+        host: str = "127.0.0.1",
+        tcp_port: int = 7000,
+        batch_window_s: float = BATCH_WINDOW_S,
+        get_timeout_ms: int = GET_TIMEOUT_MS,
+    ):
+        self.conn = HomeAutomationSystemConnection(port, baud)
+        self._host = host
+        self._tcp_port = tcp_port
+        self._batch_window_s = batch_window_s
+        self._get_timeout_ms = get_timeout_ms
+        self._listener: socket.socket | None = None
+        self._inbox: queue.Queue = queue.Queue()
+        self._clients: set[_Client] = set()
+        self._clients_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+        self.clients_total = 0
+        self.batches = 0
+        self.gets_requested = 0  # GET bytes received from clients
+        self.gets_sent = 0  # GET bytes written to the board
+        self.sets_sent = 0  # SET frames written to the board
+        self.replies_dropped = 0  # replies withheld: too late for the client, or after a timeout in its burst
+
+    @property
+    def port(self) -> int:
+        """Bound TCP port (useful when started with tcp_port=0)."""
+        if self._listener is not None:
+            return self._listener.getsockname()[1]
+        return self._tcp_port
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        """Open the serial port and start listening (raises if either fails)."""
+        self.conn.open()
+        self._listener = socket.create_server((self._host, self._tcp_port))
+        self._listener.settimeout(0.5)
+        self._stop.clear()
+        for target, name in ((self._accept_loop, "bridge-accept"), (self._worker, "bridge-uart")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.close()
+        with self._clients_lock:
+            clients, self._clients = list(self._clients), set()
+        for client in clients:
+            self._drop(client)
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        self._listener = None
+        self.conn.close()
+
+    def stats(self) -> dict:
+        with self._clients_lock:
+            connected = len(self._clients)
+        return {
+            "clients": connected,
+            "clients_total": self.clients_total,
+            "batches": self.batches,
+            "gets_requested": self.gets_requested,
+            "gets_sent": self.gets_sent,
+            "gets_shared": self.gets_requested - self.gets_sent,
+            "sets_sent": self.sets_sent,
+            "replies_dropped": self.replies_dropped,
+            "link": self.conn.link_state,
+        }
+
+    # -------------------- CLIENT SIDE --------------------
+    def _accept_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                sock, addr = self._listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # listener closed by stop()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(sock, f"{addr[0]}:{addr[1]}")
+            with self._clients_lock:
+                self._clients.add(client)
+                self.clients_total += 1
+            threading.Thread(target=self._reader, args=(client,), name=f"bridge-{client.name}", daemon=True).start()
+
+    def _reader(self, client: _Client) -> None:
+        """Forward everything one client sends into the worker's queue."""
+        while not client.closed:
+            try:
+                data = client.sock.recv(256)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            self._inbox.put((client, data, time.monotonic()))
+        with self._clients_lock:
+            self._clients.discard(client)
+        self._drop(client)
+
+    @staticmethod
+    def _drop(client: _Client) -> None:
+        client.closed = True
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    # -------------------- UART WORKER --------------------
+    def _worker(self) -> None:
+        held: set[_Client] = set()  # clients with a SET HIGH waiting for its LOW
+        while not self._stop.is_set():
+            self.conn.supervise()
+
+            # Wait for the first request (or until a held SET HIGH expires)
+            now = time.monotonic()
+            wait_s = 0.2
+            if held:
+                wait_s = max(0.0, min(c.high_at for c in held) + SET_PAIR_TIMEOUT_S - now)
+            try:
+                batch = [self._inbox.get(timeout=wait_s)]
+            except queue.Empty:
+                batch = []
+
+            # Let requests of the other clients join the batch
+            if batch:
+                deadline = time.monotonic() + self._batch_window_s
+                while True:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._inbox.get(timeout=max(0.0, remaining)) if remaining > 0
+                                     else self._inbox.get_nowait())
+                    except queue.Empty:
+                        break
+                self.batches += 1
+
+            self._serve_batch(batch, held)
+
+            # SET HIGH frames whose LOW never came go out on their own
+            now = time.monotonic()
+            for client in [c for c in held if now - c.high_at >= SET_PAIR_TIMEOUT_S or c.closed]:
+                held.discard(client)
+                high, client.pending_high = client.pending_high, None
+                if not client.closed:
+                    self._write_frames(high)
+
+    def _serve_batch(self, batch: list[tuple[_Client, bytes, float]], held: set[_Client]) -> None:
+        gets: list[tuple[_Client, int, float]] = []
+        for client, data, arrival in batch:
+            for b in data:
+                if not b & 0x80:
+                    gets.append((client, b, arrival))
+                    continue
+
+                # SET frame: answer the GETs received before it first
+                if gets:
+                    self._serve_gets(gets)
+                    gets = []
+                if b & 0x40:  # SET HIGH
+                    if client.pending_high is not None:
+                        self._write_frames(client.pending_high)
+                    client.pending_high, client.high_at = b, time.monotonic()
+                    held.add(client)
+                elif client.pending_high is not None:
+                    held.discard(client)
+                    high, client.pending_high = client.pending_high, None
+                    self._write_frames(high, b)
+                else:
+                    self._write_frames(b)
+        if gets:
+            self._serve_gets(gets)
+
+    def _write_frames(self, *frames: int) -> None:
+        self.sets_sent += self.conn.write_frames(*frames)
+
+    def _serve_gets(self, gets: list[tuple[_Client, int, float]]) -> None:
+        """
+        Serve GETs round-robin across clients, one per client in turn, in each
+        client's own request order. A GET asked again within the batch is sent to
+        the board once. A reply is only sent while the client still waits for it
+        (see the module docstring); otherwise it and the rest of that client's
+        burst are dropped.
+        """
+        self.gets_requested += len(gets)
+        wanted: dict[_Client, collections.deque] = {}
+        for client, cmd, arrival in gets:
+            wanted.setdefault(client, collections.deque()).append((cmd, arrival))
+        answers: dict[int, int | None] = {}
+
+        while wanted:
+            for client in list(wanted):
+                cmds = wanted[client]
+                cmd, arrival = cmds.popleft()
+                if cmd not in answers and self._still_waiting(client, arrival):
+                    answers[cmd] = self.conn.query(cmd, timeout_ms=self._get_timeout_ms)
+                    self.gets_sent += 1
+                b = answers.get(cmd)
+                if b is not None and self._still_waiting(client, arrival):
+                    client.send(bytes((b,)))
+                    client.replied_at = time.monotonic()
+                else:
+                    # Board timeout (nothing to drop) or the client gave up on this GET;
+                    # either way drop the rest of its burst so its replies stay aligned
+                    dropped = 0 if cmd in answers and b is None else 1
+                    while cmds and cmds[0][1] <= arrival:
+                        cmds.popleft()
+                        dropped += 1
+                    self.replies_dropped += dropped
+                if not cmds:
+                    del wanted[client]
+
+    def _still_waiting(self, client: _Client, arrival: float) -> bool:
+        """True while a reply to a GET received at `arrival` would still be taken as its answer."""
+        waiting_since = max(arrival, client.replied_at)
+        return time.monotonic() - waiting_since <= self._get_timeout_ms / 1000.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Share one board's serial port with TCP clients")
+    parser.add_argument("--port", required=True, help="Serial port of the board, e.g., COM8 (or tcp://host:port)")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate, e.g., 9600")
+    parser.add_argument("--listen", default="127.0.0.1:7000", help="host:port clients connect to")
+    parser.add_argument("--batch-ms", type=float, default=BATCH_WINDOW_S * 1000.0, help="Request batching window")
+    parser.add_argument("--stats-interval", type=float, default=0.0, help="Print bridge statistics every N seconds")
+    args = parser.parse_args(argv)
+
+    host, tcp_port = parse_address(args.listen)
+    bridge = SerialBridge(args.port, args.baud, host, tcp_port, batch_window_s=max(0.0, args.batch_ms / 1000.0))
+    try:
+        bridge.start()
+    except Exception as e:
+        print(f"[ERROR] Bridge not started: {e}")
+        bridge.stop()
+        return 1
+    print(f"[OK] {args.port} shared on tcp://{host}:{bridge.port} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(args.stats_interval if args.stats_interval > 0 else 1.0)
+            if args.stats_interval > 0:
+                print(f"[INFO] {bridge.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bridge.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+# Author: 152120221098 Emre AVCI
+"""
+SET command journal
+-------------------
+Append-only record of every setpoint sent to a board and of how it ended, one
+JSON object per line:
+
+    {"seq": 7, "t": 1760000000.12, "op": "set", "board": "curtain",
+     "field": "curtain_status", "value": 50.0, "frames": [242, 128], "mode": "async"}
+    {"seq": 8, "t": 1760000000.49, "op": "outcome", "board": "curtain", "ref": 7,
+     "result": "verified", "attempts": 1}
+
+The "set" entry is on disk before the frames go out (write-ahead): a blocking
+SET waits for it, an async SET stays queued until then. "result" is
+verified / failed / superseded / unverified (written, no read-back was done).
+
+Durability uses group commit: append() only queues the entry; a committer
+thread writes everything queued within commit_interval_s and makes it durable
+with ONE fsync, so a burst of automation SETs costs one fsync instead of one
+per SET. wait_durable(seq) blocks until an entry is on disk.
+
+On restart, open() replays the file (a torn last line is ignored) and returns
+the desired state of each board: its last SET and how it ended. reconcile()
+then reads the board's register back and re-issues the desired value when the
+board disagrees (e.g. the board was reset while the service was down).
+"""
+
+import json
+import os
+import threading
+import time
+
+from base_connections import SET_VERIFY_TOLERANCE
+
+COMMIT_INTERVAL_S = 0.05
+COMPACT_BYTES = 1 << 20  # rewrite the journal at open() once it is larger than this
+
+
+class SetJournal:
+    def __init__(self, path: str, commit_interval_s: float = COMMIT_INTERVAL_S):
+        self._path = path
+        self._commit_interval_s = commit_interval_s
+        self._file = None
+        self._seq = 0
+        self._queue: list[dict] = []
+        self._durable_seq = 0
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: threading.Thread | None = None
+        self.commits = 0  # fsyncs done
+        self.entries = 0  # entries written
+
+    # -------------------- REPLAY --------------------
+    @staticmethod
+    def replay(path: str) -> tuple[dict, int]:
+        """
+        Read a journal: ({board: desired state}, last seq). The desired state of a
+        board is its last "set" entry plus "result"/"attempts" of its outcome
+        (result None = no outcome recorded, e.g. the process died mid-SET) and
+        "outcome" (the outcome entry itself).
+        """
+        desired: dict[str, dict] = {}
+        last_seq = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        seq = int(entry["seq"])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # torn or corrupt line (crash while appending)
+                    last_seq = max(last_seq, seq)
+                    board = entry.get("board")
+                    if entry.get("op") == "set":
+                        desired[board] = dict(entry, result=None, attempts=None, outcome=None)
+                    elif entry.get("op") == "outcome":
+                        state = desired.get(board)
+                        if state is not None and state["seq"] == entry.get("ref"):
+                            state["result"] = entry.get("result")
+                            state["attempts"] = entry.get("attempts")
+                            state["outcome"] = entry
+        except FileNotFoundError:
+            pass
+        return desired, last_seq
+
+    # -------------------- LIFECYCLE --------------------
+    def open(self) -> dict:
+        """Replay the journal, start appending to it; returns {board: desired state}."""
+        desired, self._seq = self.replay(self._path)
+        self._durable_seq = self._seq
+        try:
+            if os.path.getsize(self._path) > COMPACT_BYTES:
+                self._compact(desired)
+        except OSError:
+            pass
+        self._file = open(self._path, "a", encoding="utf-8")
+        if self._file.tell() > 0:
+            with open(self._path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+            if torn:
+                self._file.write("\n")  # end a torn last line so new entries start clean
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="set-journal", daemon=True)
+        self._thread.start()
+        return desired
+
+    def close(self) -> None:
+        """Commit what is queued and close the file."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._file is not None:
+            self._commit()
+            self._file.close()
+            self._file = None
+
+    def track(self, board: str, conn) -> None:
+        """Journal every SET of conn under board from now on."""
+        conn.set_journal(self, board)
+
+    def _compact(self, desired: dict) -> None:
+        """Rewrite the journal with only the last SET (+ outcome) of every board."""
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for state in desired.values():
+                entry = {k: v for k, v in state.items() if k not in ("result", "attempts", "outcome")}
+                f.write(json.dumps(entry) + "\n")
+                if state["outcome"] is not None:
+                    f.write(json.dumps(state["outcome"]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path)
+
+    # -------------------- APPEND / GROUP COMMIT --------------------
+    def append(self, entry: dict) -> int:
+        """Queue an entry (seq and time are added); returns its seq. Never blocks on I/O."""
+        with self._cond:
+            self._seq += 1
+            entry = {"seq": self._seq, "t": round(time.time(), 3), **entry}
+            self._queue.append(entry)
+            self._cond.notify_all()
+            return self._seq
+
+    def is_durable(self, seq: int) -> bool:
+        """True if entry seq is on disk (fsynced); never blocks on I/O."""
+        with self._cond:
+            return self._durable_seq >= seq
+
+    def wait_durable(self, seq: int, timeout: float | None = None) -> bool:
+        """Block until entry seq is on disk (fsynced); False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._durable_seq >= seq, timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stop)
+                if self._stop:
+                    return
+            # Group window: let the entries of a burst join this commit
+            time.sleep(self._commit_interval_s)
+            try:
+                self._commit()
+            except OSError as e:
+                print(f"[WARN] SET journal not written: {e}")
+
+    def _commit(self) -> None:
+        with self._cond:
+            batch, self._queue = self._queue, []
+        if not batch:
+            return
+        self._file.write("".join(json.dumps(e) + "\n" for e in batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        with self._cond:
+            self._durable_seq = batch[-1]["seq"]
+            self.commits += 1
+            self.entries += len(batch)
+            self._cond.notify_all()
+
+    # -------------------- RECONCILE --------------------
+    def reconcile(self, board: str, conn, state: dict) -> str:
+        """
+        Bring a board back to its journaled desired state. Reads the register back
+        (run it on the thread that owns the UART, e.g. engine.submit) and queues
+        set_setpoint_async() when the board holds another value.
+        """
+        field, value = state["field"], float(state["value"])
+        got, ts = conn.read_many([field])[field]
+        if ts is None:
+            return f"{board}: {field} could not be read, desired {value:g} not reconciled"
+        in_sync = abs(got - value) <= SET_VERIFY_TOLERANCE
+        self.append({"op": "reconcile", "board": board, "field": field, "value": value, "found": got})
+        if in_sync:
+            return f"{board}: {field} = {got:g} matches the journal"
+        conn.set_setpoint_async(value)
+        return f"{board}: {field} = {got:g}, journal wants {value:g} -> SET re-issued"
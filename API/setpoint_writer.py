@@ -0,0 +1,123 @@
+# Author: 152120221098 Emre AVCI
+"""
+Debouncing setpoint writer
+--------------------------
+Dragging a slider (or a chatty automation) produces a burst of SET requests.
+Every setDesiredTemp / setCurtainStatus call costs two paced frames, and the
+curtain adds a read-back, so writing every intermediate value wastes the line.
+
+SetpointWriter sits in front of a connection's set_setpoint():
+- requests arriving within `window_s` of the first pending one are collapsed;
+  only the latest value is written (older ones are counted as coalesced)
+- if the board's verified value already equals the target, the write is
+  skipped entirely (counted as elided)
+
+Both counters are kept on the writer and in the connection's metrics
+(uart_set_coalesced_total / uart_set_elided_total).
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+# Targets closer than this are "equal" (protocol resolution is one decimal digit)
+SETPOINT_TOLERANCE = 0.05
+
+
+class SetpointWriter:
+    def __init__(
+        self,
+        conn,
+        window_s: float = 0.15,
+        write: Callable[[float], object] | None = None,
+    ):
+        """
+        conn  : connection whose SETPOINT_FIELD is written
+        write : callable performing the actual SET. Defaults to conn.set_setpoint.
+                It may return a bool or a Future of a bool (e.g. an I/O engine or
+                SetArbiter submit), which the writer waits on.
+        """
+        self.conn = conn
+        self.window_s = window_s
+        self._write = write if write is not None else conn.set_setpoint
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one flush on the wire at a time
+        self._pending_value: float | None = None
+        self._pending_future: Future | None = None
+        self._timer: threading.Timer | None = None
+
+        self.requested = 0
+        self.written = 0
+        self.coalesced = 0
+        self.elided = 0
+
+    @property
+    def saved(self) -> int:
+        """Number of SET writes that did not have to go on the wire."""
+        return self.coalesced + self.elided
+
+    def request(self, value: float) -> Future:
+        """
+        Ask for the setpoint to become value. Returns a Future[bool] resolved when
+        the batch this request ended up in has been written (or elided).
+        All requests collapsed into one batch share the same Future.
+        """
+        with self._lock:
+            self.requested += 1
+            if self._pending_future is not None:
+                # Superseded: the newer value wins, the earlier request rides along
+                self.coalesced += 1
+                self.conn.metrics.record_set_coalesced()
+                self._pending_value = float(value)
+                return self._pending_future
+
+            self._pending_value = float(value)
+            self._pending_future = Future()
+            self._timer = threading.Timer(self.window_s, self._flush)
+            self._timer.daemon = True
+            self._timer.start()
+            return self._pending_future
+
+    def flush_now(self) -> None:
+        """Write the pending value immediately instead of waiting for the window."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        self._flush()
+
+    def _take_pending(self) -> tuple[float | None, Future | None]:
+        with self._lock:
+            value, fut = self._pending_value, self._pending_future
+            self._pending_value = None
+            self._pending_future = None
+            self._timer = None
+            return value, fut
+
+    def _matches_board(self, value: float) -> bool:
+        field = self.conn.SETPOINT_FIELD
+        if field is None or not self.conn.is_verified(field):
+            return False
+        current = self.conn.snapshot().get(field)
+        return current is not None and abs(current - value) < SETPOINT_TOLERANCE
+
+    def _flush(self) -> None:
+        with self._write_lock:
+            value, fut = self._take_pending()
+            if fut is None or not fut.set_running_or_notify_cancel():
+                return
+
+            try:
+                if self._matches_board(value):
+                    self.elided += 1
+                    self.conn.metrics.record_set_elided()
+                    fut.set_result(True)
+                    return
+
+                result = self._write(value)
+                if isinstance(result, Future):
+                    result = result.result()
+                self.written += 1
+                fut.set_result(bool(result))
+            except BaseException as e:
+                fut.set_exception(e)
@@ -0,0 +1,245 @@
+# Author: 152120221098 Emre AVCI
+"""
+Shared-memory snapshot
+----------------------
+Only the process that owns a COM port sees its decoded values. The owner
+(daemon.py --shm) publishes each board's register file into a
+multiprocessing.shared_memory segment named "home_automation_<board>", so any
+number of other processes (exporters, CLIs, analytics) can read it in
+microseconds: no IPC round trip, no UART traffic.
+
+Segment layout (little endian):
+
+    header  magic "HAS1" | u16 version | u16 field count | u64 seq |
+            f64 published_at (epoch s) | u8 connected | 7 pad bytes
+    fields  field count x ( 24-byte name | f64 value | f64 updated_at (epoch s, NaN = never) )
+
+seq is a seqlock generation counter: the writer makes it odd before touching the
+data and even again afterwards. A reader copies the segment and accepts the copy
+only if seq was even and unchanged around it, otherwise it simply retries.
+
+Usage (reader CLI):
+  python shm_snapshot.py curtain
+"""
+
+import json
+import math
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+SEGMENT_PREFIX = "home_automation_"
+MAGIC = b"HAS1"
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct("<4sHHQdB7x")
+FIELD = struct.Struct("<24sdd")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8  # magic (4) + version (2) + field count (2)
+
+
+# A segment whose seq does not move for this long has no live publisher
+OWNER_ALIVE_CHECK_S = 0.25
+
+
+def segment_name(board: str) -> str:
+    return SEGMENT_PREFIX + board
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without letting this process's resource tracker own it."""
+    try:
+        # Python 3.13+
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _owner_alive(shm: shared_memory.SharedMemory, wait_s: float) -> bool:
+    """True if another publisher is still advancing the segment's seq."""
+    if shm.size < HEADER.size or bytes(shm.buf[:4]) != MAGIC:
+        return False
+    before = SEQ.unpack_from(shm.buf, SEQ_OFFSET)[0]
+    time.sleep(wait_s)
+    return SEQ.unpack_from(shm.buf, SEQ_OFFSET)[0] != before
+
+
+# -------------------- WRITER (CONNECTION OWNER) --------------------
+class SharedSnapshotPublisher:
+    """
+    Copies the decoded cache of one connection into its shared-memory segment
+    every interval_s. Reads caches only (snapshot / field_age), like CsvRecorder.
+
+    start() refuses to take over a segment that another publisher (e.g. a second
+    daemon for the same board) is still updating; force=True replaces it anyway.
+    """
+
+    def __init__(self, board: str, conn, interval_s: float = 0.05, force: bool = False):
+        self.board = board
+        self.conn = conn
+        self.fields = list(conn.FIELDS)
+        self._interval_s = interval_s
+        self._force = force
+        self._seq = 0
+        self._shm: shared_memory.SharedMemory | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def size(self) -> int:
+        return HEADER.size + FIELD.size * len(self.fields)
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        name = segment_name(self.board)
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=self.size)
+        except FileExistsError:
+            existing = _attach(name)
+            try:
+                wait_s = max(OWNER_ALIVE_CHECK_S, 4 * self._interval_s)
+                if not self._force and _owner_alive(existing, wait_s):
+                    raise FileExistsError(f"{name} is being published by another process")
+            finally:
+                existing.close()
+            # Left over by a crashed owner (or force=True): replace it
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=self.size)
+
+        # Static part: header and field names; seq stays even (= consistent)
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, LAYOUT_VERSION, len(self.fields), 0, 0.0, 0)
+        for i, field in enumerate(self.fields):
+            FIELD.pack_into(self._shm.buf, HEADER.size + i * FIELD.size, field.encode("ascii"), 0.0, math.nan)
+
+        self.publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"shm-{self.board}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._shm is not None:
+            self._shm.close()
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None
+
+    # -------------------- PUBLISHING --------------------
+    def publish(self) -> None:
+        """Write one consistent generation of the register file."""
+        buf = self._shm.buf
+        values = self.conn.snapshot()
+        now = time.time()
+
+        self._seq += 1  # odd: write in progress
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+
+        HEADER.pack_into(
+            buf, 0, MAGIC, LAYOUT_VERSION, len(self.fields), self._seq, now, 1 if self.conn.is_open() else 0
+        )
+        for i, field in enumerate(self.fields):
+            age = self.conn.field_age(field)
+            FIELD.pack_into(
+                buf,
+                HEADER.size + i * FIELD.size,
+                field.encode("ascii"),
+                float(values.get(field, 0.0)),
+                math.nan if age is None else now - age,
+            )
+
+        self._seq += 1  # even: consistent again
+        SEQ.pack_into(buf, SEQ_OFFSET, self._seq)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"[WARN] shm {self.board}: {e}")
+
+
+# -------------------- READER (ANY PROCESS) --------------------
+class SharedSnapshotReader:
+    def __init__(self, board: str):
+        name = segment_name(board)
+        self._shm = _attach(name)
+
+        magic, version, count, _seq, _at, _conn = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not a home automation snapshot segment")
+        self._size = HEADER.size + FIELD.size * count
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def read(self, max_retries: int = 10000) -> dict:
+        """
+        Consistent snapshot, same shape as the gateway's board snapshot:
+        {"connected": bool, "seq": int, "fields": {name: {"value", "age_s"}}}
+        """
+        buf = self._shm.buf
+        for _ in range(max_retries):
+            before = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if before & 1:
+                continue
+            data = bytes(buf[: self._size])
+            if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == before:
+                return self._decode(data)
+        raise TimeoutError("shared snapshot kept changing while being read")
+
+    @staticmethod
+    def _decode(data: bytes) -> dict:
+        _magic, _version, count, seq, published_at, connected = HEADER.unpack_from(data, 0)
+        now = time.time()
+        fields = {}
+        for i in range(count):
+            raw_name, value, updated_at = FIELD.unpack_from(data, HEADER.size + i * FIELD.size)
+            age = None if math.isnan(updated_at) else round(now - updated_at, 3)
+            fields[raw_name.rstrip(b"\0").decode("ascii")] = {"value": value, "age_s": age}
+        return {
+            "connected": bool(connected),
+            "seq": seq,
+            "published_age_s": round(now - published_at, 3),
+            "fields": fields,
+        }
+
+
+def main(argv=None) -> int:
+    """Print the current shared snapshot of one board as JSON."""
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 1:
+        print("usage: python shm_snapshot.py <board>   (e.g. curtain, air_conditioner)")
+        return 2
+    try:
+        reader = SharedSnapshotReader(args[0])
+    except FileNotFoundError:
+        print(f"[ERROR] no shared snapshot for {args[0]!r} (is daemon.py running with --shm?)")
+        return 1
+    try:
+        print(json.dumps(reader.read(), indent=2))
+    finally:
+        reader.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,627 @@
+# Author: 152120221098 Emre AVCI
+"""
+Board Soak / Stress Tester
+--------------------------
+One tester for every board type (replaces the per-board copies). Everything is
+driven by the board's register map (FIELDS / SETPOINT_FIELD), so a new board
+only needs an entry in BOARD_DEFAULTS.
+
+Modes:
+- poll         read every field periodically and print it
+- set          write a sequence of setpoints and verify each one by reading back
+- interactive  type a setpoint, 'r' to read, 'q' to quit (one board)
+- soak         run all boards concurrently for a long time (hours) and measure:
+               GET latency percentiles and timeout rate per field, SET round trip
+               (queue -> verified) and outcome, link losses, and memory growth of
+               this process (tracemalloc, with the project lines that grew). A JSON
+               summary report is written, and can be compared with the report of
+               an earlier run.
+
+Usage examples:
+  python soak_test.py --board air_conditioner=COM8 --mode poll
+  python soak_test.py --board curtain=COM10 --mode set --set-values 0,50,100
+  python soak_test.py --board air_conditioner=COM8 --board curtain=COM10 \\
+                      --mode soak --duration 14400 --report soak.json --baseline last.json
+  python soak_test.py --compare last.json soak.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from base_connections import HomeAutomationSystemConnection
+from discovery import BOARD_CLASSES
+from metrics import LatencyHistogram
+
+REPORT_VERSION = 1
+
+# While a link is down the soak loop only drives the reconnect, this often
+OUTAGE_POLL_S = 0.05
+
+# board kind -> (default SET sequence, read-back tolerance of set mode)
+BOARD_DEFAULTS = {
+    "air_conditioner": ([18.0, 20.5, 22.0, 24.5, 26.0], 0.11),
+    "curtain": ([0.0, 25.3, 50.0, 73.7, 100.0], 0.2),
+}
+
+
+@dataclass
+class TestConfig:
+    """Holds test configuration parameters."""
+    boards: List[tuple]  # [(kind, port)]
+    baud: int
+    mode: str
+    interval: float
+    duration: float
+    set_values: Optional[List[float]]
+    set_every: float = 5.0
+    progress_every: float = 10.0
+    mem_every: float = 30.0
+    report: Optional[str] = None
+    baseline: Optional[str] = None
+
+
+# -------------------- STATISTICS --------------------
+class Series:
+    """Latency samples of one operation: histogram + max + failures (constant memory)."""
+
+    def __init__(self):
+        self.hist = LatencyHistogram()
+        self.max_s = 0.0
+        self.failures = 0
+
+    def ok(self, seconds: float) -> None:
+        self.hist.observe(seconds)
+        if seconds > self.max_s:
+            self.max_s = seconds
+
+    def fail(self) -> None:
+        self.failures += 1
+
+    def summary(self) -> dict:
+        total = self.hist.count + self.failures
+
+        def ms(q):
+            v = self.hist.quantile(q)
+            # The histogram interpolates inside a bucket; never report more than seen
+            return None if v is None else round(min(v, self.max_s) * 1000.0, 2)
+
+        return {
+            "count": total,
+            "failures": self.failures,
+            "failure_rate": round(self.failures / total, 5) if total else 0.0,
+            "latency_ms": {
+                "mean": round(self.hist.sum_s / self.hist.count * 1000.0, 2) if self.hist.count else None,
+                "p50": ms(0.50),
+                "p90": ms(0.90),
+                "p99": ms(0.99),
+                "max": round(self.max_s * 1000.0, 2),
+            },
+        }
+
+
+@dataclass
+class BoardStats:
+    kind: str
+    port: str
+    fields: dict = field(default_factory=dict)  # field -> Series (GET)
+    sets: Series = field(default_factory=Series)  # queued -> verified
+    set_rejected: int = 0  # SET resolved False (not verified)
+    outage_s: float = 0.0  # time the link was down (not counted as GET failures)
+    errors: int = 0
+    last_error: str = ""
+
+    def gets(self) -> Series:
+        total = Series()
+        for s in self.fields.values():
+            for i, n in enumerate(s.hist.counts):
+                total.hist.counts[i] += n
+            total.hist.count += s.hist.count
+            total.hist.sum_s += s.hist.sum_s
+            total.max_s = max(total.max_s, s.max_s)
+            total.failures += s.failures
+        return total
+
+
+def _own_snapshot() -> tracemalloc.Snapshot:
+    """tracemalloc snapshot of the allocations made by this project's modules."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(True, os.path.join(here, "*")),))
+
+
+# -------------------- TESTER --------------------
+class BoardTester:
+    """
+    Tester for any HomeAutomationSystemConnection subclass of BOARD_CLASSES.
+    Encapsulates setup, polling, set-test, interactive and soak operations.
+    """
+
+    def __init__(self, cfg: TestConfig) -> None:
+        self.cfg = cfg
+        self.conns: dict[str, HomeAutomationSystemConnection] = {
+            kind: BOARD_CLASSES[kind](com_port=port, baud_rate=cfg.baud) for kind, port in cfg.boards
+        }
+        self.stats: dict[str, BoardStats] = {}
+        self._stop = threading.Event()
+
+    def run(self) -> int:
+        """Entry point for running the selected test mode."""
+        try:
+            if not self._open_connections():
+                return 2
+
+            if self.cfg.mode == "poll":
+                self._poll_loop(duration=self.cfg.duration, interval=self.cfg.interval)
+            elif self.cfg.mode == "set":
+                self._set_sequence()
+            elif self.cfg.mode == "interactive":
+                self._interactive_loop()
+            elif self.cfg.mode == "soak":
+                return self._soak()
+            else:
+                print(f"Unknown mode: {self.cfg.mode}")
+                return 3
+
+            return 0
+
+        except KeyboardInterrupt:
+            print("\n[INFO] Interrupted by user (Ctrl+C).")
+            return 130
+
+        except Exception as exc:
+            print(f"[ERROR] Unexpected error: {exc}")
+            return 1
+
+        finally:
+            self._stop.set()
+            self._close_connections()
+
+    # -------------------- Connection Helpers --------------------
+
+    def _open_connections(self) -> bool:
+        """Opens every UART connection; all of them must succeed."""
+        for kind, conn in self.conns.items():
+            try:
+                conn.open()
+            except Exception as exc:
+                print(f"[ERROR] {kind}: failed to open {conn._comPort}: {exc}")
+                return False
+            if not conn.is_open():
+                print(f"[ERROR] {kind}: connection is not open. Check COM port/baud and PICSimLab.")
+                return False
+            print(f"[OK] {kind}: connected to {conn._comPort} @ {conn._baudRate} baud.")
+        return True
+
+    def _close_connections(self) -> None:
+        """Closes the UART connections gracefully."""
+        for conn in self.conns.values():
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # -------------------- Read/Print Helpers --------------------
+
+    @staticmethod
+    def _read_all_blocking(conn: HomeAutomationSystemConnection) -> dict:
+        """Reads every field of the register map (one pipelined burst)."""
+        return {f: v for f, (v, _ts) in conn.read_many(max_age=0.0).items()}
+
+    @staticmethod
+    def _print_status(kind: str, data: dict) -> None:
+        """Pretty prints one board's values."""
+        print(f"{kind}: " + " | ".join(f"{f}: {v:.1f}" for f, v in data.items()))
+
+    def _set_and_verify(self, kind: str, conn: HomeAutomationSystemConnection, value: float) -> None:
+        """SET the board's setpoint, read everything back and compare."""
+        tolerance = BOARD_DEFAULTS.get(kind, ([], 0.11))[1]
+        if not conn.set_setpoint(value):
+            print(f"[FAIL] {kind}: SET {value:.1f} failed (write error / not verified).")
+            self._print_status(kind, self._read_all_blocking(conn))
+            return
+
+        # Small delay to let firmware apply, then read back
+        time.sleep(0.05)
+        data = self._read_all_blocking(conn)
+        self._print_status(kind, data)
+        if abs(float(data[conn.SETPOINT_FIELD]) - value) <= tolerance:
+            print(f"[OK] Verified: {kind} {conn.SETPOINT_FIELD} matches requested value.")
+        else:
+            print("[WARN] Mismatch after SET (firmware may be overriding / not updating).")
+
+    # -------------------- Modes --------------------
+
+    def _poll_loop(self, duration: float, interval: float) -> None:
+        """Polls every board for the specified duration."""
+        print(f"[MODE] Polling for {duration:.1f}s (interval={interval:.2f}s)...")
+        t0 = time.time()
+        while (time.time() - t0) < duration:
+            for kind, conn in self.conns.items():
+                self._print_status(kind, self._read_all_blocking(conn))
+            time.sleep(interval)
+
+    def _set_sequence(self) -> None:
+        """Sends a sequence of SET commands to every board and verifies by reading back."""
+        print("[MODE] SET sequence test...")
+        for kind, conn in self.conns.items():
+            for v in self._set_values(kind):
+                print(f"\n[TEST] {kind}: setting {conn.SETPOINT_FIELD} to {v:.1f}")
+                self._set_and_verify(kind, conn, v)
+                time.sleep(0.4)
+
+    def _interactive_loop(self) -> None:
+        """
+        Interactive terminal loop (first board):
+        - Enter number to set the setpoint
+        - 'r' to read status
+        - 'q' to quit
+        """
+        kind, conn = next(iter(self.conns.items()))
+        print(f"[MODE] Interactive ({kind})")
+        print("Commands:")
+        print(f"  <number>  -> set {conn.SETPOINT_FIELD} (float allowed)")
+        print("  r         -> read and print all values")
+        print("  q         -> quit\n")
+
+        while True:
+            cmd = input(">>> ").strip().lower()
+
+            if cmd == "q":
+                print("[INFO] Quitting interactive mode.")
+                return
+
+            if cmd == "r":
+                self._print_status(kind, self._read_all_blocking(conn))
+                continue
+
+            try:
+                v = float(cmd)
+            except ValueError:
+                print("[INFO] Invalid input. Use number / r / q.")
+                continue
+
+            self._set_and_verify(kind, conn, v)
+
+    def _set_values(self, kind: str) -> List[float]:
+        return self.cfg.set_values or BOARD_DEFAULTS.get(kind, ([0.0], 0.11))[0]
+
+    # -------------------- Soak --------------------
+
+    def _soak(self) -> int:
+        """Runs every board on its own thread for cfg.duration; writes the report."""
+        print(
+            f"[MODE] Soak: {len(self.conns)} board(s) for {self.cfg.duration:.0f}s "
+            f"(SET every {self.cfg.set_every:.1f}s)..."
+        )
+        tracemalloc.start()
+        memory = {"samples": []}
+        started_at = time.time()
+        t0 = time.monotonic()
+
+        workers = []
+        for kind, conn in self.conns.items():
+            stats = BoardStats(kind, conn._comPort, {f: Series() for f in conn.FIELDS})
+            self.stats[kind] = stats
+            t = threading.Thread(target=self._soak_board, args=(conn, stats), name=f"soak-{kind}", daemon=True)
+            workers.append(t)
+            t.start()
+
+        base_snapshot = None
+        next_mem = 0.0
+        next_progress = self.cfg.progress_every
+        try:
+            while True:
+                elapsed = time.monotonic() - t0
+                if elapsed >= self.cfg.duration:
+                    break
+                if elapsed >= next_mem:
+                    current, _peak = tracemalloc.get_traced_memory()
+                    memory["samples"].append([round(elapsed, 1), current])
+                    if base_snapshot is None and elapsed >= self.cfg.mem_every:
+                        # Growth is measured from the end of the first interval (warm-up)
+                        base_snapshot = _own_snapshot()
+                        memory["base"] = [round(elapsed, 1), current]
+                    next_mem += self.cfg.mem_every
+                if elapsed >= next_progress:
+                    self._print_progress(elapsed)
+                    next_progress += self.cfg.progress_every
+                self._stop.wait(min(0.5, self.cfg.duration - elapsed))
+        except KeyboardInterrupt:
+            print("\n[INFO] Interrupted by user (Ctrl+C), writing a partial report.")
+        finally:
+            self._stop.set()
+            for t in workers:
+                t.join(timeout=5.0)
+
+        elapsed = time.monotonic() - t0
+        current, peak = tracemalloc.get_traced_memory()
+        memory["samples"].append([round(elapsed, 1), current])
+        if base_snapshot is not None:
+            diff = _own_snapshot().compare_to(base_snapshot, "lineno")
+            memory["top_growth"] = [
+                {"where": str(d.traceback), "size_diff_kib": round(d.size_diff / 1024.0, 1), "count_diff": d.count_diff}
+                for d in diff[:5]
+                if d.size_diff > 0
+            ]
+        memory["peak_kib"] = round(peak / 1024.0, 1)
+        tracemalloc.stop()
+
+        report = self._build_report(started_at, elapsed, memory)
+        print_report(report)
+        if self.cfg.report:
+            with open(self.cfg.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=1)
+            print(f"[OK] Report written to {self.cfg.report}")
+        if self.cfg.baseline:
+            try:
+                with open(self.cfg.baseline, "r", encoding="utf-8") as f:
+                    print_comparison(json.load(f), report)
+            except (OSError, ValueError) as exc:
+                print(f"[WARN] baseline {self.cfg.baseline} not compared: {exc}")
+        return 0
+
+    def _soak_board(self, conn: HomeAutomationSystemConnection, stats: BoardStats) -> None:
+        """One board: GET every field in turn, SET on a timer, as fast as the line allows."""
+        values = self._set_values(stats.kind)
+        set_index = 0
+        next_set = time.monotonic() + self.cfg.set_every
+
+        while not self._stop.is_set():
+            try:
+                conn.supervise()  # no I/O engine here: detect a dead link, drive the reconnect
+                if not conn.is_open():
+                    # Link down: GETs would fail without any I/O, so count the outage as time
+                    t = time.monotonic()
+                    self._stop.wait(OUTAGE_POLL_S)
+                    stats.outage_s += time.monotonic() - t
+                    continue
+
+                for name, series in stats.fields.items():
+                    if not conn.is_open():
+                        break
+                    t = time.monotonic()
+                    _value, ts = conn.read_many([name], max_age=0.0)[name]
+                    if ts is not None and ts >= t:
+                        series.ok(time.monotonic() - t)
+                    else:
+                        series.fail()
+
+                if self.cfg.set_every > 0 and time.monotonic() >= next_set:
+                    self._soak_set(conn, stats, values[set_index % len(values)])
+                    set_index += 1
+                    next_set = time.monotonic() + self.cfg.set_every
+            except Exception as exc:
+                stats.errors += 1
+                stats.last_error = str(exc)
+
+            if self.cfg.interval > 0:
+                self._stop.wait(self.cfg.interval)
+
+    @staticmethod
+    def _soak_set(conn: HomeAutomationSystemConnection, stats: BoardStats, value: float) -> None:
+        """Queue a SET and service it until verified; records the round trip."""
+        t = time.monotonic()
+        fut = conn.set_setpoint_async(value)
+        deadline = t + 5.0
+        while not fut.done() and time.monotonic() < deadline:
+            conn.service_sets(readback=True)
+            time.sleep(0.005)
+        if not fut.done():
+            stats.sets.fail()
+        elif fut.result():
+            stats.sets.ok(time.monotonic() - t)
+        else:
+            stats.sets.fail()
+            stats.set_rejected += 1
+
+    def _print_progress(self, elapsed: float) -> None:
+        for kind, stats in self.stats.items():
+            gets = stats.gets().summary()
+            sets = stats.sets.summary()
+            print(
+                f"[{elapsed:7.0f}s] {kind}: GET {gets['count']} "
+                f"(timeouts {gets['failure_rate'] * 100:.2f}%, p99 {gets['latency_ms']['p99']} ms) | "
+                f"SET {sets['count']} (failed {sets['failures']}, p99 {sets['latency_ms']['p99']} ms) | "
+                f"errors {stats.errors}"
+            )
+
+    def _build_report(self, started_at: float, elapsed: float, memory: dict) -> dict:
+        samples = memory["samples"]
+        base_at, start_b = memory.get("base", samples[0])
+        end_b = samples[-1][1]
+        hours = max((elapsed - base_at) / 3600.0, 1e-9)
+        boards = {}
+        for kind, stats in self.stats.items():
+            conn = self.conns[kind]
+            boards[kind] = {
+                "port": stats.port,
+                "gets": stats.gets().summary(),
+                "fields": {f: s.summary() for f, s in stats.fields.items()},
+                "sets": dict(stats.sets.summary(), rejected=stats.set_rejected),
+                "set_retries": conn.metrics.set_retries,
+                "link_losses": conn.metrics.link_losses,
+                "reconnects": conn.metrics.reconnects,
+                "outage_s": round(stats.outage_s, 1),
+                "errors": stats.errors,
+                "last_error": stats.last_error,
+            }
+        return {
+            "tool": "soak_test",
+            "version": REPORT_VERSION,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+            "duration_s": round(elapsed, 1),
+            "config": {
+                "baud": self.cfg.baud,
+                "interval_s": self.cfg.interval,
+                "set_every_s": self.cfg.set_every,
+                "boards": {kind: port for kind, port in self.cfg.boards},
+            },
+            "boards": boards,
+            "memory": {
+                "warmup_s": base_at,
+                "start_kib": round(start_b / 1024.0, 1),
+                "end_kib": round(end_b / 1024.0, 1),
+                "peak_kib": memory["peak_kib"],
+                "growth_kib": round((end_b - start_b) / 1024.0, 1),
+                "growth_kib_per_h": round((end_b - start_b) / 1024.0 / hours, 1),
+                "samples": samples,
+                "top_growth": memory.get("top_growth", []),
+            },
+        }
+
+
+# -------------------- REPORTS --------------------
+def print_report(report: dict) -> None:
+    """Human readable summary of a soak report."""
+    print(f"\n===== Soak summary ({report['duration_s']:.0f}s, started {report['started_at']}) =====")
+    for kind, b in report["boards"].items():
+        print(
+            f"{kind} ({b['port']}): errors {b['errors']}, link losses {b['link_losses']} "
+            f"(down {b['outage_s']:.1f}s)"
+        )
+        rows = [("GET (all)", b["gets"])] + [(f"  {f}", s) for f, s in b["fields"].items()] + [("SET", b["sets"])]
+        for label, s in rows:
+            lat = s["latency_ms"]
+            print(
+                f"  {label:<22} n={s['count']:<8} fail={s['failure_rate'] * 100:6.2f}%  "
+                f"p50={lat['p50']} p90={lat['p90']} p99={lat['p99']} max={lat['max']} ms"
+            )
+    m = report["memory"]
+    print(
+        f"memory: {m['start_kib']} -> {m['end_kib']} KiB (peak {m['peak_kib']} KiB, "
+        f"{m['growth_kib_per_h']:+} KiB/h)"
+    )
+    for g in m["top_growth"]:
+        print(f"  +{g['size_diff_kib']} KiB  {g['where']}")
+
+
+def _metrics_of(report: dict) -> dict:
+    """Flatten the comparable numbers of a report: {"board GET p99 ms": value, ...}."""
+    out = {}
+    for kind, b in report.get("boards", {}).items():
+        for label, s in (("GET", b["gets"]), ("SET", b["sets"])):
+            for q in ("p50", "p90", "p99", "max"):
+                out[f"{kind} {label} {q} ms"] = s["latency_ms"][q]
+            out[f"{kind} {label} failure %"] = round(s["failure_rate"] * 100.0, 3)
+    out["memory growth KiB/h"] = report.get("memory", {}).get("growth_kib_per_h")
+    return out
+
+
+def print_comparison(old: dict, new: dict) -> None:
+    """Side by side comparison of two soak reports (lower is better for every row)."""
+    a, b = _metrics_of(old), _metrics_of(new)
+    print(f"\n===== Comparison: {old.get('started_at')} -> {new.get('started_at')} =====")
+    for key in sorted(a.keys() | b.keys()):
+        va, vb = a.get(key), b.get(key)
+        if va is None or vb is None:
+            print(f"  {key:<38} {str(va):>10} -> {str(vb):>10}")
+            continue
+        delta = vb - va
+        pct = f"{delta / va * 100.0:+.1f}%" if va else ""
+        print(f"  {key:<38} {va:>10} -> {vb:>10}  {delta:+.2f} {pct}")
+
+
+def _parse_values(text: Optional[str]) -> Optional[List[float]]:
+    if not text:
+        return None
+    values: List[float] = []
+    for part in str(text).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            values.append(float(part))
+        except ValueError:
+            pass
+    return values or None
+
+
+def build_config_from_args(argv=None) -> TestConfig | tuple:
+    """Builds TestConfig from CLI args (or ("compare", old, new) for --compare)."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--board",
+        action="append",
+        default=[],
+        metavar="KIND=PORT",
+        help=f"Board to test, repeatable; KIND is one of: {', '.join(BOARD_CLASSES)}",
+    )
+    parser.add_argument("--kind", choices=list(BOARD_CLASSES), help="Board kind for --port")
+    parser.add_argument("--port", help="Serial port of a single board (with --kind), e.g., COM10")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate, e.g., 9600")
+    parser.add_argument(
+        "--mode",
+        choices=["poll", "set", "interactive", "soak"],
+        default="poll",
+        help="Test mode",
+    )
+    parser.add_argument("--interval", type=float, default=None, help="Polling interval in seconds (soak: 0)")
+    parser.add_argument("--duration", type=float, default=None, help="Duration in seconds (soak: 3600)")
+    parser.add_argument("--set-values", default=None, help="Comma-separated setpoints (default per board)")
+    parser.add_argument("--set-every", type=float, default=5.0, help="Soak: seconds between SETs (0 = no SETs)")
+    parser.add_argument("--progress-every", type=float, default=10.0, help="Soak: seconds between progress lines")
+    parser.add_argument("--mem-every", type=float, default=30.0, help="Soak: seconds between memory samples")
+    parser.add_argument("--report", default=None, help="Soak: write the JSON summary report here")
+    parser.add_argument("--baseline", default=None, help="Soak: compare the result with this earlier report")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Only compare two reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return ("compare", *args.compare)
+
+    boards = []
+    for item in args.board:
+        kind, sep, port = item.partition("=")
+        if not sep or kind not in BOARD_CLASSES or not port:
+            parser.error(f"--board expects KIND=PORT with KIND in {', '.join(BOARD_CLASSES)}, got {item!r}")
+        boards.append((kind, port))
+    if args.port:
+        if not args.kind:
+            parser.error("--port needs --kind (or use --board KIND=PORT)")
+        boards.append((args.kind, args.port))
+    if not boards:
+        parser.error("give at least one --board KIND=PORT")
+
+    soak = args.mode == "soak"
+    interval = args.interval if args.interval is not None else (0.0 if soak else 0.5)
+    duration = args.duration if args.duration is not None else (3600.0 if soak else 10.0)
+    return TestConfig(
+        boards=boards,
+        baud=args.baud,
+        mode=args.mode,
+        interval=max(0.0 if soak else 0.05, float(interval)),
+        duration=max(0.2, float(duration)),
+        set_values=_parse_values(args.set_values),
+        set_every=max(0.0, args.set_every),
+        progress_every=max(1.0, args.progress_every),
+        mem_every=max(1.0, args.mem_every),
+        report=args.report,
+        baseline=args.baseline,
+    )
+
+
+def main(argv=None) -> int:
+    """Main function (kept minimal)."""
+    cfg = build_config_from_args(argv)
+    if isinstance(cfg, tuple):
+        _, old_path, new_path = cfg
+        try:
+            with open(old_path, "r", encoding="utf-8") as f_old, open(new_path, "r", encoding="utf-8") as f_new:
+                print_comparison(json.load(f_old), json.load(f_new))
+        except (OSError, ValueError) as exc:
+            print(f"[ERROR] {exc}")
+            return 1
+        return 0
+    return BoardTester(cfg).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# Author: 152120221098 Emre AVCI
+"""
+Warm-start state store
+----------------------
+Without a saved state every cache starts at 0.0, so the UI and the API show
+fake zeros until the first poll cycle completes. StateStore keeps a small JSON
+file with the last known state of each board:
+
+    {"saved_at": <epoch s>,
+     "boards": {"curtain": {"port": "COM10", "baud": 9600,
+                            "fields": {"outdoor_temp": {"value": 21.5, "age_s": 0.12}, ...},
+                            "rtt_s": {"4": 0.0183, ...}}}}
+
+- save() runs on a timer and writes atomically (temp file + fsync + rename),
+  so a crash never leaves a half-written file behind
+- track() restores a board's saved values into a new connection right away.
+  Restored values keep their real age (they show up as stale) and are not
+  "verified" until the board has been read again.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class StateStore:
+    def __init__(self, path: str, interval_s: float = 10.0):
+        self._path = path
+        self._interval_s = interval_s
+        self._saved: dict = {}  # content of the file as loaded
+        self._connections: dict = {}  # board -> connection being saved
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.saves = 0
+
+    # -------------------- LOAD / RESTORE --------------------
+    def load(self) -> None:
+        """Read the state file; a missing or corrupt file just means a cold start."""
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("boards"), dict):
+                self._saved = data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[WARN] state file {self._path} ignored: {e}")
+
+    def link(self, board: str) -> tuple[str, int] | None:
+        """Saved (port, baud) of a board, e.g. to pre-fill connection settings."""
+        entry = self._saved.get("boards", {}).get(board)
+        if not entry or "port" not in entry:
+            return None
+        return entry["port"], int(entry.get("baud", 9600))
+
+    def track(self, board: str, conn) -> None:
+        """Save conn under board from now on, and restore its saved values (as stale)."""
+        entry = self._saved.get("boards", {}).get(board)
+        if entry:
+            elapsed = max(0.0, time.time() - float(self._saved.get("saved_at", time.time())))
+            try:
+                conn.restore_state(entry, elapsed_s=elapsed)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"[WARN] state of {board} not restored: {e}")
+        with self._lock:
+            self._connections[board] = conn
+
+    # -------------------- SAVE --------------------
+    def save(self) -> None:
+        """Write the current state of every tracked board atomically."""
+        with self._lock:
+            connections = dict(self._connections)
+
+        boards = dict(self._saved.get("boards", {}))
+        for board, conn in connections.items():
+            state = conn.export_state()
+            previous = boards.get(board)
+            if previous and previous.get("port") == state["port"]:
+                # Keep older values of fields not read in this session yet (aged)
+                fields = {
+                    f: dict(e) for f, e in previous.get("fields", {}).items() if f not in state["fields"]
+                }
+                elapsed = max(0.0, time.time() - float(self._saved.get("saved_at", time.time())))
+                for e in fields.values():
+                    e["age_s"] = round(float(e.get("age_s", 0.0)) + elapsed, 3)
+                fields.update(state["fields"])
+                state["fields"] = fields
+            boards[board] = state
+
+        data = {"saved_at": time.time(), "boards": boards}
+        tmp = f"{self._path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path)
+        self._saved = data
+        self.saves += 1
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="state-store", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the timer and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        try:
+            self.save()
+        except OSError as e:
+            print(f"[WARN] state not saved: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            try:
+                self.save()
+            except OSError as e:
+                print(f"[WARN] state not saved: {e}")
@@ -0,0 +1,50 @@
+# Author: 152120221098 Emre AVCI
+"""
+Status view widget
+------------------
+A two-column grid (caption : value) with one Label per field.
+
+show() remembers what each value Label currently displays and only calls
+Label.config() when the text or colour really changes, so an unchanged field
+costs no Tk work (no re-layout) on a refresh.
+"""
+
+import tkinter as tk
+
+
+class StatusView:
+    def __init__(self, parent, rows, font, bg: str, fg: str, stale_fg: str):
+        """
+        rows: list of (key, caption) tuples; a None entry draws a separator line.
+        """
+        self.frame = tk.Frame(parent, bg=bg)
+        self._fg = fg
+        self._stale_fg = stale_fg
+
+        self._values: dict[str, tk.Label] = {}
+        self._rendered: dict[str, tuple[str, str]] = {}
+
+        for r, row in enumerate(rows):
+            if row is None:
+                tk.Frame(self.frame, bg=stale_fg, height=1).grid(row=r, column=0, columnspan=2, sticky="we", pady=6)
+                continue
+
+            key, caption = row
+            tk.Label(self.frame, text=f"{caption}:", font=font, bg=bg, fg=fg, anchor="w").grid(
+                row=r, column=0, sticky="w", padx=(0, 20)
+            )
+            value = tk.Label(self.frame, text="", font=font, bg=bg, fg=fg, anchor="w")
+            value.grid(row=r, column=1, sticky="w")
+            self._values[key] = value
+
+    def keys(self):
+        return self._values.keys()
+
+    def show(self, key: str, text: str, stale: bool = False) -> bool:
+        """Display text for key. Returns True if the widget had to be updated."""
+        fg = self._stale_fg if stale else self._fg
+        if self._rendered.get(key) == (text, fg):
+            return False
+        self._rendered[key] = (text, fg)
+        self._values[key].config(text=text, fg=fg)
+        return True
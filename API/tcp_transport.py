@@ -0,0 +1,111 @@
+# Author: 152120221098 Emre AVCI
+"""
+TCP transport
+-------------
+Lets a HomeAutomationSystemConnection talk to a board that is not attached to
+this machine. The protocol bytes are sent unchanged over a TCP socket, so the
+other end can be a serial bridge (serial_bridge.py), a board emulator
+(board_emulator.py) or any serial-to-TCP adapter in raw mode.
+
+A port string of the form
+
+    tcp://127.0.0.1:7000
+
+selects this transport instead of a COM port (see
+HomeAutomationSystemConnection._open_port). TcpSerial implements the part of
+the pyserial API the connection uses (non-blocking read, write, flush, buffer
+resets, close), so nothing above the transport changes.
+"""
+
+import select
+import socket
+
+TCP_SCHEME = "tcp://"
+CONNECT_TIMEOUT_S = 2.0
+
+
+def is_tcp_port(port: str) -> bool:
+    """True if port is a tcp://host:port address rather than a serial device."""
+    return str(port).lower().startswith(TCP_SCHEME)
+
+
+def parse_address(text: str, default_host: str = "127.0.0.1") -> tuple[str, int]:
+    """Split "tcp://host:port", "host:port" or ":port" into (host, port)."""
+    if is_tcp_port(text):
+        text = text[len(TCP_SCHEME):]
+    host, sep, port = text.rstrip("/").rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"expected host:port, got {text!r}")
+    return host.strip("[]") or default_host, int(port)
+
+
+class TcpSerial:
+    """pyserial-like byte stream over a TCP connection."""
+
+    def __init__(
+        self,
+        port: str,
+        timeout: float | None = 0,
+        write_timeout: float | None = 0.2,
+        connect_timeout: float = CONNECT_TIMEOUT_S,
+    ):
+        self.port = port
+        self.timeout = timeout
+        self._rx = bytearray()
+        self._sock = socket.create_connection(parse_address(port), timeout=connect_timeout)
+        # One protocol byte per segment: do not let Nagle hold a SET LOW behind its HIGH
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock.settimeout(write_timeout)
+        self.is_open = True
+
+    def _pump(self, wait_s: float = 0.0) -> None:
+        """Move whatever the socket has received into the RX buffer (waits at most wait_s)."""
+        if self._sock is None:
+            raise OSError("port is closed")
+        while True:
+            ready, _, _ = select.select([self._sock], [], [], wait_s)
+            if not ready:
+                return
+            data = self._sock.recv(4096)
+            if not data:
+                raise OSError(f"{self.port}: connection closed by peer")
+            self._rx += data
+            wait_s = 0.0
+
+    @property
+    def in_waiting(self) -> int:
+        self._pump()
+        return len(self._rx)
+
+    def read(self, size: int = 1) -> bytes:
+        """Up to size bytes; with timeout=0 (as the connections use it) never blocks."""
+        if len(self._rx) < size:
+            self._pump(self.timeout or 0.0)
+        out = bytes(self._rx[:size])
+        del self._rx[:size]
+        return out
+
+    def write(self, data: bytes) -> int:
+        if self._sock is None:
+            raise OSError("port is closed")
+        self._sock.sendall(data)
+        return len(data)
+
+    def flush(self) -> None:
+        # sendall() has already handed the bytes to the kernel, which sends them at once (TCP_NODELAY)
+        return
+
+    def reset_input_buffer(self) -> None:
+        self._pump()
+        self._rx.clear()
+
+    def reset_output_buffer(self) -> None:
+        return
+
+    def close(self) -> None:
+        self.is_open = False
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
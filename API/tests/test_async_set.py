@@ -0,0 +1,98 @@
+# Author: 152120221098 Emre AVCI
+"""
+Asynchronous SETs (_queue_set / _verify_pending_set): supersede, retry and the
+verification tolerance, against a curtain board emulator on localhost.
+"""
+
+import time
+import unittest
+
+from base_connections import SET_VERIFY_TOLERANCE
+from board_emulator import BoardEmulator
+from curtain_control import CurtainControlSystemConnection
+from protocol import GET_DESIRED_CURTAIN_HIGH, GET_DESIRED_CURTAIN_LOW
+
+
+def settle(conn, fut, timeout_s: float = 5.0) -> bool:
+    """Drive service_sets() the way a script without an I/O engine would."""
+    deadline = time.monotonic() + timeout_s
+    while not fut.done() and time.monotonic() < deadline:
+        conn.service_sets(readback=True)
+    return fut.result(timeout=0)
+
+
+class AsyncSetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.emulator = BoardEmulator("curtain", port=0)
+        cls.emulator.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.emulator.stop()
+
+    def setUp(self):
+        self.board = self.emulator.board
+        self.conn = CurtainControlSystemConnection(f"tcp://127.0.0.1:{self.emulator.port}")
+        self.conn.open()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_set_is_verified_by_the_read_back(self):
+        fut = self.conn.setCurtainStatusAsync(42.5)
+        self.assertFalse(fut.done())
+        self.assertTrue(settle(self.conn, fut))
+        self.assertAlmostEqual(self.board.setpoint, 42.5)
+        self.assertEqual(self.conn.pending_sets(), 0)
+        self.assertEqual(self.conn.metrics.set_retries, 0)
+
+    def test_newer_set_supersedes_a_queued_one(self):
+        sets_before = self.board.sets
+        first = self.conn.setCurtainStatusAsync(20.0)
+        second = self.conn.setCurtainStatusAsync(30.0)
+        self.assertEqual(self.conn.pending_sets(), 1)
+
+        self.assertTrue(settle(self.conn, second))
+        self.assertTrue(first.result(timeout=0))  # older caller gets the newer outcome
+        self.assertAlmostEqual(self.board.setpoint, 30.0)
+        self.assertEqual(self.board.sets - sets_before, 2)  # one HIGH/LOW pair on the wire
+
+    def test_read_back_within_tolerance_counts_as_verified(self):
+        # 33.35 is sent with one decimal digit, the board stores 33.4
+        fut = self.conn.setCurtainStatusAsync(33.35)
+        self.assertTrue(settle(self.conn, fut))
+        self.assertAlmostEqual(self.board.setpoint, 33.4)
+        self.assertLessEqual(abs(self.board.setpoint - 33.35), SET_VERIFY_TOLERANCE)
+
+    def test_wrong_read_back_is_retried_then_fails(self):
+        # 70 does not fit the 6-bit HIGH payload: the board ends up at 6.0 every time
+        fut = self.conn.setCurtainStatusAsync(70.0, retries=3)
+        self.assertFalse(settle(self.conn, fut))
+        self.assertAlmostEqual(self.board.setpoint, 6.0)
+        self.assertEqual(self.conn.metrics.set_retries, 2)
+        self.assertEqual(self.conn.pending_sets(), 0)
+
+    def test_read_requested_before_the_write_does_not_verify(self):
+        fut = self.conn.setCurtainStatusAsync(12.0)
+        self.conn.service_sets()  # frames written, no read-back yet
+        self.assertFalse(fut.done())
+
+        # A reply to a GET sent before the write (e.g. a slow poll) must not settle it
+        self.conn._get_sent_at = [0.0] * 256
+        self.conn.begin_cycle()
+        self.conn.handle_rx(GET_DESIRED_CURTAIN_HIGH, 12)
+        self.conn.handle_rx(GET_DESIRED_CURTAIN_LOW, 0)
+        self.assertFalse(fut.done())
+
+        self.assertTrue(settle(self.conn, fut))
+
+    def test_set_on_a_closed_port_fails_at_once(self):
+        self.conn.close()
+        fut = self.conn.setCurtainStatusAsync(15.0)
+        self.assertTrue(fut.done())
+        self.assertFalse(fut.result())
+
+
+if __name__ == "__main__":
+    unittest.main()
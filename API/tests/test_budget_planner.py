@@ -0,0 +1,78 @@
+# Author: 152120221098 Emre AVCI
+"""
+Budget planner: targets that fit are kept, an overloaded line is relaxed lowest
+priority first (at most MAX_STRETCH per level) and frame rounding is absorbed
+by the lowest priorities. Costs come from the link model (no port is opened).
+"""
+
+import unittest
+
+from budget_planner import MAX_STRETCH, FieldTarget, plan
+from curtain_control import CurtainControlSystemConnection
+
+
+class BudgetPlannerTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = CurtainControlSystemConnection("tcp://127.0.0.1:1")
+
+    def plan(self, *targets):
+        port_plan = plan({"curtain": self.conn}, list(targets)).ports[self.conn._comPort]
+        self.assertLessEqual(port_plan.planned_share, port_plan.usable_share + 1e-9)
+        return port_plan, {a.field: a for a in port_plan.allocations}
+
+    def test_default_targets_fit_without_degradation(self):
+        port_plan, allocs = self.plan()
+        self.assertTrue(port_plan.fits)
+        self.assertFalse(any(a.degraded for a in allocs.values()))
+        self.assertEqual(port_plan.notes, [])
+        self.assertEqual(len(port_plan.frames["curtain"]), 2 * len(allocs))
+
+    def test_overload_relaxes_the_lowest_priority_first(self):
+        port_plan, allocs = self.plan(
+            FieldTarget("curtain", "light_intensity", 0.1, priority=2),
+            FieldTarget("curtain", "outdoor_temp", 0.1, priority=0),
+            FieldTarget("curtain", "outdoor_press", 0.2, priority=0),
+            FieldTarget("curtain", "curtain_status", 0.3, priority=3),
+        )
+        self.assertFalse(port_plan.fits)
+        self.assertTrue(allocs["outdoor_temp"].degraded)
+        self.assertTrue(allocs["outdoor_press"].degraded)
+        self.assertFalse(allocs["light_intensity"].degraded)
+        self.assertFalse(allocs["curtain_status"].degraded)
+        relaxed = [n for n in port_plan.notes if "targets relaxed" in n]
+        self.assertEqual(len(relaxed), 1)
+        self.assertTrue(relaxed[0].startswith("priority 0 "))
+
+    def test_capped_priority_moves_on_to_the_next_one(self):
+        port_plan, allocs = self.plan(
+            FieldTarget("curtain", "outdoor_temp", 0.02, priority=0),
+            FieldTarget("curtain", "light_intensity", 0.02, priority=1),
+            FieldTarget("curtain", "curtain_status", 0.5, priority=2),
+        )
+        relaxed = [n for n in port_plan.notes if "targets relaxed" in n]
+        self.assertEqual(len(relaxed), 2)
+        self.assertTrue(relaxed[0].startswith("priority 0 "))
+        self.assertIn(f"x{MAX_STRETCH:.2f}", relaxed[0])
+        self.assertTrue(relaxed[1].startswith("priority 1 "))
+        self.assertTrue(allocs["light_intensity"].degraded)
+        self.assertFalse(allocs["curtain_status"].degraded)
+
+    def test_frame_rounding_is_absorbed_by_the_lower_priority(self):
+        port_plan, allocs = self.plan(
+            FieldTarget("curtain", "light_intensity", 0.05, priority=2),
+            FieldTarget("curtain", "outdoor_temp", 0.5, priority=1),
+        )
+        self.assertTrue(port_plan.fits)
+        self.assertFalse(allocs["light_intensity"].degraded)
+        self.assertTrue(allocs["outdoor_temp"].degraded)
+        rounding = [n for n in port_plan.notes if n.startswith("frame rounding")]
+        self.assertEqual(len(rounding), 1)
+        self.assertIn("curtain.outdoor_temp", rounding[0])
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            plan({"curtain": self.conn}, [FieldTarget("curtain", "humidity", 1.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# Author: 152120221098 Emre AVCI
+"""
+Metrics: SET frames get a latency histogram (write to verified read-back) and
+rendering the Prometheus text has no side effects on what the next scrape sees.
+"""
+
+import time
+import unittest
+
+from board_emulator import BoardEmulator
+from curtain_control import CurtainControlSystemConnection
+from metrics import render_prometheus
+
+
+class MetricsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.emulator = BoardEmulator("curtain", port=0)
+        cls.emulator.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.emulator.stop()
+
+    def setUp(self):
+        self.conn = CurtainControlSystemConnection(f"tcp://127.0.0.1:{self.emulator.port}")
+        self.conn.open()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def lines(self, prefix):
+        text = render_prometheus({"curtain": self.conn})
+        return [line for line in text.splitlines() if line.startswith(prefix)]
+
+    def test_async_set_is_timed_until_verified(self):
+        fut = self.conn.setCurtainStatusAsync(35.0)
+        deadline = time.monotonic() + 5.0
+        while not fut.done() and time.monotonic() < deadline:
+            self.conn.service_sets(readback=True)
+        self.assertTrue(fut.result(timeout=0))
+
+        for opcode in ("SET_HIGH", "SET_LOW"):
+            count = [line for line in self.lines("uart_request_latency_seconds_count") if f'opcode="{opcode}"' in line]
+            self.assertEqual(len(count), 1)
+            self.assertIn('field="curtain_status"', count[0])
+            self.assertTrue(count[0].endswith(" 1"))
+
+    def test_blocking_set_is_timed_until_verified(self):
+        self.assertTrue(self.conn.setCurtainStatus(45.0))
+        h = self.conn.metrics.latency[0xC0]
+        self.assertEqual(h.count, 1)
+        self.assertGreater(h.sum_s, 0.0)
+
+    def test_scrapes_do_not_disturb_each_other(self):
+        self.conn.read_many()
+        first = self.lines("uart_")
+        second = self.lines("uart_")
+        self.assertEqual(first, second)
+        self.assertTrue(any(line.startswith("uart_tx_bytes_total") for line in first))
+        self.assertFalse(any(line.startswith("uart_bytes_per_second") for line in first))
+
+
+if __name__ == "__main__":
+    unittest.main()
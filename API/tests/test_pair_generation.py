@@ -0,0 +1,78 @@
+# Author: 152120221098 Emre AVCI
+"""
+HIGH/LOW pair decoding across request cycles (_note_rx / _pair_complete).
+No port is opened: replies are fed to handle_rx() directly.
+
+Run from API/:  python -m unittest discover -s tests
+"""
+
+import unittest
+
+from air_conditioner import AirConditionerControlSystemConnection
+from protocol import (
+    GET_AMBIENT_TEMPERATURE_HIGH,
+    GET_DESIRED_TEMPERATURE_HIGH,
+    GET_DESIRED_TEMPERATURE_LOW,
+    GET_FAN_SPEED,
+)
+
+
+class PairGenerationTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = AirConditionerControlSystemConnection("tcp://127.0.0.1:1")
+
+    def reply(self, cmd: int, value: int, new_cycle: bool = False) -> None:
+        if new_cycle:
+            self.conn.begin_cycle()
+        self.conn.handle_rx(cmd, value)
+
+    def test_pair_of_one_cycle_is_decoded(self):
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 24, new_cycle=True)
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 3)
+        self.assertAlmostEqual(self.conn.peekDesiredTemp(), 24.3)
+        self.assertTrue(self.conn.is_verified("desired_temp"))
+
+    def test_order_of_the_halves_does_not_matter(self):
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 7, new_cycle=True)
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 21)
+        self.assertAlmostEqual(self.conn.peekDesiredTemp(), 21.7)
+
+    def test_new_high_is_not_combined_with_an_old_low(self):
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 24, new_cycle=True)
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 3)
+
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 25, new_cycle=True)
+        self.assertAlmostEqual(self.conn.peekDesiredTemp(), 24.3)
+
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 7)
+        self.assertAlmostEqual(self.conn.peekDesiredTemp(), 25.7)
+
+    def test_halves_of_different_cycles_are_not_decoded(self):
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 26, new_cycle=True)
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 1, new_cycle=True)
+        self.assertIsNone(self.conn.field_age("desired_temp"))
+        self.assertFalse(self.conn.is_verified("desired_temp"))
+
+    def test_late_reply_of_the_missing_half_completes_the_next_cycle(self):
+        # Cycle 1 loses its LOW; cycle 2 only gets its LOW so far
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 26, new_cycle=True)
+        self.reply(GET_DESIRED_TEMPERATURE_LOW, 4, new_cycle=True)
+        self.assertIsNone(self.conn.field_age("desired_temp"))
+
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 27)
+        self.assertAlmostEqual(self.conn.peekDesiredTemp(), 27.4)
+
+    def test_single_byte_field_needs_no_pair(self):
+        self.reply(GET_FAN_SPEED, 40, new_cycle=True)
+        self.assertEqual(self.conn.peekFanSpeed(), 40)
+        self.assertIsNotNone(self.conn.field_age("fan_speed"))
+
+    def test_other_fields_are_not_touched(self):
+        self.reply(GET_DESIRED_TEMPERATURE_HIGH, 24, new_cycle=True)
+        self.reply(GET_AMBIENT_TEMPERATURE_HIGH, 19)
+        self.assertIsNone(self.conn.field_age("desired_temp"))
+        self.assertIsNone(self.conn.field_age("ambient_temp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
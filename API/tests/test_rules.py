@@ -0,0 +1,118 @@
+# Author: 152120221098 Emre AVCI
+"""
+Rule engine: condition hysteresis, rule activation and the per-rule rate limit.
+The target connection is never opened, so SETs reach the writer but not a board.
+"""
+
+import time
+import unittest
+
+from curtain_control import CurtainControlSystemConnection
+from rules import Above, AboveField, Below, Rule, RuleEngine
+
+
+class HysteresisTest(unittest.TestCase):
+    def feed(self, cond, value):
+        return cond.update({("curtain", "light_intensity"): value})
+
+    def test_above_is_released_only_past_the_band(self):
+        cond = Above("curtain", "light_intensity", 60.0, hysteresis=5.0)
+        self.assertTrue(self.feed(cond, 61.0))
+        self.assertTrue(self.feed(cond, 58.0))  # inside the band: stays met
+        self.assertTrue(self.feed(cond, 55.0))  # exactly at the band edge: still met
+        self.assertFalse(self.feed(cond, 54.9))
+        self.assertFalse(self.feed(cond, 59.0))  # inside the band again, but it was not met
+        self.assertTrue(self.feed(cond, 60.5))
+
+    def test_below_mirrors_above(self):
+        cond = Below("curtain", "light_intensity", 20.0, hysteresis=2.0)
+        self.assertTrue(self.feed(cond, 19.0))
+        self.assertTrue(self.feed(cond, 21.5))
+        self.assertFalse(self.feed(cond, 22.5))
+        self.assertFalse(self.feed(cond, 21.0))
+
+    def test_without_hysteresis_the_threshold_keeps_the_state(self):
+        cond = Above("curtain", "light_intensity", 60.0)
+        self.assertFalse(self.feed(cond, 60.0))  # met only strictly above
+        self.assertTrue(self.feed(cond, 60.1))
+        self.assertTrue(self.feed(cond, 60.0))  # released only strictly below
+        self.assertFalse(self.feed(cond, 59.9))
+
+    def test_unknown_input_gives_no_state(self):
+        cond = AboveField("air_conditioner", "ambient_temp", "air_conditioner", "desired_temp", hysteresis=0.5)
+        self.assertIsNone(cond.update({("air_conditioner", "ambient_temp"): 25.0}))
+        self.assertTrue(
+            cond.update({("air_conditioner", "ambient_temp"): 25.0, ("air_conditioner", "desired_temp"): 24.0})
+        )
+
+
+class RuleEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = CurtainControlSystemConnection("tcp://127.0.0.1:1")
+        self.rule = Rule(
+            "shade",
+            when=[
+                Above("curtain", "light_intensity", 60.0, hysteresis=5.0),
+                Above("curtain", "outdoor_temp", 25.0),
+            ],
+            board="curtain",
+            value=100.0,
+            else_value=0.0,
+            min_interval_s=0.2,
+        )
+        self.engine = RuleEngine([self.rule], {"curtain": self.conn}, window_s=0.01)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_rule_needs_every_condition(self):
+        self.engine.on_change("curtain", "light_intensity", 70.0)
+        self.assertFalse(self.rule.active)
+        self.assertEqual(self.engine.writes, 0)
+
+        self.engine.on_change("curtain", "outdoor_temp", 26.0)
+        self.assertTrue(self.rule.active)
+        self.assertEqual(self.engine.writes, 1)
+        self.assertEqual(self.rule.last_written, 100.0)
+
+    def test_only_dependent_conditions_are_evaluated(self):
+        self.engine.on_change("curtain", "outdoor_press", 1013.0)
+        self.engine.on_change("curtain", "light_intensity", 70.0)
+        self.assertEqual(self.engine.events, 1)
+        self.assertEqual(self.engine.evaluations, 1)
+
+    def test_change_inside_the_window_is_deferred_to_its_end(self):
+        self.engine.on_change("curtain", "outdoor_temp", 26.0)
+        self.engine.on_change("curtain", "light_intensity", 70.0)
+        self.assertEqual(self.engine.writes, 1)
+
+        self.engine.on_change("curtain", "light_intensity", 50.0)  # rule released
+        self.assertFalse(self.rule.active)
+        self.assertEqual(self.engine.writes, 1)
+        self.assertEqual(self.engine.rate_limited, 1)
+
+        time.sleep(0.35)
+        self.assertEqual(self.engine.writes, 2)
+        self.assertEqual(self.rule.last_written, 0.0)
+
+    def test_flapping_inside_the_window_writes_nothing_more(self):
+        self.engine.on_change("curtain", "outdoor_temp", 26.0)
+        self.engine.on_change("curtain", "light_intensity", 70.0)
+        self.engine.on_change("curtain", "light_intensity", 50.0)
+        self.engine.on_change("curtain", "light_intensity", 70.0)  # wanted value is back
+        self.assertTrue(self.rule.active)
+
+        time.sleep(0.35)
+        self.assertEqual(self.engine.writes, 1)
+        self.assertEqual(self.rule.last_written, 100.0)
+
+    def test_hysteresis_keeps_the_rule_active(self):
+        self.engine.on_change("curtain", "outdoor_temp", 26.0)
+        self.engine.on_change("curtain", "light_intensity", 70.0)
+        self.engine.on_change("curtain", "light_intensity", 57.0)
+        self.assertTrue(self.rule.active)
+        self.assertEqual(self.engine.rate_limited, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
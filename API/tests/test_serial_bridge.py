@@ -0,0 +1,122 @@
+# Author: 152120221098 Emre AVCI
+"""
+Serial bridge: replies stay aligned with each client's own GETs while other
+clients keep the board busy, GETs are served round-robin across clients and a
+reply the client no longer waits for is dropped.
+"""
+
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from board_emulator import BoardEmulator
+from curtain_control import CurtainControlSystemConnection
+from protocol import GET_DESIRED_CURTAIN_HIGH, GET_DESIRED_CURTAIN_LOW
+from serial_bridge import SerialBridge, _Client
+
+
+class BridgeAlignmentTest(unittest.TestCase):
+    def setUp(self):
+        self.emulator = BoardEmulator("curtain", port=0)
+        self.emulator.start()
+        self.bridge = SerialBridge(f"tcp://127.0.0.1:{self.emulator.port}", tcp_port=0)
+        self.bridge.start()
+        self.url = f"tcp://127.0.0.1:{self.bridge.port}"
+
+    def tearDown(self):
+        self.bridge.stop()
+        self.emulator.stop()
+
+    def test_late_replies_are_not_taken_for_the_next_get(self):
+        # Pollers keep the bridge busy with pipelined bursts; a plain client
+        # alternates single GETs with its own 80 ms deadline
+        stop = threading.Event()
+
+        def poll():
+            conn = CurtainControlSystemConnection(self.url)
+            conn.open()
+            while not stop.is_set():
+                conn.read_many()
+            conn.close()
+
+        pollers = [threading.Thread(target=poll) for _ in range(6)]
+        for t in pollers:
+            t.start()
+        conn = CurtainControlSystemConnection(self.url)
+        conn.open()
+        expected = {GET_DESIRED_CURTAIN_HIGH: 50, GET_DESIRED_CURTAIN_LOW: 0}  # setpoint 50.0
+        right = wrong = 0
+        try:
+            deadline = time.monotonic() + 2.0
+            while time.monotonic() < deadline:
+                for cmd, want in expected.items():
+                    b = conn._get_byte(cmd)
+                    if b is not None:
+                        right += b == want
+                        wrong += b != want
+        finally:
+            stop.set()
+            for t in pollers:
+                t.join()
+            conn.close()
+        self.assertGreater(right, 0)
+        self.assertEqual(wrong, 0)
+
+
+class ServeGetsTest(unittest.TestCase):
+    """_serve_gets() with socketpair clients and a recorded conn.query()."""
+
+    def setUp(self):
+        self.bridge = SerialBridge("tcp://127.0.0.1:1", get_timeout_ms=80)
+        self.sent: list[int] = []
+        self.query = mock.patch.object(self.bridge.conn, "query", side_effect=self.answer)
+        self.query.start()
+        self.socks = []
+
+    def tearDown(self):
+        self.query.stop()
+        for sock in self.socks:
+            sock.close()
+
+    def answer(self, cmd, timeout_ms=80):
+        self.sent.append(cmd)
+        return cmd + 100
+
+    def client(self, name):
+        ours, theirs = socket.socketpair()
+        self.socks += [ours, theirs]
+        theirs.settimeout(0.5)
+        return _Client(ours, name), theirs
+
+    def test_clients_are_served_round_robin(self):
+        a, a_peer = self.client("a")
+        b, b_peer = self.client("b")
+        now = time.monotonic()
+        self.bridge._serve_gets([(a, 1, now), (a, 3, now), (a, 5, now), (b, 7, now)])
+        self.assertEqual(self.sent, [1, 7, 3, 5])  # b's GET does not wait for a's burst
+        self.assertEqual(a_peer.recv(16), bytes((101, 103, 105)))
+        self.assertEqual(b_peer.recv(16), bytes((107,)))
+
+    def test_shared_get_is_sent_once(self):
+        a, a_peer = self.client("a")
+        b, b_peer = self.client("b")
+        now = time.monotonic()
+        self.bridge._serve_gets([(a, 1, now), (b, 1, now)])
+        self.assertEqual(self.sent, [1])
+        self.assertEqual(a_peer.recv(16), bytes((101,)))
+        self.assertEqual(b_peer.recv(16), bytes((101,)))
+
+    def test_get_the_client_gave_up_on_is_dropped_with_its_burst(self):
+        a, a_peer = self.client("a")
+        stale = time.monotonic() - 0.2
+        fresh = time.monotonic()
+        self.bridge._serve_gets([(a, 1, stale), (a, 3, stale), (a, 5, fresh)])
+        self.assertEqual(self.sent, [5])
+        self.assertEqual(self.bridge.replies_dropped, 2)
+        self.assertEqual(a_peer.recv(16), bytes((105,)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# Author: 152120221098 Emre AVCI
+"""
+SET journal: replay of "superseded" / "failed" outcomes, torn lines,
+compaction at open() and write-ahead ordering of the SET frames.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import set_journal
+from board_emulator import BoardEmulator
+from curtain_control import CurtainControlSystemConnection
+from set_journal import SetJournal
+
+
+def set_entry(seq, board, value, field="curtain_status"):
+    """Journal line as written to disk (seq None: an entry for append(), which adds it)."""
+    entry = {"op": "set", "board": board, "field": field,
+             "value": value, "frames": [0, 0], "mode": "async"}
+    return entry if seq is None else {"seq": seq, "t": 0.0, **entry}
+
+
+def outcome_entry(seq, board, ref, result, attempts=1):
+    entry = {"op": "outcome", "board": board, "ref": ref, "result": result, "attempts": attempts}
+    return entry if seq is None else {"seq": seq, "t": 0.0, **entry}
+
+
+class SetJournalTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+
+    def tearDown(self):
+        for path in (self.path, f"{self.path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write(self, entries, tail: str = "") -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e) + "\n" for e in entries) + tail)
+
+    def test_superseded_set_is_not_the_desired_state(self):
+        # Order written by _queue_set: the newer "set", then the older one's outcome
+        self.write([
+            set_entry(1, "curtain", 20.0),
+            set_entry(2, "curtain", 30.0),
+            outcome_entry(3, "curtain", 1, "superseded", attempts=0),
+            outcome_entry(4, "curtain", 2, "verified"),
+        ])
+        desired, last_seq = SetJournal.replay(self.path)
+        self.assertEqual(last_seq, 4)
+        self.assertEqual(desired["curtain"]["value"], 30.0)
+        self.assertEqual(desired["curtain"]["result"], "verified")
+
+    def test_failed_outcome_is_kept_for_reconcile(self):
+        self.write([
+            set_entry(1, "curtain", 40.0),
+            outcome_entry(2, "curtain", 1, "failed", attempts=3),
+            set_entry(3, "air_conditioner", 23.5, field="desired_temp"),
+        ])
+        desired, _ = SetJournal.replay(self.path)
+        self.assertEqual(desired["curtain"]["result"], "failed")
+        self.assertEqual(desired["curtain"]["attempts"], 3)
+        self.assertIsNone(desired["air_conditioner"]["result"])  # died before the outcome
+
+    def test_torn_last_line_is_ignored_and_terminated(self):
+        self.write([set_entry(1, "curtain", 40.0)], tail='{"seq": 2, "op": "se')
+        desired, last_seq = SetJournal.replay(self.path)
+        self.assertEqual(last_seq, 1)
+        self.assertEqual(desired["curtain"]["value"], 40.0)
+
+        journal = SetJournal(self.path, commit_interval_s=0.0)
+        journal.open()
+        seq = journal.append(outcome_entry(None, "curtain", 1, "verified"))
+        journal.close()
+        self.assertEqual(seq, 2)
+        desired, _ = SetJournal.replay(self.path)
+        self.assertEqual(desired["curtain"]["result"], "verified")
+
+    def test_compaction_keeps_last_set_and_its_outcome(self):
+        entries = []
+        seq = 0
+        for i in range(50):
+            seq += 1
+            entries.append(set_entry(seq, "curtain", float(i)))
+            seq += 1
+            entries.append(outcome_entry(seq, "curtain", seq - 1, "superseded" if i < 49 else "failed", 0))
+        self.write(entries)
+        before, last_seq = SetJournal.replay(self.path)
+
+        with mock.patch.object(set_journal, "COMPACT_BYTES", 1024):
+            journal = SetJournal(self.path)
+            desired = journal.open()
+            journal.close()
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([e["op"] for e in lines], ["set", "outcome"])
+        self.assertEqual(lines[1]["ref"], lines[0]["seq"])
+
+        after, after_seq = SetJournal.replay(self.path)
+        self.assertEqual(after, before)
+        self.assertEqual(desired, before)
+        self.assertEqual(after["curtain"]["value"], 49.0)
+        self.assertEqual(after["curtain"]["result"], "failed")
+        self.assertEqual(after_seq, last_seq)
+
+    def test_group_commit_needs_one_fsync_per_burst(self):
+        journal = SetJournal(self.path, commit_interval_s=0.05)
+        journal.open()
+        last = 0
+        for i in range(100):
+            last = journal.append(set_entry(None, "curtain", float(i)))
+        self.assertTrue(journal.wait_durable(last, timeout=2.0))
+        journal.close()
+        self.assertEqual(journal.entries, 100)
+        self.assertLessEqual(journal.commits, 2)
+
+
+class WriteAheadTest(unittest.TestCase):
+    """SET frames reach the board only after their "set" entry is on disk."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.emulator = BoardEmulator("curtain", port=0)
+        self.emulator.start()
+        self.journal = SetJournal(self.path, commit_interval_s=0.2)
+        self.journal.open()
+        self.conn = CurtainControlSystemConnection(f"tcp://127.0.0.1:{self.emulator.port}")
+        self.conn.open()
+        self.journal.track("curtain", self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.journal.close()
+        self.emulator.stop()
+        os.remove(self.path)
+
+    def test_async_set_waits_for_its_entry(self):
+        sets = self.emulator.board.sets
+        fut = self.conn.setCurtainStatusAsync(30.0)
+        seq = self.conn._pending_sets["curtain_status"].journal_seq
+        self.conn.service_sets()
+        self.assertFalse(self.journal.is_durable(seq))
+        self.assertEqual(self.emulator.board.sets, sets)  # held back, the caller did not block
+
+        self.assertTrue(self.journal.wait_durable(seq, timeout=2.0))
+        while not fut.done():
+            self.conn.service_sets(readback=True)
+        self.assertTrue(fut.result())
+        self.assertEqual(self.emulator.board.sets - sets, 2)
+
+    def test_blocking_set_waits_for_its_entry(self):
+        durable_at_write = []
+        write = self.conn._uart_write_byte
+
+        def checked_write(b):
+            if b & 0x80:
+                durable_at_write.append(self.journal.is_durable(self.journal._seq))
+            return write(b)
+
+        with mock.patch.object(self.conn, "_uart_write_byte", side_effect=checked_write):
+            self.assertTrue(self.conn.setCurtainStatus(40.0))
+        self.assertEqual(durable_at_write, [True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
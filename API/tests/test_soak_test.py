@@ -0,0 +1,54 @@
+# Author: 152120221098 Emre AVCI
+"""
+Soak tester: a lost link is reported as a link loss and outage time, not as a
+flood of failed GETs, so reports of different runs stay comparable.
+"""
+
+import threading
+import time
+import unittest
+
+from board_emulator import BoardEmulator
+from soak_test import BoardStats, BoardTester, Series, TestConfig
+
+
+class SoakOutageTest(unittest.TestCase):
+    def test_outage_is_counted_as_time(self):
+        emulator = BoardEmulator("curtain", port=0)
+        emulator.start()
+        cfg = TestConfig(
+            boards=[("curtain", f"tcp://127.0.0.1:{emulator.port}")],
+            baud=9600,
+            mode="soak",
+            interval=0.0,
+            duration=0.0,
+            set_values=None,
+            set_every=0.0,
+        )
+        tester = BoardTester(cfg)
+        conn = tester.conns["curtain"]
+        stats = BoardStats("curtain", conn._comPort, {f: Series() for f in conn.FIELDS})
+        worker = threading.Thread(target=tester._soak_board, args=(conn, stats))
+        try:
+            self.assertTrue(tester._open_connections())
+            worker.start()
+            time.sleep(0.5)
+            before = stats.gets().summary()
+            emulator.stop()  # board powered off
+            time.sleep(1.5)
+        finally:
+            tester._stop.set()
+            if worker.is_alive():
+                worker.join()
+            tester._close_connections()
+            emulator.stop()
+
+        after = stats.gets().summary()
+        self.assertGreater(before["count"], 0)
+        self.assertEqual(conn.metrics.link_losses, 1)
+        self.assertGreater(stats.outage_s, 1.0)
+        self.assertLess(after["failures"] - before["failures"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
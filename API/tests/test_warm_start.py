@@ -0,0 +1,52 @@
+# Author: 152120221098 Emre AVCI
+"""
+Warm start (export_state / restore_state): restored values are shown but never
+served as if they had just been read from the board.
+"""
+
+import unittest
+
+from air_conditioner import AirConditionerControlSystemConnection
+from board_emulator import INITIAL_SETPOINT, BoardEmulator
+
+SAVED = {"fields": {"desired_temp": {"value": 23.4, "age_s": 0.2}}}
+
+
+class WarmStartTest(unittest.TestCase):
+    def test_restored_value_is_shown_but_not_verified(self):
+        conn = AirConditionerControlSystemConnection("tcp://127.0.0.1:1")
+        conn.restore_state(SAVED, elapsed_s=0.5)
+        self.assertAlmostEqual(conn.peekDesiredTemp(), 23.4)
+        self.assertTrue(conn.is_restored("desired_temp"))
+        self.assertFalse(conn.is_verified("desired_temp"))
+        self.assertGreaterEqual(conn.field_age("desired_temp"), 0.7)
+
+    def test_read_many_reports_no_read_time_for_restored_values(self):
+        conn = AirConditionerControlSystemConnection("tcp://127.0.0.1:1")
+        conn.restore_state(SAVED, elapsed_s=0.5)
+        value, ts = conn.read_many(["desired_temp"], max_age=2.0)["desired_temp"]
+        self.assertAlmostEqual(value, 23.4)
+        self.assertIsNone(ts)
+
+    def test_max_age_cache_goes_to_the_board_for_restored_values(self):
+        emulator = BoardEmulator("air_conditioner", port=0)
+        emulator.start()
+        conn = AirConditionerControlSystemConnection(f"tcp://127.0.0.1:{emulator.port}")
+        try:
+            conn.open()
+            conn.restore_state(SAVED, elapsed_s=0.5)
+            gets = emulator.board.gets
+            self.assertAlmostEqual(conn.getDesiredTemp(max_age=2.0), INITIAL_SETPOINT["air_conditioner"])
+            self.assertEqual(emulator.board.gets - gets, 2)
+            self.assertFalse(conn.is_restored("desired_temp"))
+
+            # Read back from the board: now the cache may serve it
+            conn.getDesiredTemp(max_age=2.0)
+            self.assertEqual(emulator.board.gets - gets, 2)
+        finally:
+            conn.close()
+            emulator.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
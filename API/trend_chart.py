@@ -0,0 +1,202 @@
+# Author: 152120221098 Emre AVCI
+"""
+Live trend charts
+-----------------
+TrendSeries  : fixed-capacity (time, value) history of one field, fed from the
+               connection caches (e.g. 10 samples per second).
+TrendChart   : Tk canvas that plots the last span_s seconds of a series.
+
+Rendering cost does not depend on how much data is in the window:
+- the chart keeps one min/max pair per pixel column (MinMaxColumns), updated
+  incrementally as samples arrive, so a redraw only walks `width` columns;
+- the canvas uses a fixed set of items (one envelope line + a few texts) that
+  are moved with coords()/itemconfig(), never deleted and re-created.
+"""
+
+import time
+import tkinter as tk
+from array import array
+from collections import deque
+
+
+class SampleRing:
+    """Fixed-capacity ring buffer of (t, value) pairs backed by two double arrays."""
+
+    def __init__(self, capacity: int):
+        self._cap = max(1, int(capacity))
+        self._t = array("d", bytes(8 * self._cap))
+        self._v = array("d", bytes(8 * self._cap))
+        self._head = 0
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, t: float, v: float) -> None:
+        self._t[self._head] = t
+        self._v[self._head] = v
+        self._head = (self._head + 1) % self._cap
+        if self._n < self._cap:
+            self._n += 1
+
+    def since(self, t0: float):
+        """Yield (t, v) pairs with t >= t0, oldest first."""
+        start = (self._head - self._n) % self._cap
+        for k in range(self._n):
+            i = (start + k) % self._cap
+            if self._t[i] >= t0:
+                yield self._t[i], self._v[i]
+
+
+class MinMaxColumns:
+    """Per-pixel-column min/max of a scrolling time window."""
+
+    def __init__(self, columns: int, span_s: float):
+        self.columns = max(1, int(columns))
+        self.col_s = span_s / self.columns
+        # Each entry: [column_index, min, max]; column_index = int(t / col_s)
+        self._cols: deque = deque(maxlen=self.columns)
+
+    def add(self, t: float, v: float) -> None:
+        idx = int(t // self.col_s)
+        if self._cols and self._cols[-1][0] == idx:
+            col = self._cols[-1]
+            if v < col[1]:
+                col[1] = v
+            elif v > col[2]:
+                col[2] = v
+        else:
+            self._cols.append([idx, v, v])
+
+    def visible(self, now: float):
+        """Yield [column_index, min, max] entries inside the window ending at now."""
+        first = int(now // self.col_s) - self.columns + 1
+        for col in self._cols:
+            if col[0] >= first:
+                yield col
+
+
+class TrendSeries:
+    """History of one field. The chart showing it (if any) attaches its columns here."""
+
+    def __init__(self, span_s: float = 3600.0, rate_hz: float = 10.0):
+        self.span_s = span_s
+        self.ring = SampleRing(int(span_s * rate_hz) + 1)
+        self.columns: MinMaxColumns | None = None
+        self.last: float | None = None
+
+    def append(self, t: float, v: float) -> None:
+        v = float(v)
+        self.ring.append(t, v)
+        self.last = v
+        if self.columns is not None:
+            self.columns.add(t, v)
+
+    def rebuild_columns(self, columns: int, now: float) -> MinMaxColumns:
+        """Re-decimate the window into `columns` pixel columns (only needed on resize)."""
+        cols = MinMaxColumns(columns, self.span_s)
+        for t, v in self.ring.since(now - self.span_s):
+            cols.add(t, v)
+        self.columns = cols
+        return cols
+
+
+class TrendChart:
+    PAD_X = 6
+    PAD_TOP = 24
+    PAD_BOTTOM = 8
+
+    def __init__(
+        self,
+        parent,
+        series: TrendSeries,
+        title: str,
+        unit: str = "",
+        width: int = 360,
+        height: int = 150,
+        bg: str = "#ffffff",
+        fg: str = "#475569",
+        line: str = "#2563eb",
+        font=("Segoe UI", 10),
+    ):
+        self.series = series
+        self._unit = unit
+        self._width = 0
+        self._height = height
+
+        self.canvas = tk.Canvas(parent, width=width, height=height, bg=bg, highlightthickness=0)
+
+        # Fixed item set, created once and only moved / re-texted afterwards
+        self._line = self.canvas.create_line(0, 0, 0, 0, fill=line, width=1, state="hidden")
+        self._title = self.canvas.create_text(self.PAD_X, 4, anchor="nw", text=title, fill=fg, font=font)
+        self._value = self.canvas.create_text(width - self.PAD_X, 4, anchor="ne", text="", fill=fg, font=font)
+        self._hi = self.canvas.create_text(self.PAD_X, self.PAD_TOP, anchor="nw", text="", fill=fg, font=font)
+        self._lo = self.canvas.create_text(self.PAD_X, height - self.PAD_BOTTOM, anchor="sw", text="", fill=fg, font=font)
+        self._texts: dict[int, str] = {}
+        self._line_shown = False
+
+        self.canvas.bind("<Configure>", self._on_resize)
+        self._resize(width, height)
+
+    # -------------------- LAYOUT --------------------
+    def _on_resize(self, event) -> None:
+        if event.width != self._width or event.height != self._height:
+            self._resize(event.width, event.height)
+
+    def _resize(self, width: int, height: int) -> None:
+        self._width = max(2 * self.PAD_X + 2, int(width))
+        self._height = max(self.PAD_TOP + self.PAD_BOTTOM + 2, int(height))
+        self.series.rebuild_columns(self._width - 2 * self.PAD_X, time.monotonic())
+        self.canvas.coords(self._value, self._width - self.PAD_X, 4)
+        self.canvas.coords(self._lo, self.PAD_X, self._height - self.PAD_BOTTOM)
+
+    def _set_text(self, item: int, text: str) -> None:
+        if self._texts.get(item) != text:
+            self._texts[item] = text
+            self.canvas.itemconfig(item, text=text)
+
+    # -------------------- RENDER --------------------
+    def redraw(self, now: float) -> None:
+        """Move the envelope line to the current window. Cost is O(pixel columns)."""
+        cols = self.series.columns
+        if cols is None:
+            return
+
+        visible = list(cols.visible(now))
+        if not visible:
+            if self._line_shown:
+                self._line_shown = False
+                self.canvas.itemconfig(self._line, state="hidden")
+            self._set_text(self._value, "")
+            return
+
+        lo = min(c[1] for c in visible)
+        hi = max(c[2] for c in visible)
+        if hi - lo < 1e-9:
+            hi, lo = hi + 0.5, lo - 0.5
+
+        top = self.PAD_TOP
+        plot_h = self._height - self.PAD_TOP - self.PAD_BOTTOM
+        scale = plot_h / (hi - lo)
+        right = self._width - self.PAD_X
+        last_idx = int(now // cols.col_s)
+
+        # Each column contributes a vertical min->max stroke; joining them gives the envelope
+        flat: list[float] = []
+        for idx, c_lo, c_hi in visible:
+            x = right - (last_idx - idx)
+            flat.append(x)
+            flat.append(top + (hi - c_hi) * scale)
+            flat.append(x)
+            flat.append(top + (hi - c_lo) * scale)
+
+        self.canvas.coords(self._line, *flat)
+        if not self._line_shown:
+            self._line_shown = True
+            self.canvas.itemconfig(self._line, state="normal")
+
+        unit = f" {self._unit}" if self._unit else ""
+        self._set_text(self._hi, f"{hi:.1f}")
+        self._set_text(self._lo, f"{lo:.1f}")
+        if self.series.last is not None:
+            self._set_text(self._value, f"{self.series.last:.1f}{unit}")
@@ -0,0 +1,189 @@
+# Author: 152120221098 Emre AVCI
+"""
+Tk event-loop profiler (opt-in)
+-------------------------------
+Everything in main_gui.py runs on the Tk thread, so any slow callback shows up
+as a UI hitch. TkProfiler measures:
+- after() scheduling jitter (how late a scheduled callback actually ran)
+- time spent inside each named callback / code section
+- blocking UART calls made from the UI thread (setDesiredTemp, setCurtainStatus)
+
+A rolling percentile summary is appended to <out_dir>/ui_profile.log every few
+seconds. Optionally it also writes:
+- ui_profile.prof   : cProfile stats (open with pstats / snakeviz)
+- ui_stacks.folded  : sampled Tk-thread stacks in "folded" format
+                      (flamegraph.pl / speedscope compatible)
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _percentile(sorted_vals: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+class TkProfiler:
+    def __init__(
+        self,
+        root,
+        out_dir: str,
+        window: int = 500,
+        report_every_s: float = 5.0,
+        hitch_ms: float = 50.0,
+        cprofile: bool = False,
+        folded_stacks: bool = False,
+        sample_interval_s: float = 0.005,
+    ):
+        self._root = root
+        self._out_dir = out_dir
+        self._window = window
+        self._report_every_ms = int(report_every_s * 1000)
+        self._hitch_ms = hitch_ms
+
+        # Rolling samples per metric name, in milliseconds
+        self._samples: dict[str, deque] = {}
+        self._report_job = None
+
+        self._cprofile = cProfile.Profile() if cprofile else None
+
+        # Stack sampler state (folded stacks -> sample count)
+        self._folded_stacks = folded_stacks
+        self._sample_interval_s = sample_interval_s
+        self._stacks: dict[str, int] = {}
+        self._sampler: threading.Thread | None = None
+        self._sampling = False
+        self._tk_thread_id = threading.get_ident()
+
+    # -------------------- LIFECYCLE --------------------
+    def start(self) -> None:
+        os.makedirs(self._out_dir, exist_ok=True)
+        self._tk_thread_id = threading.get_ident()
+
+        if self._cprofile is not None:
+            self._cprofile.enable()
+
+        if self._folded_stacks and self._sampler is None:
+            self._sampling = True
+            self._sampler = threading.Thread(target=self._sample_loop, name="ui-stack-sampler", daemon=True)
+            self._sampler.start()
+
+        self._report_job = self._root.after(self._report_every_ms, self._report_tick)
+
+    def stop(self) -> None:
+        """Stop profiling and flush every output file."""
+        if self._report_job is not None:
+            try:
+                self._root.after_cancel(self._report_job)
+            except Exception:
+                pass
+            self._report_job = None
+
+        self._sampling = False
+        if self._sampler is not None:
+            self._sampler.join(timeout=1.0)
+            self._sampler = None
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(os.path.join(self._out_dir, "ui_profile.prof"))
+
+        if self._folded_stacks:
+            with open(os.path.join(self._out_dir, "ui_stacks.folded"), "w", encoding="utf-8") as f:
+                for stack, count in sorted(self._stacks.items()):
+                    f.write(f"{stack} {count}\n")
+
+        self._write_report()
+
+    # -------------------- MEASUREMENT --------------------
+    def record(self, name: str, ms: float) -> None:
+        q = self._samples.get(name)
+        if q is None:
+            q = self._samples[name] = deque(maxlen=self._window)
+        q.append(ms)
+
+    @contextmanager
+    def measure(self, name: str):
+        """Time a code section running on the Tk thread."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            self.record(name, ms)
+            if ms >= self._hitch_ms:
+                self._log(f"HITCH {name} blocked the UI thread for {ms:.1f} ms")
+
+    def after(self, delay_ms: int, fn, name: str | None = None):
+        """
+        Drop-in replacement for root.after(delay_ms, fn).
+        Records how late the callback ran (jitter) and how long it took.
+        """
+        label = name or getattr(fn, "__name__", "callback")
+        due = time.perf_counter() + delay_ms / 1000.0
+
+        def _run():
+            self.record(f"{label}.jitter", max(0.0, (time.perf_counter() - due) * 1000.0))
+            with self.measure(label):
+                fn()
+
+        return self._root.after(delay_ms, _run)
+
+    # -------------------- REPORTING --------------------
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Return {name: {n, p50, p95, p99, max}} over the rolling window (ms)."""
+        out = {}
+        for name, q in self._samples.items():
+            vals = sorted(q)
+            out[name] = {
+                "n": len(vals),
+                "p50": _percentile(vals, 0.50),
+                "p95": _percentile(vals, 0.95),
+                "p99": _percentile(vals, 0.99),
+                "max": vals[-1] if vals else 0.0,
+            }
+        return out
+
+    def _report_tick(self) -> None:
+        self._write_report()
+        self._report_job = self._root.after(self._report_every_ms, self._report_tick)
+
+    def _write_report(self) -> None:
+        lines = [time.strftime("=== %Y-%m-%d %H:%M:%S ===")]
+        for name, s in sorted(self.summary().items()):
+            lines.append(
+                f"{name:<32} n={s['n']:<5d} p50={s['p50']:7.2f}ms p95={s['p95']:7.2f}ms "
+                f"p99={s['p99']:7.2f}ms max={s['max']:7.2f}ms"
+            )
+        self._log("\n".join(lines))
+
+    def _log(self, text: str) -> None:
+        try:
+            with open(os.path.join(self._out_dir, "ui_profile.log"), "a", encoding="utf-8") as f:
+                f.write(text + "\n")
+        except OSError:
+            pass
+
+    # -------------------- STACK SAMPLER --------------------
+    def _sample_loop(self) -> None:
+        """Periodically capture the Tk thread's Python stack (runs on its own thread)."""
+        while self._sampling:
+            frame = sys._current_frames().get(self._tk_thread_id)
+            if frame is not None:
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(parts))
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+            time.sleep(self._sample_interval_s)